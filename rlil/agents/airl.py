@@ -42,30 +42,32 @@ class AIRL(GAIL):
         self.update_frequency = update_frequency
         self._train_count = 0
 
-    def train(self):
-        # train discriminator
-        if self.should_train():
-            samples, expert_samples = self.replay_buffer.sample_both(
-                self.minibatch_size)
-            states, actions, _, next_states, _, _ = samples
-            exp_states, exp_actions, _, exp_next_states, _, _ = expert_samples
+    def train(self, n_steps=1):
+        # the discriminator and the base_agent are trained alternately
+        for _ in range(n_steps):
+            # train discriminator
+            if self.should_train():
+                samples, expert_samples = self.replay_buffer.sample_both(
+                    self.minibatch_size)
+                states, actions, _, next_states, _, _ = samples
+                exp_states, exp_actions, _, exp_next_states, _, _ = expert_samples
 
-            fake = self.replay_buffer.discrim(states, actions, next_states)
-            real = self.replay_buffer.discrim(exp_states,
-                                              exp_actions,
-                                              exp_next_states)
-            discrim_loss = self.discrim_criterion(fake, torch.ones_like(fake)) + \
-                self.discrim_criterion(real, torch.zeros_like(real))
+                fake = self.replay_buffer.discrim(states, actions, next_states)
+                real = self.replay_buffer.discrim(exp_states,
+                                                  exp_actions,
+                                                  exp_next_states)
+                discrim_loss = self.discrim_criterion(fake, torch.ones_like(fake)) + \
+                    self.discrim_criterion(real, torch.zeros_like(real))
 
-            self.reward_fn.zero_grad()
-            self.value_fn.zero_grad()
-            discrim_loss.backward()
-            self.reward_fn.reinforce()
-            self.value_fn.reinforce()
+                self.reward_fn.zero_grad()
+                self.value_fn.zero_grad()
+                discrim_loss.backward()
+                self.reward_fn.reinforce()
+                self.value_fn.reinforce()
 
-            # additional debugging info
-            self.writer.add_scalar('airl/fake', fake.mean())
-            self.writer.add_scalar('airl/real', real.mean())
+                # additional debugging info
+                self.writer.add_scalar('airl/fake', fake.mean())
+                self.writer.add_scalar('airl/real', real.mean())
 
-        # train base_agent
-        self.base_agent.train()
+            # train base_agent
+            self.base_agent.train()
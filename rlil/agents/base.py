@@ -37,9 +37,27 @@ class Agent(ABC):
         """
         pass
 
-    def train(self):
+    def lazy_agent_models(self):
+        """
+        Return the models of the LazyAgent which are updated by training.
+        Samplers use them to send only the weights of the models to the
+        LazyAgents which the workers already have.
+
+        Returns:
+            dict: {attribute name in the LazyAgent: torch.nn.Module or
+            its state_dict}, or None if the LazyAgent must be made
+            by make_lazy_agent every time.
+        """
+        return None
+
+    def train(self, n_steps=1):
         """
         Update internal parameters
+
+        Args:
+            n_steps (int, optional): Number of gradient steps.
+                Off-policy agents sample the minibatches of
+                all the steps from the replay_buffer at once.
         """
         pass
 
@@ -71,9 +89,9 @@ class LazyAgent(ABC):
         if self._evaluation:
             self._n_step = 1  # disable Nstep buffer when evaluation mode
 
-    def set_replay_buffer(self, env):
+    def set_replay_buffer(self, env, size=1e7):
         self.replay_buffer = ExperienceReplayBuffer(
-            1e7, env, n_step=self._n_step,
+            size, env, n_step=self._n_step,
             discount_factor=self._discount_factor)
 
     def act(self, states, reward):
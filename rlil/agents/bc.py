@@ -41,14 +41,15 @@ class BC(Agent):
         self._actions = Action(self.policy.eval(states.to(self.device)))
         return self._actions
 
-    def train(self):
+    def train(self, n_steps=1):
         if self.should_train():
-            (states, actions, _, _, _, _) = self.replay_buffer.sample(
-                self.minibatch_size)
-            policy_actions = Action(self.policy(states))
-            loss = mse_loss(policy_actions.features, actions.features)
-            self.policy.reinforce(loss)
-            self.writer.train_steps += 1
+            for (states, actions, _, _, _, _) in \
+                    self.replay_buffer.sample_batches(
+                        self.minibatch_size, n_steps):
+                policy_actions = Action(self.policy(states))
+                loss = mse_loss(policy_actions.features, actions.features)
+                self.policy.reinforce(loss)
+                self.writer.train_steps += 1
 
     def should_train(self):
         return True
@@ -57,6 +58,9 @@ class BC(Agent):
         model = deepcopy(self.policy.model)
         return BCLazyAgent(model.to("cpu"), *args, **kwargs)
 
+    def lazy_agent_models(self):
+        return {"_policy_model": self.policy.model}
+
     def load(self, dirname):
         for filename in os.listdir(dirname):
             if filename == 'policy.pt':
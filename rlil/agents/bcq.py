@@ -6,6 +6,7 @@ from copy import deepcopy
 from rlil.environments import State, action_decorator, Action
 from rlil.initializer import get_writer, get_device, get_replay_buffer
 from rlil import nn
+from rlil.approximation.twin_q_continuous import TwinQContinuousModule
 from .base import Agent, LazyAgent
 
 
@@ -24,8 +25,7 @@ class BCQ(Agent):
     This implementation is based on: https://github.com/sfujim/BCQ.
 
     Args:
-        q_1 (QContinuous): An Approximation of the continuous action Q-function.
-        q_2 (QContinuous): An Approximation of the continuous action Q-function.
+        qs (TwinQContinuous): An Approximation of the twin continuous action Q-functions.
         encoder (BcqEncoder): An approximation of the encoder.
         decoder (BcqDecoder): An approximation of the decoder.
         policy (DeterministicPolicy): An Approximation of a deterministic policy.
@@ -35,8 +35,7 @@ class BCQ(Agent):
     """
 
     def __init__(self,
-                 q_1,
-                 q_2,
+                 qs,
                  encoder,
                  decoder,
                  policy,
@@ -45,8 +44,7 @@ class BCQ(Agent):
                  minibatch_size=32,
                  ):
         # objects
-        self.q_1 = q_1
-        self.q_2 = q_2
+        self.qs = qs
         self.encoder = encoder
         self.decoder = decoder
         self.policy = policy
@@ -59,72 +57,75 @@ class BCQ(Agent):
         self.lambda_q = lambda_q
 
     def act(self, states, rewards):
-        states = State(states.features.repeat(100, 1).to(self.device))
-        vae_actions = Action(self.decoder(states))
-        policy_actions = Action(self.policy.no_grad(states, vae_actions))
-        q_1 = self.q_1(states, policy_actions)
-        ind = q_1.argmax(0).item()
-        return policy_actions[ind].to("cpu")
-
-    def train(self):
-        # sample transitions from buffer
-        (states, actions, rewards,
-         next_states, _, _) = self.replay_buffer.sample(self.minibatch_size)
-
-        # train vae
-        mean, log_var = self.encoder(
-            states.to(self.device), actions.to(self.device))
-        z = mean + (0.5 * log_var).exp() * torch.randn_like(log_var)
-        vae_actions = Action(self.decoder(states, z))
-        vae_mse = mse_loss(actions.features, vae_actions.features)
-        vae_kl = nn.kl_loss_vae(mean, log_var)
-        vae_loss = (vae_mse + 0.5 * vae_kl)
-        self.decoder.reinforce(vae_loss)
-        self.encoder.reinforce()
-        self.writer.add_scalar('loss/vae/mse', vae_mse.detach())
-        self.writer.add_scalar('loss/vae/kl', vae_kl.detach())
-
-        # train critic
         with torch.no_grad():
-            # Duplicate next state 10 times
-            next_states_10 = State(torch.repeat_interleave(
-                next_states.features, 10, 0).to(self.device))
-
-            # Compute value of perturbed actions sampled from the VAE
-            next_vae_actions = Action(self.decoder(next_states_10))
-            next_actions = Action(
-                self.policy.target(next_states_10, next_vae_actions))
-            q_1_targets = self.q_1.target(next_states_10, next_actions)
-            q_2_targets = self.q_2.target(next_states_10, next_actions)
-
-            # Soft Clipped Double Q-learning
-            q_targets = self.lambda_q * torch.min(q_1_targets, q_2_targets) \
-                + (1. - self.lambda_q) * torch.max(q_1_targets, q_2_targets)
-            # Take max over each action sampled from the VAE
-            q_targets = q_targets.reshape(
-                self.minibatch_size, -1).max(1)[0].reshape(-1, 1)
-            q_targets = rewards.reshape(-1, 1) + \
-                self.discount_factor * q_targets * next_states.mask.float().reshape(-1, 1)
-
-        self.q_1.reinforce(
-            mse_loss(self.q_1(states, actions).reshape(-1, 1), q_targets))
-        self.q_2.reinforce(
-            mse_loss(self.q_2(states, actions).reshape(-1, 1), q_targets))
-
-        # train policy
-        vae_actions = Action(self.decoder(states))
-        sampled_actions = Action(self.policy(states, vae_actions))
-        loss = -self.q_1(states, sampled_actions).mean()
-        self.policy.reinforce(loss)
-
-        self.writer.train_steps += 1
+            # the states aren't repeated for the 100 candidates
+            states = State(states.features.to(self.device))
+            vae_actions = Action(
+                self.decoder.decode_multiple(states, 100)[0].flatten(0, 1))
+            policy_actions = Action(self.policy.no_grad(states, vae_actions))
+            q_1 = self.qs.q1(states, policy_actions)
+            ind = q_1.argmax(0).item()
+            return policy_actions[ind].to("cpu")
+
+    def train(self, n_steps=1):
+        # sample the minibatches of all the steps at once
+        for (states, actions, rewards,
+             next_states, _, _) in self.replay_buffer.sample_batches(
+                self.minibatch_size, n_steps):
+
+            # train vae
+            mean, log_var = self.encoder(
+                states.to(self.device), actions.to(self.device))
+            z = mean + (0.5 * log_var).exp() * torch.randn_like(log_var)
+            vae_actions = Action(self.decoder(states, z))
+            vae_mse = mse_loss(actions.features, vae_actions.features)
+            vae_kl = nn.kl_loss_vae(mean, log_var)
+            vae_loss = (vae_mse + 0.5 * vae_kl)
+            self.decoder.reinforce(vae_loss)
+            self.encoder.reinforce()
+            self.writer.add_scalar('loss/vae/mse', vae_mse.detach())
+            self.writer.add_scalar('loss/vae/kl', vae_kl.detach())
+
+            # train critic
+            with torch.no_grad():
+                # Compute value of perturbed actions sampled from the VAE
+                # 10 actions for each next state. the models compute
+                # the projection of the next states once for the 10 actions
+                next_vae_actions = Action(self.decoder.decode_multiple(
+                    next_states, 10)[0].flatten(0, 1))
+                next_actions = Action(
+                    self.policy.target(next_states, next_vae_actions))
+                q_1_targets, q_2_targets = self.qs.target(
+                    next_states, next_actions)
+
+                # Soft Clipped Double Q-learning
+                q_targets = self.lambda_q * torch.min(q_1_targets, q_2_targets) \
+                    + (1. - self.lambda_q) * torch.max(q_1_targets, q_2_targets)
+                # Take max over each action sampled from the VAE
+                q_targets = q_targets.reshape(
+                    self.minibatch_size, -1).max(1)[0].reshape(-1, 1)
+                q_targets = rewards.reshape(-1, 1) + \
+                    self.discount_factor * q_targets * next_states.mask.float().reshape(-1, 1)
+
+            q_1_values, q_2_values = self.qs(states, actions)
+            self.qs.reinforce(
+                mse_loss(q_1_values.reshape(-1, 1), q_targets) +
+                mse_loss(q_2_values.reshape(-1, 1), q_targets))
+
+            # train policy
+            vae_actions = Action(self.decoder(states))
+            sampled_actions = Action(self.policy(states, vae_actions))
+            loss = -self.qs.q1(states, sampled_actions).mean()
+            self.policy.reinforce(loss)
+
+            self.writer.train_steps += 1
 
     def should_train(self):
         return True
 
     def make_lazy_agent(self, evaluation=False, store_samples=True):
         policy_model = deepcopy(self.policy.model)
-        q_1_model = deepcopy(self.q_1.model)
+        q_1_model = self.qs.model.head(0)
         decoder_model = deepcopy(self.decoder.model)
         return BcqLazyAgent(policy_model.to("cpu"),
                             q_1_model.to("cpu"),
@@ -132,17 +133,19 @@ class BCQ(Agent):
                             evaluation=evaluation,
                             store_samples=store_samples)
 
+    def lazy_agent_models(self):
+        return {"_policy_model": self.policy.model,
+                "_q_1_model": self.qs.model.head_state_dict(0),
+                "_decoder_model": self.decoder.model}
+
     def load(self, dirname):
         for filename in os.listdir(dirname):
             if filename == 'policy.pt':
                 self.policy.model = torch.load(os.path.join(
                     dirname, filename), map_location=self.device)
-            if filename in ('q_1.pt'):
-                self.q_1.model = torch.load(os.path.join(dirname, filename),
-                                            map_location=self.device)
-            if filename in ('q_2.pt'):
-                self.q_1.model = torch.load(os.path.join(dirname, filename),
-                                            map_location=self.device)
+            if filename in ('qs.pt'):
+                self.qs.model = torch.load(os.path.join(dirname, filename),
+                                           map_location=self.device)
             if filename in ('encoder.pt'):
                 self.encoder.model = torch.load(os.path.join(dirname, filename),
                                                 map_location=self.device)
@@ -150,6 +153,14 @@ class BCQ(Agent):
                 self.decoder.model = torch.load(os.path.join(dirname, filename),
                                                 map_location=self.device)
 
+        # the checkpoints of q_1 and q_2 saved separately
+        q_paths = [os.path.join(dirname, filename)
+                   for filename in ('q_1.pt', 'q_2.pt')]
+        if all(os.path.exists(path) for path in q_paths):
+            self.qs.model = TwinQContinuousModule.from_heads(
+                *[torch.load(path, map_location=self.device)
+                  for path in q_paths])
+
 
 class BcqLazyAgent(LazyAgent):
     """ 
@@ -174,14 +185,17 @@ class BcqLazyAgent(LazyAgent):
         super().act(states, reward)
         self._states = states
         with torch.no_grad():
-            states = State(torch.tensor(
-                states.features.repeat(100, 1),
-                dtype=torch.float32))
-            vae_actions = Action(self._decoder_model(states))
+            # batch x 100 candidates
+            num_states = len(states)
+            states = State(states.features.float())
+            vae_actions = Action(self._decoder_model.decode_multiple(
+                states, 100)[0].flatten(0, 1))
             policy_actions = self._policy_model(states, vae_actions)
-            policy_actions = Action(policy_actions)
-            q_1 = self._q_1_model(states, policy_actions)
-            ind = q_1.argmax(0).item()
-            actions = policy_actions[ind]
+            q_1 = self._q_1_model(states, Action(policy_actions))
+            ind = q_1.reshape(num_states, -1).argmax(1)
+            policy_actions = policy_actions.reshape(
+                num_states, -1, policy_actions.shape[1])
+            actions = Action(
+                policy_actions[torch.arange(num_states), ind])
         self._actions = actions
         return self._actions
@@ -83,122 +83,122 @@ class BEAR(Agent):
             ind = q1_values.argmax(0).item()
             return policy_actions[ind].to("cpu")
 
-    def train(self):
-        self._train_count += 1
-
-        # sample transitions from buffer
-        (states, actions, rewards,
-         next_states, _, _) = self.replay_buffer.sample(self.minibatch_size)
-
-        # Train the Behaviour cloning policy to be able to
-        # take more than 1 sample for MMD
-        mean, log_var = self.encoder(
-            states.to(self.device), actions.to(self.device))
-        z = mean + (0.5 * log_var).exp() * torch.randn_like(log_var)
-        vae_actions = Action(self.decoder(states, z))
-        vae_mse = mse_loss(actions.features, vae_actions.features)
-        vae_kl = nn.kl_loss_vae(mean, log_var)
-        vae_loss = (vae_mse + 0.5 * vae_kl)
-        self.decoder.reinforce(vae_loss)
-        self.encoder.reinforce()
-        self.writer.add_scalar('loss/vae/mse', vae_mse.detach())
-        self.writer.add_scalar('loss/vae/kl', vae_kl.detach())
-
-        # train critic
-        with torch.no_grad():
-            # Duplicate next state 10 times
-            next_states_10 = State(torch.repeat_interleave(
-                next_states.features, 10, 0).to(self.device))
-
-            # Compute value of perturbed actions sampled from the VAE
-            next_vae_actions_10 = Action(self.decoder(next_states_10))
-            next_actions_10 = Action(
-                self.policy.target(next_states_10, next_vae_actions_10))
-            # (batch x 10) x num_q
-            qs_targets = self.qs.target(next_states_10, next_actions_10)
-
-            # Soft Clipped Double Q-learning
-            # (batch x 10) x 1
-            q_targets = self.lambda_q * qs_targets.min(1)[0] \
-                + (1. - self.lambda_q) * qs_targets.max(1)[0]
-            # Take max over each action sampled from the VAE
-            # batch x 1
-            q_targets = q_targets.reshape(
-                self.minibatch_size, -1).max(1)[0].reshape(-1, 1)
-            q_targets = rewards.reshape(-1, 1) + \
-                self.discount_factor * q_targets * \
-                next_states.mask.float().reshape(-1, 1)
-
-        current_qs = self.qs(states, actions)  # batch x num_q
-        repeated_q_targets = torch.repeat_interleave(
-            q_targets, current_qs.shape[1], 1)
-        q_loss = mse_loss(current_qs, repeated_q_targets)
-        self.qs.reinforce(q_loss)
-
-        # train policy
-        # batch x num_samples_match x d
-        vae_actions, raw_vae_actions = \
-            self.decoder.decode_multiple(states, self.num_samples_match)
-        actor_actions, raw_actor_actions = \
-            self.policy.sample_multiple(states, self.num_samples_match)
-
-        if self.kernel_type == 'gaussian':
-            mmd = nn.mmd_gaussian(
-                raw_vae_actions, raw_actor_actions, sigma=self.mmd_sigma)
-        else:
-            mmd = nn.mmd_laplacian(
-                raw_vae_actions, raw_actor_actions, sigma=self.mmd_sigma)
-
-        # Update through TD3 style
-        # (batch x num_samples_match) x d
-        repeated_states = torch.repeat_interleave(
-            states.features.unsqueeze(1),
-            self.num_samples_match, 1).view(-1, states.shape[1])
-        repeated_actions = \
-            actor_actions.contiguous().view(-1, actor_actions.shape[2])
-        # (batch x num_samples_match) x num_q
-        critic_qs = self.qs(State(repeated_states), Action(repeated_actions))
-        # batch x num_samples_match x num_q
-        critic_qs = \
-            critic_qs.view(-1, self.num_samples_match, critic_qs.shape[1])
-        critic_qs = critic_qs.mean(1)  # batch x num_q
-        std_q = torch.std(critic_qs, dim=-1, keepdim=False,
-                          unbiased=False)  # batch
-        critic_qs = critic_qs.min(1)[0]  # batch
-
-        # Do support matching with a warmstart which happens to be reasonable
-        # around epoch 20 during training
-        if self._train_count >= 20:
-            actor_loss = (-critic_qs + self._lambda *
-                          (np.sqrt((1 - self.delta_conf) / self.delta_conf)) *
-                          std_q + self.log_lagrange2.exp().detach() * mmd).mean()
-        else:
-            actor_loss = (self.log_lagrange2.exp() * mmd).mean()
-
-        std_loss = self._lambda * (np.sqrt((1 - self.delta_conf) /
-                                           self.delta_conf)) * std_q.detach().mean()
-        self.policy.reinforce(actor_loss)
-
-        # update lagrange multipliers
-        thresh = 0.05
-        lagrange_loss = (self.log_lagrange2.exp() *
-                         (mmd - thresh).detach()).mean()
-
-        self.lagrange2_opt.zero_grad()
-        (-lagrange_loss).backward()
-        self.lagrange2_opt.step()
-        self.log_lagrange2.data.clamp_(min=-5.0, max=10.0)
-
-        self.writer.add_scalar('loss/mmd', mmd.detach().mean())
-        self.writer.add_scalar('loss/actor', actor_loss.detach())
-        self.writer.add_scalar('loss/qs', q_loss.detach())
-        self.writer.add_scalar('loss/std', std_loss.detach())
-        self.writer.add_scalar('loss/lagrange2', lagrange_loss.detach())
-        self.writer.add_scalar('critic_qs', critic_qs.detach().mean())
-        self.writer.add_scalar('std_q', std_q.detach().mean())
-        self.writer.add_scalar('lagrange2', self.log_lagrange2.exp().detach())
-
-        self.writer.train_steps += 1
+    def train(self, n_steps=1):
+        # sample the minibatches of all the steps at once
+        for (states, actions, rewards,
+             next_states, _, _) in self.replay_buffer.sample_batches(
+                self.minibatch_size, n_steps):
+            self._train_count += 1
+
+            # Train the Behaviour cloning policy to be able to
+            # take more than 1 sample for MMD
+            mean, log_var = self.encoder(
+                states.to(self.device), actions.to(self.device))
+            z = mean + (0.5 * log_var).exp() * torch.randn_like(log_var)
+            vae_actions = Action(self.decoder(states, z))
+            vae_mse = mse_loss(actions.features, vae_actions.features)
+            vae_kl = nn.kl_loss_vae(mean, log_var)
+            vae_loss = (vae_mse + 0.5 * vae_kl)
+            self.decoder.reinforce(vae_loss)
+            self.encoder.reinforce()
+            self.writer.add_scalar('loss/vae/mse', vae_mse.detach())
+            self.writer.add_scalar('loss/vae/kl', vae_kl.detach())
+
+            # train critic
+            with torch.no_grad():
+                # Duplicate next state 10 times
+                next_states_10 = State(torch.repeat_interleave(
+                    next_states.features, 10, 0).to(self.device))
+
+                # Compute value of perturbed actions sampled from the VAE
+                next_vae_actions_10 = Action(self.decoder.decode_multiple(
+                    next_states, 10)[0].flatten(0, 1))
+                next_actions_10 = Action(
+                    self.policy.target(next_states_10, next_vae_actions_10))
+                # (batch x 10) x num_q
+                # the Q-functions project each next state once
+                qs_targets = self.qs.target(next_states, next_actions_10)
+
+                # Soft Clipped Double Q-learning
+                # (batch x 10) x 1
+                q_targets = self.lambda_q * qs_targets.min(1)[0] \
+                    + (1. - self.lambda_q) * qs_targets.max(1)[0]
+                # Take max over each action sampled from the VAE
+                # batch x 1
+                q_targets = q_targets.reshape(
+                    self.minibatch_size, -1).max(1)[0].reshape(-1, 1)
+                q_targets = rewards.reshape(-1, 1) + \
+                    self.discount_factor * q_targets * \
+                    next_states.mask.float().reshape(-1, 1)
+
+            current_qs = self.qs(states, actions)  # batch x num_q
+            repeated_q_targets = torch.repeat_interleave(
+                q_targets, current_qs.shape[1], 1)
+            q_loss = mse_loss(current_qs, repeated_q_targets)
+            self.qs.reinforce(q_loss)
+
+            # train policy
+            # batch x num_samples_match x d
+            vae_actions, raw_vae_actions = \
+                self.decoder.decode_multiple(states, self.num_samples_match)
+            actor_actions, raw_actor_actions = \
+                self.policy.sample_multiple(states, self.num_samples_match)
+
+            if self.kernel_type == 'gaussian':
+                mmd = nn.mmd_gaussian(
+                    raw_vae_actions, raw_actor_actions, sigma=self.mmd_sigma)
+            else:
+                mmd = nn.mmd_laplacian(
+                    raw_vae_actions, raw_actor_actions, sigma=self.mmd_sigma)
+
+            # Update through TD3 style
+            # (batch x num_samples_match) x d
+            repeated_actions = \
+                actor_actions.contiguous().view(-1, actor_actions.shape[2])
+            # (batch x num_samples_match) x num_q
+            # each state is repeated num_samples_match times in self.qs
+            critic_qs = self.qs(states, Action(repeated_actions))
+            # batch x num_samples_match x num_q
+            critic_qs = \
+                critic_qs.view(-1, self.num_samples_match, critic_qs.shape[1])
+            critic_qs = critic_qs.mean(1)  # batch x num_q
+            std_q = torch.std(critic_qs, dim=-1, keepdim=False,
+                              unbiased=False)  # batch
+            critic_qs = critic_qs.min(1)[0]  # batch
+
+            # Do support matching with a warmstart which happens to be reasonable
+            # around epoch 20 during training
+            if self._train_count >= 20:
+                actor_loss = (-critic_qs + self._lambda *
+                              (np.sqrt((1 - self.delta_conf) / self.delta_conf)) *
+                              std_q + self.log_lagrange2.exp().detach() * mmd).mean()
+            else:
+                actor_loss = (self.log_lagrange2.exp() * mmd).mean()
+
+            std_loss = self._lambda * (np.sqrt((1 - self.delta_conf) /
+                                               self.delta_conf)) * std_q.detach().mean()
+            self.policy.reinforce(actor_loss)
+
+            # update lagrange multipliers
+            thresh = 0.05
+            lagrange_loss = (self.log_lagrange2.exp() *
+                             (mmd - thresh).detach()).mean()
+
+            self.lagrange2_opt.zero_grad()
+            (-lagrange_loss).backward()
+            self.lagrange2_opt.step()
+            self.log_lagrange2.data.clamp_(min=-5.0, max=10.0)
+
+            self.writer.add_scalar('loss/mmd', mmd.detach().mean())
+            self.writer.add_scalar('loss/actor', actor_loss.detach())
+            self.writer.add_scalar('loss/qs', q_loss.detach())
+            self.writer.add_scalar('loss/std', std_loss.detach())
+            self.writer.add_scalar('loss/lagrange2', lagrange_loss.detach())
+            self.writer.add_scalar('critic_qs', critic_qs.detach().mean())
+            self.writer.add_scalar('std_q', std_q.detach().mean())
+            self.writer.add_scalar('lagrange2', self.log_lagrange2.exp().detach())
+
+            self.writer.train_steps += 1
 
     def should_train(self):
         return True
@@ -211,14 +211,20 @@ class BEAR(Agent):
                              evaluation=evaluation,
                              store_samples=store_samples)
 
+    def lazy_agent_models(self):
+        return {"_policy_model": self.policy.model,
+                "_qs_model": self.qs.model}
+
     def load(self, dirname):
         for filename in os.listdir(dirname):
             if filename == 'policy.pt':
                 self.policy.model = torch.load(os.path.join(
                     dirname, filename), map_location=self.device)
             if filename in ('qs.pt'):
-                self.qs.model = torch.load(os.path.join(dirname, filename),
-                                           map_location=self.device)
+                # the checkpoints with nn.ModuleList are converted
+                qs_model = torch.load(os.path.join(dirname, filename),
+                                      map_location=self.device)
+                self.qs.model = qs_model.stacked()
             if filename in ('encoder.pt'):
                 self.encoder.model = torch.load(os.path.join(dirname, filename),
                                                 map_location=self.device)
@@ -247,9 +253,16 @@ class BearLazyAgent(LazyAgent):
         super().act(states, reward)
         self._states = states
         with torch.no_grad():
-            states = State(states.features.repeat(10, 1))
-            policy_actions = Action(self._policy_model(states)[0])
-            q1_values = self._qs_model.q1(states, policy_actions)
-            ind = q1_values.argmax(0).item()
-            self._actions = policy_actions[ind].to("cpu")
+            # batch x 10 candidates
+            num_states = len(states)
+            repeated_states = State(
+                torch.repeat_interleave(states.features, 10, 0))
+            policy_actions = self._policy_model(repeated_states)[0]
+            q1_values = self._qs_model.q1(
+                State(states.features), Action(policy_actions))
+            ind = q1_values.reshape(num_states, -1).argmax(1)
+            policy_actions = policy_actions.reshape(
+                num_states, -1, policy_actions.shape[1])
+            self._actions = Action(
+                policy_actions[torch.arange(num_states), ind]).to("cpu")
             return self._actions
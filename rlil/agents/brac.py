@@ -7,6 +7,7 @@ from copy import deepcopy
 from rlil.environments import State, action_decorator, Action
 from rlil.initializer import get_writer, get_device, get_replay_buffer
 from rlil import nn
+from rlil.approximation.twin_q_continuous import TwinQContinuousModule
 from tqdm import tqdm
 from .base import Agent, LazyAgent
 
@@ -37,8 +38,7 @@ class BRAC(Agent):
 
     The behavior policy is estimated using simple bc with SoftDeterministicPolicy.
     Args:
-        q_1 (QContinuous): An Approximation of the continuous action Q-function.
-        q_2 (QContinuous): An Approximation of the continuous action Q-function.
+        qs (TwinQContinuous): An Approximation of the twin continuous action Q-functions.
         policy (SoftDeterministicPolicy): An Approximation of a soft deterministic policy.
         behavior_policy (SoftDeterministicPolicy): An approximation of the behavior policy.
         bc_iters (int): Number of training steps for behavior cloning.
@@ -49,8 +49,7 @@ class BRAC(Agent):
     """
 
     def __init__(self,
-                 q_1,
-                 q_2,
+                 qs,
                  policy,
                  behavior_policy,
                  bc_iters=5000,
@@ -60,8 +59,7 @@ class BRAC(Agent):
                  minibatch_size=100,
                  ):
         # objects
-        self.q_1 = q_1
-        self.q_2 = q_2
+        self.qs = qs
         self.policy = policy
         self.behavior_policy = behavior_policy
         self.replay_buffer = get_replay_buffer()
@@ -81,47 +79,46 @@ class BRAC(Agent):
             states.to(self.device))[0]).to("cpu")
         return actions
 
-    def train(self):
+    def train(self, n_steps=1):
         if self._train_count == 0:
             self.train_bc()
 
-        self._train_count += 1
-
-        # sample transitions from buffer
-        (states, actions, rewards,
-         next_states, _, _) = self.replay_buffer.sample(self.minibatch_size)
-
-        # Trick 2: KL divergence regularization
-        policy_mean, policy_logvar = self.policy.mean_logvar(states)
-        behavior_mean, behavior_logvar = self.behavior_policy.mean_logvar(
-            states)
-        kl = nn.kl_gaussian(policy_mean, policy_logvar,
-                            behavior_mean, behavior_logvar)
-
-        # Trick 1: clipped double Q learning
-        next_actions, _ = self.policy.target(next_states)
-        q_values = torch.min(self.q_1.target(next_states, Action(next_actions)),
-                             self.q_2.target(next_states, Action(next_actions)))
-
-        # Trick 4: Q target with divergence penalty
-        q_targets = rewards + self.discount_factor * \
-            (q_values - self.alpha * kl.detach())
-
-        self.q_1.reinforce(
-            mse_loss(self.q_1(states, actions), q_targets))
-        self.q_2.reinforce(
-            mse_loss(self.q_2(states, actions), q_targets))
-
-        # Update policy with a warmstart
-        policy_loss = self.alpha * kl
-        if self._train_count >= 5000:
-            policy_actions, _ = self.policy(states)
-            policy_loss -= self.q_1(states, Action(policy_actions))
-        self.policy.reinforce(policy_loss.mean())
-
-        self.writer.add_scalar('q_targets/mean', q_targets.detach().mean())
-        self.writer.add_scalar('loss/kl', kl.detach().mean())
-        self.writer.train_steps += 1
+        # sample the minibatches of all the steps at once
+        for (states, actions, rewards,
+             next_states, _, _) in self.replay_buffer.sample_batches(
+                self.minibatch_size, n_steps):
+            self._train_count += 1
+
+            # Trick 2: KL divergence regularization
+            policy_mean, policy_logvar = self.policy.mean_logvar(states)
+            behavior_mean, behavior_logvar = self.behavior_policy.mean_logvar(
+                states)
+            kl = nn.kl_gaussian(policy_mean, policy_logvar,
+                                behavior_mean, behavior_logvar)
+
+            # Trick 1: clipped double Q learning
+            next_actions, _ = self.policy.target(next_states)
+            q_values = torch.min(
+                *self.qs.target(next_states, Action(next_actions)))
+
+            # Trick 4: Q target with divergence penalty
+            q_targets = rewards + self.discount_factor * \
+                (q_values - self.alpha * kl.detach())
+
+            q_1_values, q_2_values = self.qs(states, actions)
+            self.qs.reinforce(mse_loss(q_1_values, q_targets) +
+                              mse_loss(q_2_values, q_targets))
+
+            # Update policy with a warmstart
+            policy_loss = self.alpha * kl
+            if self._train_count >= 5000:
+                policy_actions, _ = self.policy(states)
+                policy_loss -= self.qs.q1(states, Action(policy_actions))
+            self.policy.reinforce(policy_loss.mean())
+
+            self.writer.add_scalar('q_targets/mean', q_targets.detach().mean())
+            self.writer.add_scalar('loss/kl', kl.detach().mean())
+            self.writer.train_steps += 1
 
     def train_bc(self):
         for _ in tqdm(range(self.bc_iters)):
@@ -144,21 +141,29 @@ class BRAC(Agent):
                              evaluation=evaluation,
                              store_samples=store_samples)
 
+    def lazy_agent_models(self):
+        return {"_policy_model": self.policy.model}
+
     def load(self, dirname):
         for filename in os.listdir(dirname):
             if filename == 'policy.pt':
                 self.policy.model = torch.load(os.path.join(
                     dirname, filename), map_location=self.device)
-            if filename in ('q_1.pt'):
-                self.q_1.model = torch.load(os.path.join(dirname, filename),
-                                            map_location=self.device)
-            if filename in ('q_2.pt'):
-                self.q_1.model = torch.load(os.path.join(dirname, filename),
-                                            map_location=self.device)
+            if filename in ('qs.pt'):
+                self.qs.model = torch.load(os.path.join(dirname, filename),
+                                           map_location=self.device)
             if filename in ('behavior_policy.pt'):
                 self.behavior_policy.model = torch.load(os.path.join(dirname, filename),
                                                         map_location=self.device)
 
+        # the checkpoints of q_1 and q_2 saved separately
+        q_paths = [os.path.join(dirname, filename)
+                   for filename in ('q_1.pt', 'q_2.pt')]
+        if all(os.path.exists(path) for path in q_paths):
+            self.qs.model = TwinQContinuousModule.from_heads(
+                *[torch.load(path, map_location=self.device)
+                  for path in q_paths])
+
 
 class BracLazyAgent(LazyAgent):
     """ 
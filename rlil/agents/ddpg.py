@@ -4,7 +4,7 @@ import os
 from torch.distributions.normal import Normal
 from rlil.environments import Action
 from rlil.initializer import (
-    get_device, get_writer, get_replay_buffer, use_apex)
+    get_device, get_writer, get_replay_buffer, get_profiler, use_apex)
 from rlil.memory import ExperienceReplayBuffer
 from rlil.nn import weighted_mse_loss
 from rlil.utils import Samples
@@ -69,32 +69,36 @@ class DDPG(Agent):
         self._actions = Action(actions).to("cpu")
         return self._actions
 
-    def train(self):
+    def train(self, n_steps=1):
         if self.should_train():
-            # sample transitions from buffer
-            (states, actions, rewards, next_states,
-             weights, indexes) = self.replay_buffer.sample(self.minibatch_size)
-
-            # train q-network
-            q_values = self.q(states, actions)
-            targets = rewards + self.discount_factor * \
-                self.q.target(next_states, Action(
-                    self.policy.target(next_states)))
-            q_loss = weighted_mse_loss(q_values, targets, weights)
-            self.q.reinforce(q_loss)
-
-            # update prioritized replay buffer
-            td_errors = (targets - q_values).abs()
-            self.replay_buffer.update_priorities(indexes, td_errors.cpu())
-
-            # train policy
-            policy_actions = Action(self.policy(states))
-            policy_loss = -self.q(states, policy_actions).mean()
-            self.policy.reinforce(policy_loss)
-
-            # additional debugging info
-            self.writer.add_histogram('error/td_error', td_errors.detach().cpu())
-            self.writer.train_steps += 1
+            profiler = get_profiler()
+            # sample the minibatches of all the steps at once
+            for (states, actions, rewards, next_states,
+                 weights, indexes) in self.replay_buffer.sample_batches(
+                    self.minibatch_size, n_steps):
+
+                with profiler.timer("train/critic"):
+                    # train q-network
+                    q_values = self.q(states, actions)
+                    targets = rewards + self.discount_factor * \
+                        self.q.target(next_states, Action(
+                            self.policy.target(next_states)))
+                    q_loss = weighted_mse_loss(q_values, targets, weights)
+                    self.q.reinforce(q_loss)
+
+                    # update prioritized replay buffer
+                    td_errors = (targets - q_values).abs()
+                    self.replay_buffer.update_priorities(indexes, td_errors.cpu())
+
+                with profiler.timer("train/actor"):
+                    # train policy
+                    policy_actions = Action(self.policy(states))
+                    policy_loss = -self.q(states, policy_actions).mean()
+                    self.policy.reinforce(policy_loss)
+
+                # additional debugging info
+                self.writer.add_histogram('error/td_error', td_errors.detach().cpu())
+                self.writer.train_steps += 1
 
     def should_train(self):
         return len(self.replay_buffer) > self.replay_start_size
@@ -115,6 +119,12 @@ class DDPG(Agent):
                              evaluation=evaluation,
                              store_samples=store_samples)
 
+    def lazy_agent_models(self):
+        return {"_policy_model": self.policy.model,
+                "_policy_target_model": self.policy._target._target,
+                "_q_model": self.q.model,
+                "_q_target_model": self.q._target._target}
+
     def load(self, dirname):
         for filename in os.listdir(dirname):
             if filename == 'policy.pt':
@@ -42,29 +42,31 @@ class GAIL(Agent):
     def act(self, *args, **kwargs):
         return self.base_agent.act(*args, **kwargs)
 
-    def train(self):
-        self._train_count += 1
-        # train discriminator
-        if self.should_train():
-            samples, expert_samples = self.replay_buffer.sample_both(
-                self.minibatch_size)
-            states, actions, _, _, _, _ = samples
-            exp_states, exp_actions, _, _, _, _ = expert_samples
+    def train(self, n_steps=1):
+        # the discriminator and the base_agent are trained alternately
+        for _ in range(n_steps):
+            self._train_count += 1
+            # train discriminator
+            if self.should_train():
+                samples, expert_samples = self.replay_buffer.sample_both(
+                    self.minibatch_size)
+                states, actions, _, _, _, _ = samples
+                exp_states, exp_actions, _, _, _, _ = expert_samples
 
-            fake = self.discriminator(
-                torch.cat((states.features, actions.features), dim=1))
-            real = self.discriminator(
-                torch.cat((exp_states.features, exp_actions.features), dim=1))
-            discrim_loss = self.discrim_criterion(fake, torch.ones_like(fake)) + \
-                self.discrim_criterion(real, torch.zeros_like(real))
-            self.discriminator.reinforce(discrim_loss)
+                fake = self.discriminator(
+                    torch.cat((states.features, actions.features), dim=1))
+                real = self.discriminator(
+                    torch.cat((exp_states.features, exp_actions.features), dim=1))
+                discrim_loss = self.discrim_criterion(fake, torch.ones_like(fake)) + \
+                    self.discrim_criterion(real, torch.zeros_like(real))
+                self.discriminator.reinforce(discrim_loss)
 
-            # additional debugging info
-            self.writer.add_scalar('gail/fake', fake.mean())
-            self.writer.add_scalar('gail/real', real.mean())
+                # additional debugging info
+                self.writer.add_scalar('gail/fake', fake.mean())
+                self.writer.add_scalar('gail/real', real.mean())
 
-        # train base_agent
-        self.base_agent.train()
+            # train base_agent
+            self.base_agent.train()
 
     def should_train(self):
         return len(self.replay_buffer) > self.replay_start_size and \
@@ -73,5 +75,8 @@ class GAIL(Agent):
     def make_lazy_agent(self, *args, **kwargs):
         return self.base_agent.make_lazy_agent(*args, **kwargs)
 
+    def lazy_agent_models(self):
+        return self.base_agent.lazy_agent_models()
+
     def load(self, dirname):
         self.base_agent.load(dirname)
@@ -17,8 +17,7 @@ class NoisyTD3(TD3):
     Noisy Network: https://arxiv.org/abs/1706.10295
 
     Args:
-        q_1 (QContinuous): An Approximation of the continuous action Q-function.
-        q_2 (QContinuous): An Approximation of the continuous action Q-function.
+        qs (TwinQContinuous): An Approximation of the twin continuous action Q-functions.
         policy (DeterministicPolicy): An Approximation of a deterministic policy.
         discount_factor (float): Discount factor for future rewards.
         minibatch_size (int): The number of experiences to sample in each training update.
@@ -28,8 +27,7 @@ class NoisyTD3(TD3):
     """
 
     def __init__(self,
-                 q_1,
-                 q_2,
+                 qs,
                  policy,
                  discount_factor=0.99,
                  minibatch_size=32,
@@ -38,8 +36,7 @@ class NoisyTD3(TD3):
                  replay_start_size=5000,
                  ):
         # objects
-        self.q_1 = q_1
-        self.q_2 = q_2
+        self.qs = qs
         self.policy = policy
         self.replay_buffer = get_replay_buffer()
         self.device = get_device()
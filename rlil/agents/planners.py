@@ -0,0 +1,175 @@
+import torch
+from copy import deepcopy
+from rlil.environments import Action
+
+
+class RandomShooting:
+    """
+    Random shooting planner.
+    It samples uniform random action sequences and returns the first
+    actions of the best sequences.
+
+    The action sequences of all the states are planned at once as a
+    num_states x num_samples x horizon x action_dim tensor.
+
+    Args:
+        horizon (int): Control horizon.
+        num_samples (int): Number of action sequences for each state.
+        device (torch.device): Device of the action sequences.
+    """
+
+    def __init__(self, horizon, num_samples, device="cpu"):
+        action_space = Action.action_space()
+        self._low = torch.tensor(
+            action_space.low, dtype=torch.float32, device=device)
+        self._high = torch.tensor(
+            action_space.high, dtype=torch.float32, device=device)
+        self.horizon = horizon
+        self.num_samples = num_samples
+
+    def plan(self, evaluate, num_states):
+        """
+        Args:
+            evaluate (function): Function that returns the num_states x
+                num_samples returns of the action sequences.
+            num_states (int): Number of states to plan for.
+
+        Returns:
+            torch.Tensor: num_states x action_dim first actions.
+        """
+        sequences = self._sample_uniform(num_states)
+        returns = evaluate(sequences)
+        best = returns.argmax(dim=1)
+        return sequences[torch.arange(num_states), best, 0]
+
+    def reset(self, dones=None):
+        """
+        Forget the previous plan, e.g. at the end of the episodes.
+
+        Args:
+            dones (torch.BoolTensor, optional): num_states mask of the
+                states whose plans are forgotten. All the plans are
+                forgotten if None.
+        """
+
+    def to(self, device):
+        '''Return a copy of the planner on the device'''
+        planner = deepcopy(self)
+        planner.reset()
+        planner._low = self._low.to(device)
+        planner._high = self._high.to(device)
+        return planner
+
+    def _sample_uniform(self, num_states):
+        shape = (num_states, self.num_samples, self.horizon) \
+            + self._low.shape
+        uniform = torch.rand(shape, device=self._low.device)
+        return self._low + uniform * (self._high - self._low)
+
+
+class CEM(RandomShooting):
+    """
+    Cross entropy method (CEM) planner.
+    This implementation is based on: https://arxiv.org/abs/1805.12114.
+    It iteratively refits a gaussian over the action sequences to the
+    elite sequences. The mean of the previous plan shifted by a step is
+    reused as the initial mean, i.e. warm start.
+    The std is kept above min_std so that the planner keeps exploring.
+
+    Args:
+        horizon (int): Control horizon.
+        num_samples (int): Number of action sequences for each state.
+        num_iterations (int): Number of updates of the gaussian.
+        num_elites (int): Number of the elite sequences.
+        min_std (float): Lower bound of the std of the gaussian.
+        device (torch.device): Device of the action sequences.
+    """
+
+    def __init__(self,
+                 horizon,
+                 num_samples,
+                 num_iterations=5,
+                 num_elites=50,
+                 min_std=0.05,
+                 device="cpu"):
+        super().__init__(horizon, num_samples, device=device)
+        assert 2 <= num_elites <= num_samples, \
+            "num_elites must be in [2, num_samples]"
+        self.num_iterations = num_iterations
+        self.num_elites = num_elites
+        self.min_std = min_std
+        self._mean = None
+
+    def plan(self, evaluate, num_states):
+        mean = self._init_mean(num_states)
+        std = ((self._high - self._low) / 4).expand_as(mean)
+        for _ in range(self.num_iterations):
+            noises = torch.randn(
+                (num_states, self.num_samples) + mean.shape[1:],
+                device=mean.device)
+            sequences = mean.unsqueeze(1) + std.unsqueeze(1) * noises
+            sequences = torch.max(torch.min(sequences, self._high),
+                                  self._low)
+            returns = evaluate(sequences)
+            mean, std = self._update(sequences, returns)
+        self._mean = mean
+        return mean[:, 0]
+
+    def reset(self, dones=None):
+        if dones is None or self._mean is None:
+            self._mean = None
+            return
+        self._mean = torch.where(dones.view(-1, 1, 1),
+                                 self._center(len(dones)), self._mean)
+
+    def _center(self, num_states):
+        return ((self._high + self._low) / 2).expand(
+            (num_states, self.horizon) + self._low.shape)
+
+    def _init_mean(self, num_states):
+        center = self._center(num_states)
+        if self._mean is None or len(self._mean) != num_states:
+            return center.clone()
+        # shift the previous plan by a step
+        return torch.cat((self._mean[:, 1:], center[:, -1:]), dim=1)
+
+    def _update(self, sequences, returns):
+        elites = returns.topk(self.num_elites, dim=1).indices
+        elites = sequences[torch.arange(len(sequences)).unsqueeze(1),
+                           elites]
+        return elites.mean(dim=1), elites.std(dim=1).clamp(min=self.min_std)
+
+
+class MPPI(CEM):
+    """
+    Model predictive path integral (MPPI) planner.
+    This implementation is based on: https://arxiv.org/abs/1509.01149.
+    The mean is updated by the average of the action sequences
+    weighted by exp(returns / temperature) with a fixed std.
+    The previous plan is reused as the warm start as CEM.
+
+    Args:
+        horizon (int): Control horizon.
+        num_samples (int): Number of action sequences for each state.
+        num_iterations (int): Number of updates of the mean.
+        temperature (float): Temperature of the weights.
+        device (torch.device): Device of the action sequences.
+    """
+
+    def __init__(self,
+                 horizon,
+                 num_samples,
+                 num_iterations=5,
+                 temperature=1.0,
+                 device="cpu"):
+        super().__init__(horizon, num_samples,
+                         num_iterations=num_iterations,
+                         num_elites=num_samples,
+                         device=device)
+        self.temperature = temperature
+
+    def _update(self, sequences, returns):
+        weights = torch.softmax(returns / self.temperature, dim=1)
+        mean = (weights[:, :, None, None] * sequences).sum(dim=1)
+        std = ((self._high - self._low) / 4).expand_as(mean)
+        return mean, std
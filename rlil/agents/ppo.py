@@ -150,6 +150,10 @@ class PPO(Agent):
                             evaluation=evaluation,
                             store_samples=store_samples)
 
+    def lazy_agent_models(self):
+        return {"_policy_model": self.policy.model,
+                "_feature_model": self.feature_nw.model}
+
     def load(self, dirname):
         for filename in os.listdir(dirname):
             if filename == 'policy.pt':
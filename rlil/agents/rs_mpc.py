@@ -1,7 +1,6 @@
 import numpy as np
 import torch
 from torch.distributions.uniform import Uniform
-from torch.nn.functional import mse_loss
 from rlil.environments import State, action_decorator, Action
 from rlil.initializer import get_device, get_writer, get_replay_buffer
 from rlil import nn
@@ -18,26 +17,36 @@ class RsMPC(Agent):
     The random shooting method generates random actions at each MPC iteration.
     It chooses the best from the candidates based on the reward function 
     and the dynamics model.
+    The candidates of all the states are rolled out by the dynamics model
+    at once, and the planner can be replaced by CEM or MPPI.
+    The plans of the planner are forgotten at the end of the episodes.
 
     Args:
         dynamics (rlil.approximation.Dynamics): 
-            An Approximation of a dynamics model.
+            An Approximation of a dynamics model, or
+            rlil.approximation.EnsembleDynamics for trajectory sampling.
         reward_fn (rlil.environments.reward_fn): Reward function for mpc
-        horizon (int): Control horizon.
-        num_samples (int): Number of action samples for random shooting.
+        planner (rlil.agents.planners.RandomShooting):
+            Planner of the action sequences, e.g. RandomShooting, CEM or MPPI.
         minibatch_size (int): 
             The number of experiences to sample in each training update.
         replay_start_size (int): 
             Number of experiences in replay buffer when training begins.
+        num_particles (int): Number of particles propagating each
+            action sequence. The planner evaluates the sequences by the
+            returns averaged over the particles. With EnsembleDynamics,
+            the particles of a sequence are propagated by different models,
+            e.g. num_particles=20 with 5 models gives each model 4 particles
+            as in PETS (https://arxiv.org/abs/1805.12114).
     """
 
     def __init__(self,
                  dynamics,
                  reward_fn,
-                 horizon,
-                 num_samples,
+                 planner,
                  minibatch_size=32,
                  replay_start_size=5000,
+                 num_particles=1,
                  ):
         # objects
         self.dynamics = dynamics
@@ -45,6 +54,7 @@ class RsMPC(Agent):
         self.writer = get_writer()
         self.device = get_device()
         self._reward_fn = reward_fn
+        self._planner = planner
         self._action_space = Action.action_space()
         self._action_uniform = Uniform(
             low=torch.tensor(self._action_space.low,
@@ -55,8 +65,7 @@ class RsMPC(Agent):
         # hyperparameters
         self.minibatch_size = minibatch_size
         self.replay_start_size = replay_start_size
-        self._num_samples = num_samples
-        self._horizon = horizon
+        self.num_particles = num_particles
         # private
         self._states = None
         self._actions = None
@@ -65,22 +74,36 @@ class RsMPC(Agent):
         actions = self._action_uniform.sample([num_samples])
         return Action(actions).to(self.device)
 
-    def _mpc(self, state):
-        init_actions = self._make_random_actions(self._num_samples)
-        total_rewards = torch.zeros(self._num_samples, device=self.device)
-        state = State(state.features.repeat(
-            self._num_samples, 1).to(self.device))
-        for i in range(self._horizon):
-            if i == 0:
-                actions = init_actions
-            else:
-                actions = self._make_random_actions(self._num_samples)
+    def _mpc(self, states):
+        with torch.no_grad():
+            actions = self._planner.plan(
+                lambda sequences: self._rollout(states, sequences),
+                len(states))
+        # the next episodes don't start from the previous plans
+        if states.done.any():
+            self._planner.reset(states.done.to(actions.device))
+        return Action(actions)
+
+    def _rollout(self, states, sequences):
+        # sequences: num_states x num_samples x horizon x action_dim
+        num_states, num_samples, horizon = sequences.shape[:3]
+        # the consecutive particles of a sequence are propagated by
+        # the different models of EnsembleDynamics
+        state = State(states.features.to(self.device).repeat_interleave(
+            num_samples * self.num_particles, dim=0))
+        sequences = sequences.reshape(
+            (num_states * num_samples, horizon) + sequences.shape[3:]
+        ).repeat_interleave(self.num_particles, dim=0)
+        total_rewards = torch.zeros(len(state), device=self.device)
+        for i in range(horizon):
+            actions = Action(sequences[:, i])
             next_state = self.dynamics(state, actions)
             rewards = self._reward_fn(state, next_state, actions)
             total_rewards += rewards
             state = next_state
-        idx = total_rewards.argmax()
-        return init_actions[idx.item()]
+        # the expected returns over the particles
+        return total_rewards.view(
+            num_states, num_samples, self.num_particles).mean(dim=2)
 
     def act(self, states, reward=None):
         if reward is not None:
@@ -90,18 +113,18 @@ class RsMPC(Agent):
         if self.should_train():
             actions = self._make_random_actions(len(states))
         else:
-            actions = Action.from_list([self._mpc(state) for state in states])
+            actions = self._mpc(states)
         self._actions = actions.to("cpu")
         return self._actions
 
-    def train(self):
+    def train(self, n_steps=1):
         if self.should_train():
-            (states, actions, _, next_states,
-             _, _) = self.replay_buffer.sample(self.minibatch_size)
-            predictions = self.dynamics(states, actions)
-            loss = mse_loss(next_states.features, predictions.features)
-            self.dynamics.reinforce(loss)
-            self.writer.train_steps += 1
+            for (states, actions, _, next_states,
+                 _, _) in self.replay_buffer.sample_batches(
+                    self.minibatch_size, n_steps):
+                loss = self.dynamics.loss(states, actions, next_states)
+                self.dynamics.reinforce(loss)
+                self.writer.train_steps += 1
 
     def should_train(self):
         return len(self.replay_buffer) > self.replay_start_size
@@ -118,9 +141,9 @@ class RsMPC(Agent):
             model.to("cpu"),
             self._reward_fn,
             action_uniform,
-            self._horizon,
-            self._num_samples,
+            self._planner.to("cpu"),
             self.should_train(),
+            self.num_particles,
             *args, **kwargs)
 
     def load(self, dirname):
@@ -139,17 +162,17 @@ class RsMpcLazyAgent(RsMPC, LazyAgent):
                  dynamics_model,
                  reward_fn,
                  action_uniform,
-                 horizon,
-                 num_samples,
+                 planner,
                  should_train,
+                 num_particles,
                  *args, **kwargs):
         self.dynamics = dynamics_model
         self._reward_fn = reward_fn
         self._action_space = Action.action_space()
         self._action_uniform = action_uniform
-        self._num_samples = num_samples
-        self._horizon = horizon
+        self._planner = planner
         self._should_train = should_train
+        self.num_particles = num_particles
         self.device = "cpu"
         LazyAgent.__init__(self, *args, **kwargs)
         if self._evaluation:
@@ -160,8 +183,7 @@ class RsMpcLazyAgent(RsMPC, LazyAgent):
         self._states = states
         with torch.no_grad():
             if self._evaluation or self._should_train:
-                actions = Action.from_list(
-                    [self._mpc(state) for state in states])
+                actions = self._mpc(states)
             else:
                 actions = self._make_random_actions(len(states))
             self._actions = actions.to("cpu")
@@ -3,8 +3,9 @@ import os
 from copy import deepcopy
 from rlil.environments import Action
 from rlil.initializer import (
-    get_device, get_writer, get_replay_buffer, use_apex)
+    get_device, get_writer, get_replay_buffer, get_profiler, use_apex)
 from rlil.memory import ExperienceReplayBuffer
+from rlil.approximation.twin_q_continuous import TwinQContinuousModule
 from rlil.nn import weighted_mse_loss
 from rlil.utils import Samples
 from .base import Agent, LazyAgent
@@ -24,8 +25,7 @@ class SAC(Agent):
 
     Args:
         policy (DeterministicPolicy): An Approximation of a deterministic policy.
-        q1 (QContinuous): An Approximation of the continuous action Q-function.
-        q2 (QContinuous): An Approximation of the continuous action Q-function.
+        qs (TwinQContinuous): An Approximation of the twin continuous action Q-functions.
         v (VNetwork): An Approximation of the state-value function.
         discount_factor (float): Discount factor for future rewards.
         entropy_target (float): The desired entropy of the policy. Usually -env.action_space.shape[0]
@@ -36,8 +36,7 @@ class SAC(Agent):
 
     def __init__(self,
                  policy,
-                 q_1,
-                 q_2,
+                 qs,
                  v,
                  discount_factor=0.99,
                  entropy_target=-2.,
@@ -49,8 +48,7 @@ class SAC(Agent):
         # objects
         self.policy = policy
         self.v = v
-        self.q_1 = q_1
-        self.q_2 = q_2
+        self.qs = qs
         self.replay_buffer = get_replay_buffer()
         self.writer = get_writer()
         self.device = get_device()
@@ -74,62 +72,63 @@ class SAC(Agent):
             states.to(self.device))[0]).to("cpu")
         return self._actions
 
-    def train(self):
+    def train(self, n_steps=1):
         if self.should_train():
-            # sample from replay buffer
-            (states, actions, rewards, next_states,
-             weights, indexes) = self.replay_buffer.sample(self.minibatch_size)
-
-            # Target actions come from *current* policy
-            _actions, _log_probs = self.policy.no_grad(states)
-            # compute targets for Q and V
-            q_targets = rewards + self.discount_factor * \
-                self.v.target(next_states)
-            v_targets = torch.min(
-                self.q_1.target(states, Action(_actions)),
-                self.q_2.target(states, Action(_actions)),
-            ) - self.temperature * _log_probs
-
-            # update Q and V-functions
-            q_1_values = self.q_1(states, actions)
-            self.q_1.reinforce(
-                weighted_mse_loss(q_1_values, q_targets, weights))
-            q_2_values = self.q_2(states, actions)
-            self.q_2.reinforce(
-                weighted_mse_loss(q_2_values, q_targets, weights))
-            self.v.reinforce(weighted_mse_loss(
-                self.v(states), v_targets, weights))
-
-            # update priorities
-            td_errors = (q_targets - q_1_values).abs()
-            self.replay_buffer.update_priorities(indexes, td_errors.cpu())
-
-            # update policy
-            _actions2, _log_probs2 = self.policy(states)
-            loss = (-self.q_1(states, Action(_actions2)) +
-                    self.temperature * _log_probs2).mean()
-            self.policy.reinforce(loss)
-
-            # adjust temperature
-            temperature_grad = (_log_probs + self.entropy_target).mean()
-            self.temperature += self.lr_temperature * temperature_grad.detach()
-
-            # additional debugging info
-            self.writer.add_scalar('loss/entropy', -_log_probs.mean())
-            self.writer.add_scalar('loss/v_mean', v_targets.mean())
-            self.writer.add_scalar('loss/r_mean', rewards.mean())
-            self.writer.add_scalar('loss/temperature_grad', temperature_grad)
-            self.writer.add_scalar('loss/temperature', self.temperature)
-            self.writer.add_scalar('loss/td_error', td_errors.mean())
-
-            self.writer.train_steps += 1
+            profiler = get_profiler()
+            # sample the minibatches of all the steps at once
+            for (states, actions, rewards, next_states,
+                 weights, indexes) in self.replay_buffer.sample_batches(
+                    self.minibatch_size, n_steps):
+
+                with profiler.timer("train/critic"):
+                    # Target actions come from *current* policy
+                    _actions, _log_probs = self.policy.no_grad(states)
+                    # compute targets for Q and V
+                    q_targets = rewards + self.discount_factor * \
+                        self.v.target(next_states)
+                    v_targets = torch.min(
+                        *self.qs.target(states, Action(_actions))
+                    ) - self.temperature * _log_probs
+
+                    # update Q and V-functions
+                    q_1_values, q_2_values = self.qs(states, actions)
+                    self.qs.reinforce(
+                        weighted_mse_loss(q_1_values, q_targets, weights) +
+                        weighted_mse_loss(q_2_values, q_targets, weights))
+                    self.v.reinforce(weighted_mse_loss(
+                        self.v(states), v_targets, weights))
+
+                    # update priorities
+                    td_errors = (q_targets - q_1_values).abs()
+                    self.replay_buffer.update_priorities(indexes, td_errors.cpu())
+
+                with profiler.timer("train/actor"):
+                    # update policy
+                    _actions2, _log_probs2 = self.policy(states)
+                    loss = (-self.qs.q1(states, Action(_actions2)) +
+                            self.temperature * _log_probs2).mean()
+                    self.policy.reinforce(loss)
+
+                    # adjust temperature
+                    temperature_grad = (_log_probs + self.entropy_target).mean()
+                    self.temperature += self.lr_temperature * temperature_grad.detach()
+
+                # additional debugging info
+                self.writer.add_scalar('loss/entropy', -_log_probs.mean())
+                self.writer.add_scalar('loss/v_mean', v_targets.mean())
+                self.writer.add_scalar('loss/r_mean', rewards.mean())
+                self.writer.add_scalar('loss/temperature_grad', temperature_grad)
+                self.writer.add_scalar('loss/temperature', self.temperature)
+                self.writer.add_scalar('loss/td_error', td_errors.mean())
+
+                self.writer.train_steps += 1
 
     def should_train(self):
         return len(self.replay_buffer) > self.replay_start_size
 
     def make_lazy_agent(self, evaluation=False, store_samples=True):
         policy_model = deepcopy(self.policy.model)
-        q_model = deepcopy(self.q_1.model)
+        q_model = self.qs.model.head(0)
         v_target_model = deepcopy(self.v._target._target)
         return SACLazyAgent(policy_model.to("cpu"),
                             q_model=q_model.to("cpu"),
@@ -139,17 +138,27 @@ class SAC(Agent):
                             evaluation=evaluation,
                             store_samples=store_samples)
 
+    def lazy_agent_models(self):
+        return {"_policy_model": self.policy.model,
+                "_q_model": self.qs.model.head_state_dict(0),
+                "_v_target_model": self.v._target._target}
+
     def load(self, dirname):
         for filename in os.listdir(dirname):
             if filename == 'policy.pt':
                 self.policy.model = torch.load(os.path.join(
                     dirname, filename), map_location=self.device)
-            if filename in ('q_1.pt'):
-                self.q_1.model = torch.load(os.path.join(dirname, filename),
-                                            map_location=self.device)
-            if filename in ('q_2.pt'):
-                self.q_1.model = torch.load(os.path.join(dirname, filename),
-                                            map_location=self.device)
+            if filename in ('qs.pt'):
+                self.qs.model = torch.load(os.path.join(dirname, filename),
+                                           map_location=self.device)
+
+        # the checkpoints of q_1 and q_2 saved separately
+        q_paths = [os.path.join(dirname, filename)
+                   for filename in ('q_1.pt', 'q_2.pt')]
+        if all(os.path.exists(path) for path in q_paths):
+            self.qs.model = TwinQContinuousModule.from_heads(
+                *[torch.load(path, map_location=self.device)
+                  for path in q_paths])
 
 
 class SACLazyAgent(LazyAgent):
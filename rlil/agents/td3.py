@@ -4,8 +4,9 @@ from copy import deepcopy
 from torch.distributions.normal import Normal
 from rlil.environments import Action
 from rlil.initializer import (
-    get_device, get_writer, get_replay_buffer, use_apex)
+    get_device, get_writer, get_replay_buffer, get_profiler, use_apex)
 from rlil.memory import ExperienceReplayBuffer
+from rlil.approximation.twin_q_continuous import TwinQContinuousModule
 from rlil.nn import weighted_mse_loss
 from rlil.utils import Samples
 from .base import Agent, LazyAgent
@@ -33,8 +34,7 @@ class TD3(Agent):
     https://arxiv.org/abs/1802.09477
 
     Args:
-        q_1 (QContinuous): An Approximation of the continuous action Q-function.
-        q_2 (QContinuous): An Approximation of the continuous action Q-function.
+        qs (TwinQContinuous): An Approximation of the twin continuous action Q-functions.
         policy (DeterministicPolicy): An Approximation of a deterministic policy.
         discount_factor (float): Discount factor for future rewards.
         minibatch_size (int): The number of experiences to sample in each training update.
@@ -45,8 +45,7 @@ class TD3(Agent):
     """
 
     def __init__(self,
-                 q_1,
-                 q_2,
+                 qs,
                  policy,
                  discount_factor=0.99,
                  minibatch_size=32,
@@ -56,8 +55,7 @@ class TD3(Agent):
                  replay_start_size=5000,
                  ):
         # objects
-        self.q_1 = q_1
-        self.q_2 = q_2
+        self.qs = qs
         self.policy = policy
         self.replay_buffer = get_replay_buffer()
         self.device = get_device()
@@ -93,53 +91,54 @@ class TD3(Agent):
         self._actions = Action(actions).to("cpu")
         return self._actions
 
-    def train(self):
-        self._train_count += 1
+    def train(self, n_steps=1):
         if self.should_train():
-            # sample transitions from buffer
-            (states, actions, rewards, next_states,
-             weights, indexes) = self.replay_buffer.sample(self.minibatch_size)
-
-            # Trick Three: Target Policy Smoothing
-            next_actions = self.policy.target(next_states)
-            next_actions += self._noise_td3.sample([next_actions.shape[0]])
-
-            # train q-network
-            # Trick One: clipped double q learning
-            q_targets = rewards + self.discount_factor * \
-                torch.min(self.q_1.target(next_states, Action(next_actions)),
-                          self.q_2.target(next_states, Action(next_actions)))
-            q_1_values = self.q_1(states, actions)
-            self.q_1.reinforce(weighted_mse_loss(
-                q_1_values, q_targets, weights))
-            q_2_values = self.q_2(states, actions)
-            self.q_2.reinforce(weighted_mse_loss(
-                q_2_values, q_targets, weights))
-
-            # update priorities
-            td_errors = (q_targets - q_1_values).abs()
-            self.replay_buffer.update_priorities(indexes, td_errors.cpu())
-
-            # train policy
-            # Trick Two: delayed policy updates
-            if self._train_count % self._policy_update_td3 == 0:
-                greedy_actions = self.policy(states)
-                loss = -self.q_1(states, Action(greedy_actions)).mean()
-                self.policy.reinforce(loss)
-
-            # additional debugging info
-            self.writer.add_scalar('loss/td_error', td_errors.mean())
-
-            self.writer.train_steps += 1
+            profiler = get_profiler()
+            # sample the minibatches of all the steps at once
+            for (states, actions, rewards, next_states,
+                 weights, indexes) in self.replay_buffer.sample_batches(
+                    self.minibatch_size, n_steps):
+                self._train_count += 1
+
+                with profiler.timer("train/critic"):
+                    # Trick Three: Target Policy Smoothing
+                    next_actions = self.policy.target(next_states)
+                    next_actions += self._noise_td3.sample([next_actions.shape[0]])
+
+                    # train q-network
+                    # Trick One: clipped double q learning
+                    q_targets = rewards + self.discount_factor * \
+                        torch.min(*self.qs.target(next_states, Action(next_actions)))
+                    q_1_values, q_2_values = self.qs(states, actions)
+                    self.qs.reinforce(
+                        weighted_mse_loss(q_1_values, q_targets, weights) +
+                        weighted_mse_loss(q_2_values, q_targets, weights))
+
+                    # update priorities
+                    td_errors = (q_targets - q_1_values).abs()
+                    self.replay_buffer.update_priorities(indexes, td_errors.cpu())
+
+                # train policy
+                # Trick Two: delayed policy updates
+                if self._train_count % self._policy_update_td3 == 0:
+                    with profiler.timer("train/actor"):
+                        greedy_actions = self.policy(states)
+                        loss = -self.qs.q1(states, Action(greedy_actions)).mean()
+                        self.policy.reinforce(loss)
+
+                # additional debugging info
+                self.writer.add_scalar('loss/td_error', td_errors.mean())
+
+                self.writer.train_steps += 1
 
     def should_train(self):
         return len(self.replay_buffer) > self.replay_start_size
 
     def make_lazy_agent(self, evaluation=False, store_samples=True):
         policy_model = deepcopy(self.policy.model)
-        q_model = deepcopy(self.q_1.model)
+        q_model = self.qs.model.head(0)
         policy_target_model = deepcopy(self.policy._target._target)
-        q_target_model = deepcopy(self.q_1._target._target)
+        q_target_model = self.qs._target._target.head(0)
         noise = Normal(0, self._noise_policy.stddev.to("cpu"))
         return DDPGLazyAgent(policy_model=policy_model.to("cpu"),
                              policy_target_model=policy_target_model.to("cpu"),
@@ -151,14 +150,25 @@ class TD3(Agent):
                              evaluation=evaluation,
                              store_samples=store_samples)
 
+    def lazy_agent_models(self):
+        return {"_policy_model": self.policy.model,
+                "_policy_target_model": self.policy._target._target,
+                "_q_model": self.qs.model.head_state_dict(0),
+                "_q_target_model": self.qs._target._target.head_state_dict(0)}
+
     def load(self, dirname):
         for filename in os.listdir(dirname):
             if filename == 'policy.pt':
                 self.policy.model = torch.load(os.path.join(
                     dirname, filename), map_location=self.device)
-            if filename in ('q_1.pt'):
-                self.q_1.model = torch.load(os.path.join(dirname, filename),
-                                            map_location=self.device)
-            if filename in ('q_2.pt'):
-                self.q_1.model = torch.load(os.path.join(dirname, filename),
-                                            map_location=self.device)
+            if filename in ('qs.pt'):
+                self.qs.model = torch.load(os.path.join(dirname, filename),
+                                           map_location=self.device)
+
+        # the checkpoints of q_1 and q_2 saved separately
+        q_paths = [os.path.join(dirname, filename)
+                   for filename in ('q_1.pt', 'q_2.pt')]
+        if all(os.path.exists(path) for path in q_paths):
+            self.qs.model = TwinQContinuousModule.from_heads(
+                *[torch.load(path, map_location=self.device)
+                  for path in q_paths])
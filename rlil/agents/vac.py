@@ -91,6 +91,10 @@ class VAC(Agent):
                             evaluation=evaluation,
                             store_samples=store_samples)
 
+    def lazy_agent_models(self):
+        return {"_policy_model": self.policy.model,
+                "_feature_model": self.feature_nw.model}
+
 
 class VacLazyAgent(LazyAgent):
     """ 
@@ -46,23 +46,22 @@ class VaeBC(Agent):
         vae_actions = vae_actions.mean(1)
         return Action(vae_actions)
 
-    def train(self):
-        (states, actions, _, _, _, _) = self.replay_buffer.sample(
-            self.minibatch_size)
-
-        # train vae
-        mean, log_var = self.encoder(
-            states.to(self.device), actions.to(self.device))
-        z = mean + (0.5 * log_var).exp() * torch.randn_like(log_var)
-        vae_actions = Action(self.decoder(states, z))
-        vae_mse = mse_loss(actions.features, vae_actions.features)
-        vae_kl = nn.kl_loss_vae(mean, log_var)
-        vae_loss = vae_mse + vae_kl
-        self.decoder.reinforce(vae_loss)
-        self.encoder.reinforce()
-        self.writer.add_scalar('loss/vae/mse', vae_mse.detach())
-        self.writer.add_scalar('loss/vae/kl', vae_kl.detach())
-        self.writer.train_steps += 1
+    def train(self, n_steps=1):
+        for (states, actions, _, _, _, _) in \
+                self.replay_buffer.sample_batches(self.minibatch_size, n_steps):
+            # train vae
+            mean, log_var = self.encoder(
+                states.to(self.device), actions.to(self.device))
+            z = mean + (0.5 * log_var).exp() * torch.randn_like(log_var)
+            vae_actions = Action(self.decoder(states, z))
+            vae_mse = mse_loss(actions.features, vae_actions.features)
+            vae_kl = nn.kl_loss_vae(mean, log_var)
+            vae_loss = vae_mse + vae_kl
+            self.decoder.reinforce(vae_loss)
+            self.encoder.reinforce()
+            self.writer.add_scalar('loss/vae/mse', vae_mse.detach())
+            self.writer.add_scalar('loss/vae/kl', vae_kl.detach())
+            self.writer.train_steps += 1
 
     def should_train(self):
         return True
@@ -71,6 +70,9 @@ class VaeBC(Agent):
         decoder_model = deepcopy(self.decoder.model)
         return VaeBcLazyAgent(decoder_model.to("cpu"), *args, **kwargs)
 
+    def lazy_agent_models(self):
+        return {"_decoder_model": self.decoder.model}
+
     def load(self, dirname):
         for filename in os.listdir(dirname):
             if filename in ('encoder.pt'):
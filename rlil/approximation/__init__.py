@@ -1,20 +1,35 @@
 from .approximation import Approximation
 from .ensemble_q_continuous import EnsembleQContinuous
 from .q_continuous import QContinuous
+from .twin_q_continuous import TwinQContinuous
 from .q_network import QNetwork
 from .v_network import VNetwork
 from .bcq_auto_encoder import BcqEncoder, BcqDecoder
 from .discriminator import Discriminator
-from .target import TargetNetwork, FixedTarget, PolyakTarget, TrivialTarget
-from .checkpointer import Checkpointer, DummyCheckpointer, PeriodicCheckpointer
+from .target import (TargetNetwork,
+                     FixedTarget,
+                     PolyakTarget,
+                     PolyakUpdates,
+                     TrivialTarget)
+from .checkpointer import (
+    Checkpointer,
+    DummyCheckpointer,
+    PeriodicCheckpointer,
+    CheckpointService,
+    list_checkpoints,
+    flush_checkpoints
+)
+from .compiler import Compiler
 from .feature_network import FeatureNetwork
 from .dynamics import Dynamics
+from .ensemble_dynamics import EnsembleDynamics
 
 
 __all__ = [
     "Approximation",
     "EnsembleQContinuous",
     "QContinuous",
+    "TwinQContinuous",
     "QNetwork",
     "VNetwork",
     "BcqEncoder",
@@ -23,10 +38,16 @@ __all__ = [
     "TargetNetwork",
     "FixedTarget",
     "PolyakTarget",
+    "PolyakUpdates",
     "TrivialTarget",
     "Checkpointer",
     "DummyCheckpointer",
     "PeriodicCheckpointer",
+    "CheckpointService",
+    "list_checkpoints",
+    "flush_checkpoints",
+    "Compiler",
     "FeatureNetwork",
-    "Dynamics"
+    "Dynamics",
+    "EnsembleDynamics"
 ]
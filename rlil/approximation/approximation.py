@@ -3,7 +3,8 @@ import torch
 from torch.nn import utils
 from .target import TrivialTarget
 from .checkpointer import PeriodicCheckpointer
-from rlil.initializer import get_writer
+from .compiler import Compiler
+from rlil.initializer import get_writer, get_profiler
 
 DEFAULT_CHECKPOINT_FREQUENCY = 200
 
@@ -27,7 +28,8 @@ class Approximation():
                 model parameters, e.g. SGD, Adam, RMSprop, etc.
             checkpointer: (:all.approximation.checkpointer.Checkpointer): A Checkpointer object
                 that periodically saves the model and its parameters to the disk. Default:
-                A PeriodicCheckpointer that saves the model once every 200 updates.
+                A PeriodicCheckpointer that saves the model and the optimizer
+                once every 200 train steps in the background.
             clip_grad: (float, optional): If non-zero, clips the norm of the
                 gradient to this value in order prevent large updates and
                 improve stability.
@@ -43,6 +45,10 @@ class Approximation():
                 to be used during optimization. A target network updates more slowly than
                 the base model that is being optimizing, allowing for a more stable
                 optimization target.
+            compile_options: (dict, optional): If not None, the forward passes of
+                the model and the target network, and the optimizer steps are
+                compiled by torch.compile with the options.
+                See rlil.approximation.Compiler.
     '''
 
     def __init__(
@@ -55,6 +61,7 @@ class Approximation():
             name='approximation',
             lr_scheduler=None,
             target=None,
+            compile_options=None,
     ):
         self.model = model
         self.device = next(model.parameters()).device
@@ -67,6 +74,10 @@ class Approximation():
         self._clip_grad = clip_grad
         self._writer = get_writer()
         self._name = name
+        self._compiler = None
+        if compile_options is not None:
+            self._compiler = Compiler(**compile_options)
+            self._target.compile(self._compiler)
 
         if checkpointer is None:
             checkpointer = PeriodicCheckpointer(DEFAULT_CHECKPOINT_FREQUENCY)
@@ -74,19 +85,25 @@ class Approximation():
         self._checkpointer.init(
             self.model,
             self._writer.log_dir,
-            name
+            name,
+            optimizer=optimizer
         )
 
     def __call__(self, *inputs):
         '''
         Run a forward pass of the model.
         '''
-        return self.model(*inputs)
+        return self._forward(*inputs)
 
     def no_grad(self, *inputs):
         '''Run a forward pass of the model in no_grad mode.'''
         with torch.no_grad():
+            return self._forward(*inputs)
+
+    def _forward(self, *inputs):
+        if self._compiler is None:
             return self.model(*inputs)
+        return self._compiler(self.model, *inputs)
 
     def eval(self, *inputs):
         '''
@@ -99,7 +116,7 @@ class Approximation():
             # switch to eval mode
             self.model.eval()
             # run forward pass
-            result = self.model(*inputs)
+            result = self._forward(*inputs)
             # change to original mode
             self.model.train(mode)
             return result
@@ -109,19 +126,29 @@ class Approximation():
         return self._target(*inputs)
 
     def reinforce(self, loss=None):
-        if loss is not None:
-            self._optimizer.zero_grad()
-            loss = self._loss_scaling * loss
-            self._writer.add_scalar("loss/" + self._name, loss.detach())
-            loss.backward()
-        self.step()
+        with get_profiler().timer("reinforce/" + self._name):
+            if loss is not None:
+                self._optimizer.zero_grad()
+                loss = self._loss_scaling * loss
+                self._writer.add_scalar("loss/" + self._name, loss.detach())
+                loss.backward()
+            self.step()
         return self
 
     def step(self):
         '''Given that a backward pass has been made, run an optimization step.'''
+        self._checkpointer.prepare()
         if self._clip_grad != 0:
             utils.clip_grad_norm_(self.model.parameters(), self._clip_grad)
-        self._optimizer.step()
+        profiler = get_profiler()
+        # the deferred target update of the previous step runs in flush
+        with profiler.timer("target_update/" + self._name):
+            self._target.flush()
+        with profiler.timer("optimizer_step/" + self._name):
+            if self._compiler is None:
+                self._optimizer.step()
+            else:
+                self._compiler.compile(self._optimizer.step)()
         self._target.update()
         if self._lr_scheduler:
             self._writer.add_scalar(
@@ -1,5 +1,6 @@
 import torch
 from .approximation import Approximation
+from rlil import nn
 from rlil.nn import RLNetwork
 from rlil.environments import squash_action
 
@@ -105,7 +106,8 @@ class BcqDecoderModule(RLNetwork):
             z = torch.randn(states.features.size(0), self.latent_dim,
                             device=self.device).clamp(-0.5, 0.5)
 
-        actions = self.model(torch.cat((states.features, z), dim=1))
+        actions = self.model(
+            nn.state_action_input(self.model, states.features, z))
         return squash_action(actions, self._tanh_scale, self._tanh_mean)
 
     def decode_multiple(self, states, num_decode=10):
@@ -115,10 +117,11 @@ class BcqDecoderModule(RLNetwork):
             states.features.size(0), num_decode, self.latent_dim,
             device=self.device).clamp(-0.5, 0.5)
 
+        # (batch x num_decode) x d
+        x = nn.state_action_input(
+            self.model, states.features, z.view(-1, self.latent_dim))
         # batch x num_decode x d
-        repeated_states = torch.repeat_interleave(
-            states.features.unsqueeze(1), num_decode, 1)
-        actions = self.model(torch.cat((repeated_states, z), dim=2))
+        actions = self.model(x).view(z.shape[0], num_decode, -1)
         return squash_action(actions, self._tanh_scale, self._tanh_mean), \
             actions
 
@@ -1,13 +1,24 @@
+import atexit
+import glob
+import queue
+import threading
 import warnings
+import weakref
 from abc import abstractmethod, ABC
+from copy import deepcopy
 import torch
 import os
-from rlil.initializer import get_writer
+from rlil.initializer import get_writer, get_replay_buffer
+from rlil.utils.writer import DummyWriter
 
 
 class Checkpointer(ABC):
     @abstractmethod
-    def init(self, model, filename):
+    def init(self, model, log_dir, filename, optimizer=None):
+        pass
+
+    def prepare(self):
+        '''Called before each optimization step of the model'''
         pass
 
     @abstractmethod
@@ -16,7 +27,7 @@ class Checkpointer(ABC):
 
 
 class DummyCheckpointer(Checkpointer):
-    def init(self, *inputs):
+    def init(self, *inputs, **kwargs):
         pass
 
     def __call__(self):
@@ -24,15 +35,38 @@ class DummyCheckpointer(Checkpointer):
 
 
 class PeriodicCheckpointer(Checkpointer):
-    def __init__(self, frequency):
+    """
+    PeriodicCheckpointer saves the model every frequency train steps.
+
+    The checkpoints are saved by the CheckpointService of the writer,
+    which is shared by all the approximations of the agent.
+    The training thread only copies the state_dicts on the device,
+    and the files are written by a background thread.
+    Nothing is saved with DummyWriter, which is shared by the agents
+    built without the writer of an experiment.
+
+    Args:
+        frequency (int): Train steps between the checkpoints.
+        keep_checkpoints (int): Number of the checkpoint bundles kept
+            in log_dir/checkpoints. The largest one of the approximations
+            sharing the writer is used.
+    """
+
+    def __init__(self, frequency, keep_checkpoints=5):
         self.frequency = frequency
+        self.keep_checkpoints = keep_checkpoints
         self._writer = get_writer()
         self._log_dir = None
         self._filename = None
         self._model = None
+        self._optimizer = None
+        self._service = None
+        # cpu copy of the model written as log_dir/filename.pt
+        self._cpu_model = None
 
-    def init(self, model, log_dir, filename):
+    def init(self, model, log_dir, filename, optimizer=None):
         self._model = model
+        self._optimizer = optimizer
         self._log_dir = log_dir
         self._filename = filename
         # Some builds of pytorch throw this unhelpful warning.
@@ -40,16 +74,222 @@ class PeriodicCheckpointer(Checkpointer):
         # https://discuss.pytorch.org/t/got-warning-couldnt-retrieve-source-code-for-container/7689/7
         warnings.filterwarnings(
             "ignore", message="Couldn't retrieve source code")
+        if isinstance(self._writer, DummyWriter):
+            return
+        self._service = get_checkpoint_service(self._writer)
+        self._service.register(self)
+
+    def prepare(self):
+        if self._service is not None:
+            self._service.prepare(self._writer)
 
     def __call__(self):
-        # save pereodically
-        # if self._writer.train_steps % self.frequency == 0:
-        #     save_dir = os.path.join(self._log_dir, str(self._writer.train_steps))
-        #     if not os.path.exists(save_dir):
-        #         os.makedirs(save_dir)
-        #     torch.save(self._model, os.path.join(
-        #         save_dir, self._filename) + ".pt")
-
-        if self._writer.train_steps % self.frequency == 0:
-            torch.save(self._model,
-                       os.path.join(self._log_dir, self._filename + ".pt"))
+        if self._service is not None and \
+                self._writer.train_steps % self.frequency == 0:
+            self._service.add(self)
+
+    @property
+    def name(self):
+        return self._filename
+
+    def snapshot(self):
+        '''Copy the state_dicts of the model and the optimizer'''
+        return (_clone(self._model.state_dict()),
+                None if self._optimizer is None
+                else _clone(self._optimizer.state_dict()))
+
+    def cpu_model(self):
+        '''Return the cpu copy of the model to load the snapshots'''
+        if self._cpu_model is None:
+            self._cpu_model = deepcopy(self._model).to("cpu")
+        return self._cpu_model
+
+
+class CheckpointService:
+    """
+    CheckpointService coalesces the snapshots of the approximations
+    sharing a writer into a bundle of each train step, and writes
+    the bundles from a background thread.
+
+    A bundle is a dict of
+        train_steps, models ({name: state_dict}),
+        optimizers ({name: state_dict}) and metadata
+    saved as log_dir/checkpoints/checkpoint_{train_steps}.pt.
+    The latest keep_checkpoints bundles are kept, where keep_checkpoints
+    is the largest one of the checkpointers in the bundle.
+    Each model is also saved as log_dir/{name}.pt, which Agent.load reads.
+    The files are written to temporary files and renamed,
+    so that a crash doesn't leave a broken checkpoint.
+
+    The snapshot of each approximation is taken right after its update
+    in the train step. The approximations which are not updated
+    in the step, e.g. the delayed policy of TD3, are copied before
+    the first update of the next step, so that all the models in a bundle
+    are of the same train step.
+
+    The bundles hold the copies on the device until they are written.
+    When max_pending_bundles bundles are waiting for the background thread,
+    finishing the next bundle blocks the training thread,
+    so that a slow disk doesn't grow the device memory.
+
+    Args:
+        log_dir (str): Directory of the checkpoints.
+        max_pending_bundles (int): Number of the bundles waiting
+            for the background thread.
+    """
+
+    def __init__(self, log_dir, max_pending_bundles=1):
+        assert max_pending_bundles > 0, \
+            "max_pending_bundles must be positive"
+        self._log_dir = log_dir
+        self._checkpoint_dir = os.path.join(log_dir, "checkpoints")
+        self._checkpointers = weakref.WeakValueDictionary()
+        # train_steps, writer and snapshots of the bundle being made
+        self._version = None
+        self._writer = None
+        self._snapshots = {}
+        self._queue = queue.Queue(maxsize=max_pending_bundles)
+        self._error = None
+        self._thread = threading.Thread(target=self._write_loop,
+                                        daemon=True)
+        self._thread.start()
+
+    def register(self, checkpointer):
+        self._checkpointers[checkpointer.name] = checkpointer
+
+    def prepare(self, writer):
+        '''Finish the bundle of the previous train step'''
+        if self._version is not None \
+                and writer.train_steps != self._version:
+            self._finish_bundle()
+
+    def add(self, checkpointer):
+        '''Add the snapshot of the checkpointer to the bundle'''
+        writer = checkpointer._writer
+        self.prepare(writer)
+        self._version = writer.train_steps
+        self._writer = writer
+        self._snapshots[checkpointer.name] = \
+            (checkpointer, checkpointer.snapshot())
+
+    def flush(self):
+        '''Write all the bundles and wait for the background thread'''
+        if self._version is not None:
+            self._finish_bundle()
+        self._queue.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _finish_bundle(self):
+        # copy the approximations which are not updated in the step
+        for name, checkpointer in list(self._checkpointers.items()):
+            if name not in self._snapshots:
+                self._snapshots[name] = (checkpointer, checkpointer.snapshot())
+
+        metadata = {"sample_frames": self._writer.sample_frames,
+                    "sample_episodes": self._writer.sample_episodes}
+        try:
+            replay_buffer = get_replay_buffer()
+            metadata["replay_buffer"] = {
+                "size": len(replay_buffer),
+                "capacity": replay_buffer.get_buffer_size()}
+        except ValueError:
+            # replay_buffer is not set
+            pass
+
+        bundle = {"train_steps": self._version,
+                  "models": {},
+                  "optimizers": {},
+                  "metadata": metadata}
+        cpu_models = {}
+        keep_checkpoints = 1
+        for name, (checkpointer, (model, optimizer)) \
+                in self._snapshots.items():
+            bundle["models"][name] = model
+            if optimizer is not None:
+                bundle["optimizers"][name] = optimizer
+            cpu_models[name] = checkpointer.cpu_model()
+            keep_checkpoints = max(keep_checkpoints,
+                                   checkpointer.keep_checkpoints)
+        # blocks while max_pending_bundles bundles are not written
+        self._queue.put((bundle, cpu_models, keep_checkpoints))
+        self._version = None
+        self._writer = None
+        self._snapshots = {}
+
+    def _write_loop(self):
+        while True:
+            bundle, cpu_models, keep_checkpoints = self._queue.get()
+            try:
+                self._write(bundle, cpu_models, keep_checkpoints)
+            except Exception as e:
+                # raised by flush in the training thread
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write(self, bundle, cpu_models, keep_checkpoints):
+        bundle = _clone(bundle, device="cpu")
+        os.makedirs(self._checkpoint_dir, exist_ok=True)
+        _atomic_save(bundle, os.path.join(
+            self._checkpoint_dir,
+            "checkpoint_{}.pt".format(bundle["train_steps"])))
+
+        for name, state_dict in bundle["models"].items():
+            model = cpu_models[name]
+            model.load_state_dict(state_dict)
+            _atomic_save(model, os.path.join(self._log_dir, name + ".pt"))
+
+        for path in list_checkpoints(self._log_dir)[:-keep_checkpoints]:
+            os.remove(path)
+
+
+def list_checkpoints(log_dir):
+    '''Return the paths of the bundles in log_dir from the oldest'''
+    paths = glob.glob(os.path.join(log_dir, "checkpoints",
+                                   "checkpoint_*.pt"))
+    return sorted(paths, key=lambda path: int(
+        os.path.basename(path)[len("checkpoint_"):-len(".pt")]))
+
+
+# the services of the writers alive.
+# A service holds its writer while a bundle is being made.
+_SERVICES = weakref.WeakKeyDictionary()
+
+
+def get_checkpoint_service(writer):
+    '''Return the CheckpointService of the writer'''
+    if writer not in _SERVICES:
+        _SERVICES[writer] = CheckpointService(writer.log_dir)
+    return _SERVICES[writer]
+
+
+@atexit.register
+def flush_checkpoints():
+    '''Write the pending checkpoints of all the writers'''
+    for service in list(_SERVICES.values()):
+        service.flush()
+
+
+def _clone(obj, device=None):
+    # copy the tensors in the nested state_dicts
+    if torch.is_tensor(obj):
+        obj = obj.detach()
+        return obj.clone() if device is None else obj.to(device, copy=True)
+    if isinstance(obj, dict):
+        cloned = type(obj)((key, _clone(value, device))
+                           for key, value in obj.items())
+        # keep _metadata of the OrderedDict returned by Module.state_dict
+        if hasattr(obj, "_metadata"):
+            cloned._metadata = obj._metadata
+        return cloned
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_clone(value, device) for value in obj)
+    return obj
+
+
+def _atomic_save(obj, path):
+    tmp_path = path + ".tmp"
+    torch.save(obj, tmp_path)
+    os.replace(tmp_path, path)
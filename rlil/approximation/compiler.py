@@ -0,0 +1,40 @@
+import torch
+
+
+class Compiler:
+    """
+    Run the forward passes of modules and the optimizer steps
+    compiled by torch.compile.
+
+    The graphs are compiled for static shapes by default, so the
+    minibatches should have a fixed size such as those of
+    ExperienceReplayBuffer.sample_batches. On cuda, options such as
+    mode="reduce-overhead" capture the graphs with CUDA graphs, which
+    copy the inputs into static buffers. On cpu, the default inductor
+    backend generates C++ kernels, which needs a C++ compiler.
+    A module is compiled again when it's replaced, e.g. by Agent.load.
+
+    Args:
+        options (dict): Keyword arguments of torch.compile.
+    """
+
+    def __init__(self, **options):
+        options.setdefault("dynamic", False)
+        self._options = options
+        self._compiled = {}
+
+    def compile(self, fn):
+        '''Return fn compiled once, e.g. a module or optimizer.step'''
+        owner = getattr(fn, "__self__", fn)
+        key = (id(owner), getattr(fn, "__name__", None))
+        cached = self._compiled.get(key)
+        if cached is None or cached[0] is not owner:
+            self._compiled[key] = (owner, torch.compile(fn, **self._options))
+        return self._compiled[key][1]
+
+    def __call__(self, module, *inputs):
+        return self.compile(module)(*inputs)
+
+    def __getstate__(self):
+        # the compiled functions are not picklable
+        return {"_options": self._options, "_compiled": {}}
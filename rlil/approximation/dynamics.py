@@ -1,4 +1,5 @@
 import torch
+from torch.nn.functional import mse_loss
 from rlil.environments import State
 from rlil.nn import RLNetwork
 from .approximation import Approximation
@@ -20,6 +21,11 @@ class Dynamics(Approximation):
             **kwargs
         )
 
+    def loss(self, states, actions, next_states):
+        '''Mean squared error of the predicted next states'''
+        predictions = self(states, actions)
+        return mse_loss(next_states.features, predictions.features)
+
 
 class DynamicsModule(RLNetwork):
     def forward(self, states, actions):
@@ -0,0 +1,123 @@
+import torch
+from torch.nn.functional import softplus
+from rlil.environments import State
+from rlil.nn import RLNetwork
+from .approximation import Approximation
+
+
+class EnsembleDynamics(Approximation):
+    """
+    An ensemble of probabilistic dynamics models (PE).
+    This implementation is based on: https://arxiv.org/abs/1805.12114.
+    Each model outputs a gaussian over the state differences.
+    All the models are evaluated by one forward pass of
+    nn.EnsembleLinear layers.
+
+    Calling the approximation samples the next states by trajectory
+    sampling (TS-inf): the i-th state of a batch is always propagated
+    by the (i % num_models)-th model, so that a particle keeps its
+    model over the horizon. Repeat the states to propagate
+    multiple particles, e.g. RsMPC(num_particles=...).
+
+    Args:
+        model (nn.Sequential): nn.Sequential of nn.EnsembleLinear with
+            2 x state_dim outputs, e.g. fc_ensemble_dynamics(env).
+        bootstrap (bool): If True, each model is trained on its own
+            minibatch resampled with replacement from the given one, as in
+            PETS. Otherwise, all the models are trained on the same
+            minibatch and differ only by their initialization.
+    """
+
+    def __init__(
+            self,
+            model,
+            optimizer,
+            name='dynamics',
+            bootstrap=True,
+            **kwargs
+    ):
+        model = EnsembleDynamicsModule(model)
+        super().__init__(
+            model,
+            optimizer,
+            name=name,
+            **kwargs
+        )
+        self._bootstrap = bootstrap
+
+    def loss(self, states, actions, next_states):
+        '''Gaussian negative log likelihood summed over the models'''
+        features = states.features.float()
+        action_features = actions.features.float()
+        diffs = (next_states.features - states.features).float()
+        if self._bootstrap:
+            # num_models x batch_size indexes of the bootstrap minibatches
+            indexes = torch.randint(
+                len(features), (self.model.num_models, len(features)),
+                device=features.device)
+            features = features[indexes]
+            action_features = action_features[indexes]
+            diffs = diffs[indexes]
+        means, log_vars = self.model.dist(features, action_features)
+        nll = ((means - diffs) ** 2 * torch.exp(-log_vars) + log_vars)
+        return nll.mean(dim=(1, 2)).sum()
+
+
+class EnsembleDynamicsModule(RLNetwork):
+    def __init__(self, model):
+        super().__init__(model)
+        self.num_models = model[0].num_models
+        state_dim = model[-1].out_features // 2
+        device = next(model.parameters()).device
+        self.register_buffer(
+            "max_log_var", torch.full((state_dim, ), 0.5, device=device))
+        self.register_buffer(
+            "min_log_var", torch.full((state_dim, ), -10., device=device))
+
+    def dist(self, states, actions):
+        """
+        Return the means and the log variances of the state differences.
+
+        Args:
+            states (rlil.environments.State): batch_size states, or
+                num_models x batch_size features as a torch.Tensor.
+            actions (rlil.environments.Action): batch_size actions, or
+                the features in the same shape as states.
+
+        Returns:
+            tuple of torch.Tensor: num_models x batch_size x state_dim.
+        """
+        if isinstance(states, State):
+            states = states.features.float()
+            actions = actions.features.float()
+        x = torch.cat((states, actions), dim=-1)
+        means, log_vars = self.model(x).chunk(2, dim=-1)
+        # soft clipping used by PETS with fixed bounds
+        log_vars = self.max_log_var - softplus(self.max_log_var - log_vars)
+        log_vars = self.min_log_var + softplus(log_vars - self.min_log_var)
+        return means, log_vars
+
+    def forward(self, states, actions):
+        features = states.features.float()
+        action_features = actions.features.float()
+        batch_size = len(features)
+        if batch_size % self.num_models == 0:
+            # the i-th particle to the (i % num_models)-th model
+            def to_models(x):
+                return x.view(batch_size // self.num_models,
+                              self.num_models, -1).transpose(0, 1)
+            means, log_vars = self.dist(to_models(features),
+                                        to_models(action_features))
+            diffs = means + torch.randn_like(means) * (0.5 * log_vars).exp()
+            diffs = diffs.transpose(0, 1).reshape(batch_size, -1)
+        else:
+            means, log_vars = self.dist(features, action_features)
+            diffs = means + torch.randn_like(means) * (0.5 * log_vars).exp()
+            indexes = torch.arange(batch_size, device=features.device)
+            diffs = diffs[indexes % self.num_models, indexes]
+
+        return State(
+            states.features + diffs,
+            mask=states.mask,
+            info=states.info
+        )
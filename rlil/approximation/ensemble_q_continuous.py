@@ -1,4 +1,5 @@
 import torch
+from rlil import nn
 from rlil.nn import RLNetwork
 from .approximation import Approximation
 
@@ -6,7 +7,7 @@ from .approximation import Approximation
 class EnsembleQContinuous(Approximation):
     def __init__(
             self,
-            models: torch.nn.ModuleList,
+            models,
             optimizer,
             name='ensemble_q',
             **kwargs
@@ -24,17 +25,44 @@ class EnsembleQContinuous(Approximation):
 
 
 class EnsembleQContinuousModule(RLNetwork):
+    """
+    Q-functions of an ensemble. The model is either
+    an nn.Sequential of nn.EnsembleLinear (see fc_ensemble_q),
+    which evaluates all the Q-functions at once, or an nn.ModuleList
+    of Q-functions evaluated one by one.
+    If len(actions) == k * len(states), each state is repeated k times.
+    """
+
     def forward(self, states, actions):
+        mask = nn.repeat_to(states.mask.float(), len(actions))
+        if not isinstance(self.model, nn.ModuleList):
+            x = nn.state_action_input(self.model, states.features.float(),
+                                      actions.features.float())
+            # num_q x batch x 1 -> batch x num_q
+            all_qs = self.model(x).squeeze(-1).t()
+            return all_qs * mask.unsqueeze(-1)
+
+        x = nn.state_action_input(None, states.features.float(),
+                                  actions.features.float())
         all_qs = []
-        x = torch.cat((states.features.float(),
-                       actions.features.float()), dim=1)
         for m in self.model:
-            all_qs.append((m(x).squeeze(-1)
-                           * states.mask.float()).unsqueeze(1))
+            all_qs.append((m(x).squeeze(-1) * mask).unsqueeze(1))
         all_qs = torch.cat(all_qs, dim=1)
         return all_qs  # batch x num_q
 
     def q1(self, states, actions):
-        x = torch.cat((states.features.float(),
-                       actions.features.float()), dim=1)
-        return self.model[0](x).squeeze(-1) * states.mask.float()
+        if not isinstance(self.model, nn.ModuleList):
+            return self(states, actions)[:, 0]
+        x = nn.state_action_input(self.model[0], states.features.float(),
+                                  actions.features.float())
+        mask = nn.repeat_to(states.mask.float(), len(actions))
+        return self.model[0](x).squeeze(-1) * mask
+
+    def stacked(self):
+        """
+        Return the module whose model is converted by nn.stack_ensemble.
+        This is used to load the checkpoints saved with nn.ModuleList.
+        """
+        if not isinstance(self.model, nn.ModuleList):
+            return self
+        return EnsembleQContinuousModule(nn.stack_ensemble(self.model))
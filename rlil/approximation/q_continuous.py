@@ -1,4 +1,5 @@
 import torch
+from rlil import nn
 from rlil.nn import RLNetwork
 from .approximation import Approximation
 
@@ -21,7 +22,13 @@ class QContinuous(Approximation):
 
 
 class QContinuousModule(RLNetwork):
+    """
+    If len(actions) == k * len(states), each state is repeated k times.
+    See nn.state_action_input.
+    """
+
     def forward(self, states, actions):
-        x = torch.cat((states.features.float(),
-                       actions.features.float()), dim=1)
-        return self.model(x).squeeze(-1) * states.mask.float()
+        x = nn.state_action_input(self.model, states.features.float(),
+                                  actions.features.float())
+        mask = nn.repeat_to(states.mask.float(), len(actions))
+        return self.model(x).squeeze(-1) * mask
@@ -1,4 +1,4 @@
 from .abstract import TargetNetwork
 from .fixed import FixedTarget
-from .polyak import PolyakTarget
+from .polyak import PolyakTarget, PolyakUpdates
 from .trivial import TrivialTarget
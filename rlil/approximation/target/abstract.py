@@ -2,6 +2,8 @@ from abc import abstractmethod, ABC
 
 
 class TargetNetwork(ABC):
+    _compiler = None
+
     @abstractmethod
     def __call__(self, *inputs):
         pass
@@ -13,3 +15,15 @@ class TargetNetwork(ABC):
     @abstractmethod
     def update(self):
         pass
+
+    def flush(self):
+        '''Apply the deferred updates before the source model is updated'''
+
+    def compile(self, compiler):
+        '''Run the forward passes with a rlil.approximation.Compiler'''
+        self._compiler = compiler
+
+    def _forward(self, *inputs):
+        if self._compiler is None:
+            return self._target(*inputs)
+        return self._compiler(self._target, *inputs)
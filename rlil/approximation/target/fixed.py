@@ -12,7 +12,7 @@ class FixedTarget(TargetNetwork):
 
     def __call__(self, *inputs):
         with torch.no_grad():
-            return self._target(*inputs)
+            return self._forward(*inputs)
 
     def init(self, model):
         self._source = model
@@ -1,27 +1,91 @@
 import copy
+import threading
+from collections import defaultdict
 import torch
 from .abstract import TargetNetwork
 
 
+class PolyakUpdates:
+    '''
+    Deferred updates of PolyakTargets.
+
+    The pending updates of the PolyakTargets sharing a PolyakUpdates,
+    e.g. those of the policy and the Q-functions of an agent, are applied
+    together by one torch._foreach_lerp_ call per rate instead of
+    a python loop over the parameters of each target network.
+    The targets can be flushed from the sampler and the learner threads.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def add(self, target):
+        with self._lock:
+            self._pending[id(target)] = target
+
+    def is_pending(self, target):
+        with self._lock:
+            return id(target) in self._pending
+
+    def flush(self):
+        # the lock is held while updating so that the updates are
+        # applied once even if the sampler thread reads the targets
+        with self._lock:
+            if not self._pending:
+                return
+            groups = defaultdict(lambda: ([], []))
+            for target in self._pending.values():
+                target_params, source_params = groups[target._rate]
+                target_params += target._target_params
+                source_params += target._source_params
+            self._pending = {}
+            with torch.no_grad():
+                for rate, (target_params, source_params) in groups.items():
+                    # target + rate * (source - target)
+                    torch._foreach_lerp_(target_params, source_params, rate)
+
+
 class PolyakTarget(TargetNetwork):
-    '''TargetNetwork that updates using polyak averaging'''
+    '''
+    TargetNetwork that updates using polyak averaging.
+
+    update() defers the averaging until the target network is used or
+    its source model is updated again, so that the targets updated in
+    a train step are averaged at once. See PolyakUpdates.
+
+    Args:
+        rate (float): Speed with which to update the target network
+            towards the source model.
+        updates (PolyakUpdates, optional): PolyakUpdates shared by
+            the targets of an agent. If None, the target has its own one.
+    '''
 
-    def __init__(self, rate):
+    def __init__(self, rate, updates=None):
         self._source = None
-        self._target = None
+        self._target_model = None
         self._rate = rate
+        self._updates = PolyakUpdates() if updates is None else updates
+
+    @property
+    def _target(self):
+        self._updates.flush()
+        return self._target_model
 
     def __call__(self, *inputs):
         with torch.no_grad():
-            return self._target(*inputs)
+            return self._forward(*inputs)
 
     def init(self, model):
         self._source = model
-        self._target = copy.deepcopy(model)
+        self._target_model = copy.deepcopy(model)
+        self._target_params = list(self._target_model.parameters())
+        self._source_params = list(self._source.parameters())
 
     def update(self):
-        for target_param, source_param in zip(self._target.parameters(), self._source.parameters()):
-            target_param.data.copy_(
-                target_param.data * (1.0 - self._rate) +
-                source_param.data * self._rate
-            )
+        self._updates.add(self)
+
+    def flush(self):
+        # the pending update must use the source before the step
+        if self._updates.is_pending(self):
+            self._updates.flush()
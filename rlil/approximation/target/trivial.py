@@ -8,7 +8,7 @@ class TrivialTarget(TargetNetwork):
 
     def __call__(self, *inputs):
         with torch.no_grad():
-            return self._target(*inputs)
+            return self._forward(*inputs)
 
     def init(self, model):
         self._target = model
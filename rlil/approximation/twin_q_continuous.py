@@ -0,0 +1,83 @@
+import torch
+from rlil import nn
+from rlil.nn import RLNetwork
+from .approximation import Approximation
+from .q_continuous import QContinuousModule
+
+
+class TwinQContinuous(Approximation):
+    """
+    Two continuous action Q-functions for clipped double Q-learning.
+    Both Q-functions are evaluated by one forward pass and
+    updated by one backward pass and one optimizer step.
+
+    Args:
+        model (nn.Sequential): nn.Sequential of nn.EnsembleLinear
+            with num_models=2, e.g. fc_ensemble_q(env, num_qs=2).
+    """
+
+    def __init__(
+            self,
+            model,
+            optimizer,
+            name='qs',
+            **kwargs
+    ):
+        model = TwinQContinuousModule(model)
+        super().__init__(
+            model,
+            optimizer,
+            name=name,
+            **kwargs
+        )
+
+    def q1(self, *args, **kwargs):
+        return self.model.q1(*args, **kwargs)
+
+
+class TwinQContinuousModule(RLNetwork):
+    """
+    If len(actions) == k * len(states), each state is repeated k times.
+    See nn.state_action_input.
+    """
+
+    def forward(self, states, actions):
+        x = nn.state_action_input(self.model, states.features.float(),
+                                  actions.features.float())
+        mask = nn.repeat_to(states.mask.float(), len(actions))
+        # 2 x batch x 1 -> 2 x batch
+        qs = self.model(x).squeeze(-1) * mask
+        return qs[0], qs[1]
+
+    def q1(self, states, actions):
+        '''Compute q_1 only, e.g. for the actor losses'''
+        x = nn.state_action_input(self.model, states.features.float(),
+                                  actions.features.float())
+        mask = nn.repeat_to(states.mask.float(), len(actions))
+        return nn.ensemble_model_forward(self.model, x, 0).squeeze(-1) * mask
+
+    def head(self, index):
+        """
+        Return a copy of a Q-function as a QContinuousModule,
+        e.g. for the lazy_agents and the checkpoints of q_1 and q_2.
+
+        Args:
+            index (int): 0 for q_1 and 1 for q_2.
+        """
+        return QContinuousModule(nn.unstack_ensemble(self.model, index))
+
+    def head_state_dict(self, index):
+        """
+        Return the state_dict of self.head(index) as views of the weights,
+        e.g. for broadcasting the weights to the lazy_agents.
+
+        Args:
+            index (int): 0 for q_1 and 1 for q_2.
+        """
+        return {"model." + key: value for key, value
+                in nn.unstacked_state_dict(self.model, index).items()}
+
+    @classmethod
+    def from_heads(cls, q_1, q_2):
+        '''Stack two QContinuousModules, e.g. loaded from q_1.pt and q_2.pt'''
+        return cls(nn.stack_ensemble([q_1.model, q_2.model]))
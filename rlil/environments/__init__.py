@@ -104,4 +104,11 @@ ENVS = {
 REWARDS = {
     "Pendulum-v0": PendulumReward,
     "MountainCarContinuous-v0": MountainCarContinuousReward,
-}
\ No newline at end of file
+}
+
+# termination functions of the envs in REWARDS,
+# which return True for the next_states ending the episode
+TERMINATIONS = {
+    "Pendulum-v0": PendulumTermination,
+    "MountainCarContinuous-v0": MountainCarContinuousTermination,
+}
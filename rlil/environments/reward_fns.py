@@ -34,3 +34,23 @@ class MountainCarContinuousReward:
         rewards += goals * 100.0
         rewards -= actions.features[:, 0] ** 2 * 0.1
         return rewards
+
+
+class PendulumTermination:
+    def __call__(self, states, next_states, actions):
+        # Pendulum-v0 never terminates
+        return torch.zeros(len(states), dtype=torch.bool,
+                           device=states.features.device)
+
+
+class MountainCarContinuousTermination:
+    def __init__(self):
+        self.goal_position = 0.45
+        self.goal_velocity = 0
+
+    def __call__(self, states, next_states, actions):
+        # the episode ends when the car reaches the goal
+        positions = next_states.features[:, 0]
+        velocities = next_states.features[:, 1]
+        return (positions >= self.goal_position) & (
+            velocities >= self.goal_velocity)
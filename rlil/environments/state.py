@@ -1,6 +1,7 @@
 import numpy as np
 import torch
 from rlil.initializer import is_debug_mode, get_device
+from rlil.utils import cached_ones
 from copy import deepcopy
 
 
@@ -46,11 +47,7 @@ class State:
         self._raw = raw
 
         if mask is None:
-            self._mask = torch.ones(
-                len(raw),
-                dtype=torch.bool,
-                device=raw.device
-            )
+            self._mask = cached_ones(len(raw), torch.bool, raw.device)
         else:
             self._mask = mask.bool()
 
@@ -75,9 +72,10 @@ class State:
                    info=None,
                    device="cpu",
                    dtype=np.float32):
-        raw = torch.as_tensor(np_raw.astype(dtype), device=device)
-        mask = ~torch.tensor(np_done, dtype=torch.bool,
-                             device=device).reshape(-1) if np_done is not None else None
+        # no copy if np_raw is already dtype
+        raw = torch.as_tensor(np_raw.astype(dtype, copy=False), device=device)
+        mask = torch.as_tensor(np.asarray(np_done).reshape(-1) == 0,
+                               device=device) if np_done is not None else None
         info = info if info is not None else [None] * len(raw)
         return cls(raw, mask=mask, info=info)
 
@@ -1,7 +1,11 @@
 from .experiment import Experiment
 from .trainer import Trainer
+from .throughput import ThroughputMeter
+from .evaluation import EvaluationScheduler
 
 __all__ = [
     "Experiment",
-    "Trainer"
+    "Trainer",
+    "ThroughputMeter",
+    "EvaluationScheduler"
 ]
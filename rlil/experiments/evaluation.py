@@ -0,0 +1,121 @@
+import time
+
+
+class EvaluationScheduler:
+    """
+    EvaluationScheduler starts the evaluations of the agent on a cadence
+    of sample frames, train steps or seconds, and collects the results
+    without blocking the training.
+
+    A new evaluation starts only when the previous one has finished,
+    so the agent is copied for the workers once per evaluation.
+    The results are cached by the policy version, i.e. train_steps
+    at the start of the evaluation, and a policy which has been
+    evaluated is not evaluated again.
+    The evaluation workers don't start while the fraction of the time
+    they spent in sampling exceeds max_busy_fraction.
+
+    Args:
+        eval_sampler (rlil.samplers.AsyncSampler): Sampler for evaluation.
+            e.g. AsyncSampler(env, num_envs=10, nice=10) evaluates the
+            episodes in lockstep with a low priority.
+        frame_interval (int, optional): Sample frames between evaluations.
+        step_interval (int, optional): Train steps between evaluations.
+        seconds_interval (float, optional): Seconds between evaluations.
+            If all the intervals are None, an evaluation starts as soon
+            as the previous one finishes.
+        num_episodes (int): Episodes per worker in an evaluation.
+        max_busy_fraction (float): Maximum fraction of the time
+            the evaluation workers spend in sampling.
+    """
+
+    def __init__(self,
+                 eval_sampler,
+                 frame_interval=None,
+                 step_interval=None,
+                 seconds_interval=None,
+                 num_episodes=10,
+                 max_busy_fraction=1.0):
+        self._sampler = eval_sampler
+        self._frame_interval = frame_interval
+        self._step_interval = step_interval
+        self._seconds_interval = seconds_interval
+        self._num_episodes = num_episodes
+        self._max_busy_fraction = max_busy_fraction
+        self._start_time = time.time()
+        # start_info and time of the latest evaluation
+        self._last_info = None
+        self._last_time = None
+        # number of the workers running the latest evaluation
+        self._running = 0
+        self._sample_info = None
+        # {train_steps: sample_info} of the finished evaluations
+        self.results = {}
+
+    def evaluate(self, agent, start_info):
+        """
+        Start an evaluation if it is due, and return the results of
+        the finished evaluations. This method doesn't wait for the workers.
+
+        Args:
+            agent (rlil.agents.Agent): Agent to be evaluated.
+            start_info (rlil.samplers.StartInfo): Current sample_frames,
+                sample_episodes and train_steps.
+
+        Returns:
+            list of (start_info, sample_info)
+        """
+        finished = self._collect()
+        if self._running == 0 and self._due(start_info):
+            self._start(agent, start_info)
+        return finished
+
+    def _due(self, start_info):
+        if start_info.train_steps in self.results:
+            # the same policy has been evaluated
+            return False
+        if self._busy_fraction() > self._max_busy_fraction:
+            return False
+        if self._last_info is None:
+            return True
+        intervals = [
+            (self._frame_interval, start_info.sample_frames
+             - self._last_info.sample_frames),
+            (self._step_interval, start_info.train_steps
+             - self._last_info.train_steps),
+            (self._seconds_interval, time.time() - self._last_time)]
+        intervals = [(interval, passed) for interval, passed in intervals
+                     if interval is not None]
+        if len(intervals) == 0:
+            return True
+        return any(passed >= interval for interval, passed in intervals)
+
+    def _busy_fraction(self):
+        elapsed = time.time() - self._start_time
+        if elapsed <= 0:
+            return 0.0
+        return self._sampler.sample_seconds \
+            / (self._sampler.num_workers * elapsed)
+
+    def _start(self, agent, start_info):
+        self._sampler.update_agent(
+            agent, evaluation=True, store_samples=False)
+        self._sampler.start_sampling(start_info=start_info,
+                                     worker_episodes=self._num_episodes)
+        self._last_info = start_info
+        self._last_time = time.time()
+        self._running = self._sampler.num_workers
+        self._sample_info = {"frames": [], "returns": []}
+
+    def _collect(self):
+        if self._running == 0:
+            return []
+        for _, sample_info, _ in self._sampler.collect_samples(timeout=0):
+            self._sample_info["frames"] += sample_info["frames"]
+            self._sample_info["returns"] += sample_info["returns"]
+            self._running -= 1
+        if self._running > 0:
+            return []
+        # the results of all the workers
+        self.results[self._last_info.train_steps] = self._sample_info
+        return [(self._last_info, self._sample_info)]
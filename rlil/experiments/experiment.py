@@ -2,6 +2,7 @@ import numpy as np
 from rlil.utils.writer import ExperimentWriter
 from rlil.initializer import get_logger, get_writer, set_writer, set_logger, set_seed
 from rlil.samplers import AsyncSampler
+from rlil.approximation.checkpointer import flush_checkpoints
 from .trainer import Trainer
 import os
 import logging
@@ -22,10 +23,16 @@ class Experiment:
             trains_per_episode=20,
             num_workers=1,
             num_workers_eval=1,
+            num_envs=1,
+            num_envs_eval=1,
             max_sample_frames=np.inf,
             max_sample_episodes=np.inf,
             max_train_steps=np.inf,
-            train_minutes=np.inf
+            train_minutes=np.inf,
+            async_training=False,
+            max_train_sample_ratio=np.inf,
+            replay_ratio=None,
+            eval_options=None
     ):
         # set_seed
         set_seed(seed)
@@ -68,9 +75,12 @@ class Experiment:
         # start training
         agent = agent_fn(env)
 
-        sampler = AsyncSampler(env, num_workers=num_workers) \
+        sampler = AsyncSampler(env, num_workers=num_workers,
+                               num_envs=num_envs) \
             if num_workers > 0 else None
-        eval_sampler = AsyncSampler(env, num_workers=num_workers_eval) \
+        # the evaluation workers have a lower priority than the training
+        eval_sampler = AsyncSampler(env, num_workers=num_workers_eval,
+                                    num_envs=num_envs_eval, nice=10) \
             if num_workers_eval > 0 else None
 
         trainer = Trainer(
@@ -81,10 +91,19 @@ class Experiment:
             max_sample_frames=max_sample_frames,
             max_sample_episodes=max_sample_episodes,
             max_train_steps=max_train_steps,
-            train_minutes=train_minutes
+            train_minutes=train_minutes,
+            async_training=async_training,
+            max_train_sample_ratio=max_train_sample_ratio,
+            replay_ratio=replay_ratio,
+            eval_options=eval_options
         )
 
-        trainer.start_training()
+        try:
+            trainer.start_training()
+        finally:
+            # write the pending scalars and checkpoints
+            writer.close()
+            flush_checkpoints()
 
     def _make_writer(self, agent_name, env_name, exp_info):
         return ExperimentWriter(agent_name=agent_name,
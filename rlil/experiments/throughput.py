@@ -0,0 +1,64 @@
+import time
+
+
+class ThroughputMeter:
+    """
+    ThroughputMeter measures the sampling and the training speed
+    between the calls of update.
+
+    Args:
+        min_interval (float): Minimum seconds between the measurements.
+            update returns None if min_interval has not passed.
+    """
+
+    def __init__(self, min_interval=1.0):
+        self._min_interval = min_interval
+        self._last = None
+
+    def update(self,
+               sample_frames,
+               train_steps,
+               sample_seconds=0.0,
+               num_workers=0,
+               buffer_size=None,
+               buffer_capacity=None):
+        """
+        Args:
+            sample_frames (int): Number of the collected frames.
+            train_steps (int): Number of the training steps.
+            sample_seconds (float): Total seconds the workers spent
+                in sampling, see AsyncSampler.sample_seconds.
+            num_workers (int): Number of the workers.
+            buffer_size (int, optional): Number of the stored transitions.
+            buffer_capacity (int, optional): Size of the replay_buffer.
+
+        Returns:
+            dict: {name: value} of sample_frames_per_sec,
+                train_steps_per_sec, replay_ratio (train_steps per
+                sample frame since the beginning), worker_idle (the
+                fraction of the time the workers didn't sample) and
+                buffer_fill, or None.
+        """
+        now = time.time()
+        current = (now, sample_frames, train_steps, sample_seconds)
+        if self._last is None:
+            self._last = current
+            return None
+        seconds = now - self._last[0]
+        if seconds < self._min_interval:
+            return None
+
+        last_frames, last_steps, last_sample_seconds = self._last[1:]
+        self._last = current
+        metrics = {
+            "sample_frames_per_sec": (sample_frames - last_frames) / seconds,
+            "train_steps_per_sec": (train_steps - last_steps) / seconds,
+            "replay_ratio": train_steps / max(sample_frames, 1),
+        }
+        if num_workers > 0:
+            busy = (sample_seconds - last_sample_seconds) \
+                / (num_workers * seconds)
+            metrics["worker_idle"] = min(max(1 - busy, 0.0), 1.0)
+        if buffer_size is not None and buffer_capacity:
+            metrics["buffer_fill"] = buffer_size / buffer_capacity
+        return metrics
@@ -2,14 +2,19 @@ import logging
 from rlil.environments import State
 from rlil.initializer import (call_seed,
                               get_logger,
+                              get_profiler,
                               get_writer,
                               is_on_policy_mode)
 from rlil.samplers import AsyncSampler, StartInfo
+from .throughput import ThroughputMeter
+from .evaluation import EvaluationScheduler
 import numpy as np
 import torch
 import warnings
 import os
 import time
+import queue
+import threading
 from timeit import default_timer as timer
 import json
 
@@ -34,6 +39,25 @@ class Trainer:
             exceeds max_sample_frames.
         train_minutes (int):
             After train_minutes, training terminates.
+        async_training (bool):
+            If True, the agent is trained continuously while a background
+            thread collects the samples of finished workers and restarts
+            them with the latest weights. Only for off-policy agents.
+        max_train_sample_ratio (float):
+            In async_training, the agent waits for samples when
+            train_steps exceeds max_train_sample_ratio * sample_frames.
+        replay_ratio (float, optional):
+            Target number of training steps per sample frame, counted
+            from the sample frame where the agent becomes trainable
+            (agent.should_train()), e.g. after replay_start_size.
+            If given, the agent trains up to
+            replay_ratio * (sample_frames - the frame) steps since the frame
+            instead of trains_per_episode steps per episode.
+            In async_training, the agent waits for samples above the ratio,
+            and the finished workers wait for the agent below the ratio.
+        eval_options (dict, optional):
+            Keyword arguments of EvaluationScheduler for eval_sampler,
+            e.g. {"frame_interval": 10000, "max_busy_fraction": 0.1}.
     """
 
     def __init__(
@@ -45,26 +69,53 @@ class Trainer:
             max_sample_frames=np.inf,
             max_sample_episodes=np.inf,
             max_train_steps=np.inf,
-            train_minutes=np.inf
+            train_minutes=np.inf,
+            async_training=False,
+            max_train_sample_ratio=np.inf,
+            replay_ratio=None,
+            eval_options=None
     ):
         self._agent = agent
         self._sampler = sampler
         self._eval_sampler = eval_sampler
+        self._evaluation = None if eval_sampler is None else \
+            EvaluationScheduler(eval_sampler, **(eval_options or {}))
         self._train_per_episode = trains_per_episode
         self._max_sample_frames = max_sample_frames
         self._max_sample_episodes = max_sample_episodes
         self._max_train_steps = max_train_steps
         self._train_minutes = train_minutes
+        self._async_training = async_training
+        self._max_train_sample_ratio = max_train_sample_ratio
+        self._replay_ratio = replay_ratio
+        if replay_ratio is not None:
+            assert sampler is not None, "replay_ratio requires a sampler"
+        # (sample_frames, train_steps) when the agent became trainable
+        self._replay_start = None
+        # cleared while the workers wait for the agent
+        self._sampling_allowed = threading.Event()
+        self._sampling_allowed.set()
+        self._throughput = ThroughputMeter()
         self._train_start_time = 0
         self._writer = get_writer()
         self._logger = get_logger()
+        self._profiler = get_profiler()
         self._best_returns = -np.inf
         self._timeout = -1  # if -1, store_samples waits for worker.sample()
         call_seed()
 
     def start_training(self):
         self._train_start_time = time.time()
+        try:
+            if self._async_training:
+                self._start_async_training()
+            else:
+                self._start_sync_training()
+        finally:
+            if self._profiler.enabled:
+                self._logger.info("\nProfile:\n" + self._profiler.summary())
 
+    def _start_sync_training(self):
         while not self._done():
             # training
             iter_start_time = time.time()
@@ -72,9 +123,8 @@ class Trainer:
 
             # sampling for training
             if self._sampler is not None:
-                lazy_agent = self._agent.make_lazy_agent()
-                self._sampler.start_sampling(lazy_agent,
-                                             start_info=self._get_current_info(),
+                self._sampler.update_agent(self._agent)
+                self._sampler.start_sampling(start_info=self._get_current_info(),
                                              worker_episodes=1)
 
                 sample_result = \
@@ -83,34 +133,164 @@ class Trainer:
                 for sample_info in sample_result.values():
                     self._writer.sample_frames += sum(sample_info["frames"])
                     self._writer.sample_episodes += len(sample_info["frames"])
-                    # training proportional to num of episodes
-                    num_trains = int(len(sample_info["frames"]) *
-                                     self._train_per_episode)
-                    for _ in range(num_trains):
-                        if not is_on_policy_mode():
-                            self._agent.train()
+                    num_trains = self._num_trains(sample_info)
+                    if num_trains > 0 and not is_on_policy_mode():
+                        with self._profiler.timer("trainer/train"):
+                            self._agent.train(num_trains)
 
-            self._agent.train()
+            if self._replay_ratio is None or is_on_policy_mode():
+                with self._profiler.timer("trainer/train"):
+                    self._agent.train()
 
             training_msg = {
                 "training time [sec]": round(time.time() - iter_start_time, 2),
                 "trained steps": self._writer.train_steps - train_steps}
+            throughput = self._log_throughput()
+            if throughput is not None:
+                training_msg["throughput"] = {
+                    key: round(value, 3) for key, value in throughput.items()}
             self._logger.info("\nTraining:\n" +
                               json.dumps(training_msg, indent=2))
 
             # evaluation
-            if self._eval_sampler is not None:
-                eval_lazy_agent = self._agent.make_lazy_agent(
-                    evaluation=True, store_samples=False)
-                self._eval_sampler.start_sampling(
-                    eval_lazy_agent,
+            self._evaluate()
+            self._profiler.write(self._writer)
+
+    def _start_async_training(self):
+        assert self._sampler is not None, \
+            "async_training requires a sampler"
+        assert not is_on_policy_mode(), \
+            "async_training is not available for on-policy agents"
+
+        results = queue.Queue()
+        stop = threading.Event()
+        thread = threading.Thread(target=self._sample_async,
+                                  args=(results, stop),
+                                  daemon=True)
+        thread.start()
+
+        try:
+            wait_samples = False
+            while not self._done():
+                # wait for samples if the agent can't train
+                for start_info, sample_info, samples in \
+                        self._get_results(results, wait_samples):
+                    self._sampler.store(samples)
+                    self._writer.sample_frames += sum(sample_info["frames"])
+                    self._writer.sample_episodes += len(sample_info["frames"])
+                    self._evaluate()
+                    self._profiler.write(self._writer)
+
+                    self._log_throughput()
+
+                train_steps = self._writer.train_steps
+                target = self._replay_ratio_target()
+                if train_steps <= \
+                        self._max_train_sample_ratio * self._writer.sample_frames \
+                        and (target is None or train_steps <= target):
+                    with self._profiler.timer("trainer/train"):
+                        self._agent.train()
+                wait_samples = self._writer.train_steps == train_steps
+
+                # the workers wait while the agent is catching up
+                if target is not None and not wait_samples and \
+                        self._writer.train_steps < target:
+                    self._sampling_allowed.clear()
+                else:
+                    self._sampling_allowed.set()
+        finally:
+            stop.set()
+            self._sampling_allowed.set()
+            thread.join()
+
+    def _sample_async(self, results, stop):
+        """
+        Collect the samples of the finished workers and restart them with
+        the latest weights. The weights are copied while the agent is
+        training, as in Ape-X.
+        """
+        try:
+            self._sampler.update_agent(self._agent)
+            self._sampler.start_sampling(start_info=self._get_current_info(),
+                                         worker_episodes=1)
+            while not stop.is_set():
+                finished = self._sampler.collect_samples(timeout=1.0)
+                if len(finished) == 0:
+                    continue
+                for result in finished:
+                    results.put(result)
+                self._sampling_allowed.wait()
+                self._sampler.update_agent(self._agent)
+                self._sampler.start_sampling(
                     start_info=self._get_current_info(),
-                    worker_episodes=10)
-                eval_sample_result = self._eval_sampler.store_samples(
-                    timeout=1e-5, evaluation=True)
+                    worker_episodes=1)
+        except Exception as e:
+            # raised in the training thread
+            results.put(e)
+
+    def _num_trains(self, sample_info):
+        if self._replay_ratio is None:
+            # training proportional to num of episodes
+            return int(len(sample_info["frames"]) * self._train_per_episode)
+        target = self._replay_ratio_target()
+        return 0 if target is None else target - self._writer.train_steps
+
+    def _replay_ratio_target(self):
+        """
+        Return the train steps which keep replay_ratio since the agent
+        became trainable, or None if replay_ratio is None or the agent
+        is not trainable yet. The samples collected before the agent
+        became trainable are not counted, so that the agent doesn't
+        train all of them at once.
+        """
+        if self._replay_ratio is None:
+            return None
+        if self._replay_start is None:
+            if not self._agent.should_train():
+                return None
+            self._replay_start = (self._writer.sample_frames,
+                                  self._writer.train_steps)
+        start_frames, start_steps = self._replay_start
+        return start_steps + int(
+            self._replay_ratio * (self._writer.sample_frames - start_frames))
+
+    def _log_throughput(self):
+        replay_buffer = self._sampler.replay_buffer \
+            if isinstance(self._sampler, AsyncSampler) else None
+        metrics = self._throughput.update(
+            self._writer.sample_frames,
+            self._writer.train_steps,
+            sample_seconds=getattr(self._sampler, "sample_seconds", 0.0),
+            num_workers=getattr(self._sampler, "num_workers", 0),
+            buffer_size=None if replay_buffer is None
+            else len(replay_buffer),
+            buffer_capacity=None if replay_buffer is None
+            else replay_buffer.get_buffer_size())
+        if metrics is not None:
+            for name, value in metrics.items():
+                self._writer.add_scalar("throughput/" + name, value,
+                                        step="sample_frames")
+        return metrics
+
+    def _get_results(self, results, block):
+        items = []
+        try:
+            items.append(results.get(timeout=1.0) if block
+                         else results.get_nowait())
+            while True:
+                items.append(results.get_nowait())
+        except queue.Empty:
+            pass
+        for item in items:
+            if isinstance(item, Exception):
+                raise item
+        return items
 
-                for start_info, sample_info in eval_sample_result.items():
-                    self._log(start_info, sample_info)
+    def _evaluate(self):
+        if self._evaluation is not None:
+            for start_info, sample_info in self._evaluation.evaluate(
+                    self._agent, self._get_current_info()):
+                self._log(start_info, sample_info)
 
     def _log(self, start_info, sample_info):
         mean_returns = np.mean(sample_info["returns"])
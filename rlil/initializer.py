@@ -3,6 +3,7 @@ import numpy as np
 import torch
 import logging
 from rlil.utils.writer import DummyWriter
+from rlil.utils.profiler import Profiler
 
 os.environ["PYTHONWARNINGS"] = 'ignore:semaphore_tracker:UserWarning'
 
@@ -27,6 +28,24 @@ def is_debug_mode():
     return _DEBUG_MODE
 
 
+_PROFILER = Profiler()
+
+
+def enable_profiling(synchronize=False):
+    print("-----PROFILING: True-----")
+    _PROFILER.enabled = True
+    _PROFILER.synchronize = synchronize
+
+
+def disable_profiling():
+    print("-----PROFILING: False-----")
+    _PROFILER.enabled = False
+
+
+def get_profiler():
+    return _PROFILER
+
+
 _DEVICE = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
 
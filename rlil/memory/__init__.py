@@ -6,6 +6,11 @@ from .gail_wrapper import GailWrapper
 from .gae_wrapper import GaeWrapper
 from .sqil_wrapper import SqilWrapper
 from .airl_wrapper import AirlWrapper
+from .model_rollout_wrapper import ModelRolloutWrapper
+from .shared_memory import SharedMemoryBuffer, SharedMemoryWriter, WrittenRange
+from .prefetcher import Prefetcher
+from .dataset import TransitionDataset
+from .recorder import TrajectoryRecorder
 from cpprb import ReplayBuffer
 
 
@@ -16,5 +21,12 @@ __all__ = [
     "GailWrapper",
     "GaeWrapper",
     "SqilWrapper",
-    "AirlWrapper"
+    "AirlWrapper",
+    "ModelRolloutWrapper",
+    "SharedMemoryBuffer",
+    "SharedMemoryWriter",
+    "WrittenRange",
+    "Prefetcher",
+    "TransitionDataset",
+    "TrajectoryRecorder"
 ]
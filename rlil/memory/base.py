@@ -39,6 +39,11 @@ class BaseBufferWrapper(ABC):
     def sample(self, *args, **kwargs):
         return self.buffer.sample(*args, **kwargs)
 
+    def sample_batches(self, batch_size, num_batches):
+        # the wrappers modify each minibatch by self.sample
+        for _ in range(num_batches):
+            yield self.sample(batch_size)
+
     def update_priorities(self, *args, **kwargs):
         self.buffer.update_priorities(*args, **kwargs)
 
@@ -51,5 +56,18 @@ class BaseBufferWrapper(ABC):
     def samples_from_cpprb(self, *args, **kwargs):
         return self.buffer.samples_from_cpprb(*args, **kwargs)
 
+    @property
+    def shared_memory(self):
+        return self.buffer.shared_memory
+
+    def make_writers(self, *args, **kwargs):
+        return self.buffer.make_writers(*args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        self.buffer.commit(*args, **kwargs)
+
+    def get_buffer_size(self):
+        return self.buffer.get_buffer_size()
+
     def __len__(self):
         return len(self.buffer)
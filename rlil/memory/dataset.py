@@ -0,0 +1,154 @@
+import os
+import json
+import numpy as np
+
+
+MANIFEST = "manifest.json"
+
+
+class TransitionDataset:
+    """
+    A columnar dataset of transitions stored in a directory.
+    Each chunk of transitions is a subdirectory which has a .npy file
+    per field, and manifest.json lists the fields and the chunks.
+    The chunks are memory-mapped, so the dataset is not loaded into RAM
+    and the page cache is shared by the processes reading it.
+
+    This class has the interface of cpprb.ReplayBuffer which is used by
+    rlil.memory.ExperienceReplayBuffer, but it is read-only
+    except for self.append.
+
+    Args:
+        dirname (str): Directory of the dataset.
+    """
+
+    def __init__(self, dirname):
+        self.dirname = dirname
+        with open(os.path.join(dirname, MANIFEST)) as f:
+            self._manifest = json.load(f)
+        self._chunks = [self._load_chunk(chunk["name"])
+                        for chunk in self._manifest["chunks"]]
+        self._sizes = np.array([chunk["size"] for chunk
+                                in self._manifest["chunks"]], dtype=np.int64)
+
+    @classmethod
+    def create(cls, dirname, transitions=None):
+        """
+        Create a dataset directory.
+
+        Args:
+            dirname (str): Directory of the dataset.
+            transitions (dict of nparrays, optional): Transitions generated
+                by cpprb.ReplayBuffer.get_all_transitions()
+
+        Returns:
+            TransitionDataset
+        """
+        os.makedirs(dirname, exist_ok=True)
+        _write_manifest(dirname, {"fields": None, "chunks": []})
+        dataset = cls(dirname)
+        if transitions is not None:
+            dataset.append(transitions)
+        return dataset
+
+    def _load_chunk(self, name):
+        return {key: np.load(os.path.join(self.dirname, name, key + ".npy"),
+                             mmap_mode="r")
+                for key in self._manifest["fields"]}
+
+    def append(self, transitions, info=None):
+        """
+        Write the transitions as a new chunk.
+        The manifest is replaced atomically after the chunk is written,
+        so an interrupted append leaves the dataset unchanged.
+
+        Args:
+            transitions (dict of nparrays): Transitions generated
+                by cpprb.ReplayBuffer.get_all_transitions()
+            info (dict, optional): Information of the chunk saved in
+                the manifest, e.g. returns of the episodes.
+        """
+        fields = {key: {"shape": list(np.shape(value)[1:]),
+                        "dtype": np.asarray(value).dtype.str}
+                  for key, value in transitions.items()}
+        if self._manifest["fields"] is None:
+            self._manifest["fields"] = fields
+        assert self._manifest["fields"] == fields, \
+            "The fields of the transitions don't match the dataset."
+
+        name = "{:05d}".format(len(self._manifest["chunks"]))
+        os.makedirs(os.path.join(self.dirname, name), exist_ok=True)
+        for key, value in transitions.items():
+            np.save(os.path.join(self.dirname, name, key + ".npy"),
+                    np.ascontiguousarray(value))
+
+        chunk = {"name": name, "size": len(transitions["obs"])}
+        if info is not None:
+            chunk["info"] = info
+        self._manifest["chunks"].append(chunk)
+        _write_manifest(self.dirname, self._manifest)
+        self._chunks.append(self._load_chunk(name))
+        self._sizes = np.append(self._sizes, chunk["size"])
+
+    @property
+    def chunks_info(self):
+        '''Return the info of each chunk given to self.append'''
+        return [chunk.get("info") for chunk in self._manifest["chunks"]]
+
+    def get(self, indexes):
+        """
+        Gather the transitions of the indexes from the chunks.
+
+        Args:
+            indexes (nparray): Indexes of the transitions.
+
+        Returns:
+            dict of nparrays
+        """
+        indexes = np.asarray(indexes, dtype=np.int64)
+        cumsum = np.cumsum(self._sizes)
+        chunks = np.searchsorted(cumsum, indexes, side="right")
+        offsets = indexes - (cumsum - self._sizes)[chunks]
+
+        npsamples = {key: np.empty((len(indexes), ) + tuple(field["shape"]),
+                                   dtype=np.dtype(field["dtype"]))
+                     for key, field in self._manifest["fields"].items()}
+        for chunk in np.unique(chunks):
+            mask = chunks == chunk
+            for key, array in self._chunks[chunk].items():
+                npsamples[key][mask] = array[offsets[mask]]
+        return npsamples
+
+    def sample(self, batch_size):
+        assert len(self) > 0, "The dataset is empty."
+        return self.get(np.random.randint(len(self), size=batch_size))
+
+    def get_all_transitions(self):
+        return self.get(np.arange(len(self)))
+
+    def get_buffer_size(self):
+        return len(self)
+
+    def get_stored_size(self):
+        return len(self)
+
+    def add(self, **transitions):
+        raise RuntimeError(
+            "TransitionDataset is read-only. Use append to add a chunk.")
+
+    def on_episode_end(self):
+        pass
+
+    def clear(self):
+        raise RuntimeError("TransitionDataset is read-only.")
+
+    def __len__(self):
+        return int(self._sizes.sum())
+
+
+def _write_manifest(dirname, manifest):
+    path = os.path.join(dirname, MANIFEST)
+    with open(path + ".tmp", mode="w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
@@ -27,17 +27,35 @@ class GaeWrapper(BaseBufferWrapper):
     def compute_gae(self, rewards, values, next_values, masks):
         td_errors = rewards + self.discount_factor * next_values - values
 
-        # compute_gaes
-        length = len(td_errors)
-        gaes = torch.zeros(length, device=self.device)
-
-        gae = 0.0
-        for i in reversed(range(length)):
-            mask = masks[i].float()
-            gae = td_errors[i] + self.discount_factor * self.lam * gae * mask
-            gaes[i] = gae
+        # gae[i] = td_errors[i] + discount * lam * mask[i] * gae[i + 1]
+        discounts = self.discount_factor * self.lam * masks.float()
+        gaes = reverse_scan(td_errors, discounts)
 
         # normalize Advantage
         # see: https://github.com/ikostrikov/pytorch-a2c-ppo-acktr-gail/issues/102
         gaes = (gaes - gaes.mean()) / gaes.std()
-        return gaes
\ No newline at end of file
+        return gaes
+
+
+def reverse_scan(values, discounts):
+    """
+    Compute y[i] = values[i] + discounts[i] * y[i + 1] with
+    log2(len(values)) vectorized steps instead of a python loop.
+    After the step with offset d, y[i] sums values[i:i + 2d] discounted
+    and discounts[i] is the product of discounts[i:i + 2d], so that
+    zero discounts, e.g. the masks of terminal states, cut the sums.
+
+    Args:
+        values (torch.Tensor): 1-D tensor.
+        discounts (torch.Tensor): 1-D tensor of the same length.
+    """
+    values = values.clone()
+    discounts = discounts.clone()
+    offset = 1
+    while offset < len(values):
+        # the right sides are computed before the overlapping writes
+        values[:-offset] = values[:-offset] + \
+            discounts[:-offset] * values[offset:]
+        discounts[:-offset] = discounts[:-offset] * discounts[offset:]
+        offset *= 2
+    return values
@@ -0,0 +1,152 @@
+import torch
+from rlil.environments import State, Action
+from rlil.initializer import get_device
+from rlil.utils import Samples
+from .replay_buffer import ExperienceReplayBuffer
+from .base import BaseBufferWrapper
+
+
+class ModelRolloutWrapper(BaseBufferWrapper):
+    """
+    A wrapper of ExperienceReplayBuffer for model-based policy
+    optimization (MBPO). https://arxiv.org/abs/1906.08253
+    Every rollout_frequency minibatches, the dynamics model is trained
+    on the real transitions, and short rollouts of the policy are
+    branched from the real states with the dynamics model.
+    The synthetic transitions are kept in a separate buffer and mixed
+    into the minibatches with real_ratio.
+    The rollouts end at the next_states where termination_fn
+    returns True, and those next_states are stored with mask == 0.
+    """
+
+    def __init__(self,
+                 buffer,
+                 env,
+                 dynamics,
+                 reward_fn,
+                 policy,
+                 termination_fn=None,
+                 real_ratio=0.05,
+                 rollout_frequency=250,
+                 rollout_batch_size=1000,
+                 rollout_length=1,
+                 dynamics_train_steps=100,
+                 dynamics_minibatch_size=256,
+                 model_buffer_size=1e6):
+        """
+        Args:
+            buffer (rlil.memory.ExperienceReplayBuffer):
+                A replay_buffer of the real transitions.
+            env (rlil.environments.GymEnvironment): The environment.
+            dynamics (rlil.approximation.Dynamics):
+                An Approximation of a dynamics model with a loss method,
+                e.g. Dynamics or EnsembleDynamics.
+            reward_fn (rlil.environments.reward_fn):
+                Reward function in rlil.environments.REWARDS.
+            policy (rlil.approximation.Approximation):
+                The policy of the agent. If it returns a tuple,
+                e.g. (actions, log_probs), the first is used.
+            termination_fn (rlil.environments.termination_fn):
+                Termination function in rlil.environments.TERMINATIONS.
+                None is only for the envs which never terminate.
+            real_ratio (float): Ratio of the real transitions
+                in a minibatch.
+            rollout_frequency (int): Number of minibatches between rollouts.
+            rollout_batch_size (int): Number of real states to branch from.
+            rollout_length (int): Number of steps of each rollout.
+            dynamics_train_steps (int): Number of dynamics updates
+                before each rollout.
+            dynamics_minibatch_size (int): Minibatch size of the dynamics.
+            model_buffer_size (int): Size of the buffer of the
+                synthetic transitions.
+        """
+        assert not buffer.prioritized, \
+            "ModelRolloutWrapper doesn't support prioritized replay"
+        assert 0 < real_ratio <= 1, "real_ratio must be in (0, 1]"
+        self.buffer = buffer
+        self.model_buffer = ExperienceReplayBuffer(model_buffer_size, env)
+        self.dynamics = dynamics
+        self.reward_fn = reward_fn
+        self.policy = policy
+        self.termination_fn = termination_fn
+        self.device = get_device()
+        self.real_ratio = real_ratio
+        self.rollout_frequency = rollout_frequency
+        self.rollout_batch_size = rollout_batch_size
+        self.rollout_length = rollout_length
+        self.dynamics_train_steps = dynamics_train_steps
+        self.dynamics_minibatch_size = dynamics_minibatch_size
+        self._num_batches = 0
+
+    def sample(self, batch_size):
+        return next(self.sample_batches(batch_size, 1))
+
+    def sample_batches(self, batch_size, num_batches):
+        """
+        Sample num_batches minibatches of the real and the synthetic
+        transitions. At least one transition of each minibatch is real.
+        Note that this trains the dynamics model and stores new rollouts
+        once for every rollout_frequency minibatches before sampling.
+        """
+        # rollout once for every rollout_frequency minibatches
+        rollouts = (self._num_batches + num_batches - 1) \
+            // self.rollout_frequency \
+            - (self._num_batches - 1) // self.rollout_frequency
+        self._num_batches += num_batches
+        for _ in range(rollouts):
+            self.train_dynamics()
+            self.rollout()
+
+        real_size = min(max(int(batch_size * self.real_ratio), 1),
+                        batch_size)
+        model_size = batch_size - real_size
+        real_batches = self.buffer.sample_batches(real_size, num_batches)
+        if model_size == 0 or len(self.model_buffer) == 0:
+            yield from real_batches
+            return
+        model_batches = self.model_buffer.sample_batches(
+            model_size, num_batches)
+        for real, model in zip(real_batches, model_batches):
+            yield Samples(State.from_list([real.states, model.states]),
+                          Action.from_list([real.actions, model.actions]),
+                          torch.cat((real.rewards, model.rewards)),
+                          State.from_list([real.next_states,
+                                           model.next_states]),
+                          torch.cat((real.weights, model.weights)),
+                          None)
+
+    def train_dynamics(self):
+        '''Fit the dynamics model to the real transitions'''
+        for _ in range(self.dynamics_train_steps):
+            states, actions, _, next_states, _, _ = \
+                self._sample_real(self.dynamics_minibatch_size)
+            loss = self.dynamics.loss(states, actions, next_states)
+            self.dynamics.reinforce(loss)
+
+    def rollout(self):
+        '''Store the rollouts branched from the real states'''
+        states = self._sample_real(self.rollout_batch_size).states
+        with torch.no_grad():
+            for _ in range(self.rollout_length):
+                # stop the rollouts from the terminal states
+                states = states[states.mask]
+                if len(states) == 0:
+                    break
+                actions = self.policy.no_grad(states)
+                if isinstance(actions, tuple):
+                    actions = actions[0]
+                actions = Action(actions)
+                next_states = self.dynamics.no_grad(states, actions)
+                if self.termination_fn is not None:
+                    dones = self.termination_fn(states, next_states, actions)
+                    next_states = State(next_states.features,
+                                        next_states.mask & ~dones.bool())
+                rewards = self.reward_fn(states, next_states, actions)
+                self.model_buffer.store(
+                    Samples(states, actions, rewards, next_states))
+                states = next_states
+
+    def _sample_real(self, batch_size):
+        # bypass the prefetcher of the minibatches
+        return self.buffer.samples_from_cpprb(
+            self.buffer.sample_cpprb(batch_size))
@@ -0,0 +1,106 @@
+import queue
+import threading
+import torch
+from rlil.environments import State, Action
+from rlil.utils import Samples
+
+
+def _to_device(samples, device, pin_memory):
+    def to(tensor):
+        if pin_memory:
+            tensor = tensor.pin_memory()
+        return tensor.to(device, non_blocking=pin_memory)
+
+    states, actions, rewards, next_states, weights, indexes = samples
+    return Samples(State(to(states.raw), to(states.mask), states.info),
+                   Action(to(actions.raw)),
+                   to(rewards),
+                   State(to(next_states.raw), to(next_states.mask),
+                         next_states.info),
+                   to(weights),
+                   indexes)
+
+
+def _tensors(samples):
+    states, actions, rewards, next_states, weights, _ = samples
+    return [states.raw, states.mask, actions.raw, rewards,
+            next_states.raw, next_states.mask, weights]
+
+
+class Prefetcher:
+    """
+    An iterator of minibatches sampled ahead by a background thread.
+    The minibatches are sampled from the replay_buffer on cpu and,
+    if the device is cuda, they are copied from pinned memory with
+    non_blocking transfers on a separate cuda stream.
+    The priorities of prioritized replay are those when the minibatches
+    were sampled.
+
+    Args:
+        replay_buffer (rlil.memory.ExperienceReplayBuffer):
+            Replay buffer to sample from.
+        batch_size (int): Size of minibatches.
+        num_prefetch (int): Number of minibatches sampled ahead.
+        device (torch.device, optional): Device of the minibatches.
+            Defaults to replay_buffer.device.
+    """
+
+    def __init__(self, replay_buffer, batch_size, num_prefetch=2,
+                 device=None):
+        self.batch_size = batch_size
+        self._replay_buffer = replay_buffer
+        self._device = torch.device(device or replay_buffer.device)
+        self._use_cuda = self._device.type == "cuda"
+        self._stream = torch.cuda.Stream(self._device) \
+            if self._use_cuda else None
+        self._queue = queue.Queue(maxsize=num_prefetch)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._load, daemon=True)
+        self._thread.start()
+
+    def _load(self):
+        try:
+            while not self._stop.is_set():
+                npsamples = self._replay_buffer.sample_cpprb(self.batch_size)
+                samples = self._replay_buffer.samples_from_cpprb(
+                    npsamples, device="cpu")
+                event = None
+                if self._use_cuda:
+                    with torch.cuda.stream(self._stream):
+                        samples = _to_device(samples, self._device, True)
+                        event = torch.cuda.Event()
+                        event.record(self._stream)
+                else:
+                    samples = _to_device(samples, self._device, False)
+                self._put((samples, event))
+        except Exception as e:
+            # raised in the consumer thread
+            self._put((e, None))
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        samples, event = self._queue.get()
+        if isinstance(samples, Exception):
+            raise samples
+        if event is not None:
+            stream = torch.cuda.current_stream(self._device)
+            stream.wait_event(event)
+            # the memory must not be reused until the stream uses it
+            for tensor in _tensors(samples):
+                tensor.record_stream(stream)
+        return samples
+
+    def close(self):
+        '''Stop the background thread'''
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,92 @@
+import os
+import numpy as np
+from .replay_buffer import ExperienceReplayBuffer
+from .dataset import TransitionDataset, MANIFEST
+
+
+class TrajectoryRecorder:
+    """
+    Record samples into a TransitionDataset shard by shard.
+    The samples are staged in a replay buffer of about 2 * shard_size
+    and written as a chunk of the dataset when shard_size transitions
+    are staged, so the memory usage doesn't depend on the number of
+    recorded frames. The returns of the episodes are saved with
+    each shard.
+    If the dataset already exists, the recording resumes after the
+    shards on the disk. The staged samples which are not written yet
+    are lost when the recording is interrupted.
+
+    Args:
+        dirname (str): Directory of the dataset.
+        env (rlil.environments.GymEnvironment)
+        shard_size (int): Number of transitions in each shard.
+    """
+
+    def __init__(self, dirname, env, shard_size=1e5):
+        self.shard_size = int(shard_size)
+        if os.path.exists(os.path.join(dirname, MANIFEST)):
+            self.dataset = TransitionDataset(dirname)
+        else:
+            self.dataset = TransitionDataset.create(dirname)
+        self._staging_buffer = ExperienceReplayBuffer(
+            2 * self.shard_size + 1, env)
+        self._returns = []
+
+    def store(self, samples, returns=()):
+        """
+        Store the samples and the returns of their episodes.
+
+        Args:
+            samples (rlil.utils.Samples): Samples returned by
+                rlil.samplers.AsyncSampler.collect_samples
+            returns (list of float): Returns of the episodes of the samples.
+        """
+        assert len(samples.states) <= self.shard_size, \
+            "The sample size exceeds the shard_size."
+        self._staging_buffer.store(samples)
+        self._returns += list(returns)
+        if len(self._staging_buffer) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        '''Write the staged samples as a shard'''
+        if len(self._staging_buffer) == 0:
+            return
+        transitions = self._staging_buffer.get_all_transitions(
+            return_cpprb=True)
+        self.dataset.append(transitions, info=_return_stats(self._returns))
+        self._staging_buffer.clear()
+        self._returns = []
+
+    @property
+    def returns(self):
+        '''Returns of the episodes recorded in the shards'''
+        return [r for info in self.dataset.chunks_info
+                if info is not None for r in info["returns"]]
+
+    def return_stats(self):
+        """
+        Return statistics of the returns for demo_return.json.
+
+        Returns:
+            dict: mean and std of all the returns, and the statistics
+                of each shard as "shards".
+        """
+        stats = _return_stats(self.returns)
+        del stats["returns"]
+        stats["shards"] = [
+            {key: value for key, value in info.items() if key != "returns"}
+            for info in self.dataset.chunks_info if info is not None]
+        return stats
+
+    def __len__(self):
+        return len(self.dataset) + len(self._staging_buffer)
+
+
+def _return_stats(returns):
+    returns = [float(r) for r in returns]
+    if len(returns) == 0:
+        return {"returns": [], "mean": None, "std": None}
+    return {"returns": returns,
+            "mean": float(np.mean(returns)),
+            "std": float(np.std(returns))}
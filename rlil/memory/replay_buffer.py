@@ -1,11 +1,15 @@
+import threading
 import numpy as np
 import torch
 from cpprb import (ReplayBuffer, PrioritizedReplayBuffer,
                    create_env_dict, create_before_add_func)
 from rlil.environments import State, Action
-from rlil.initializer import get_device, is_debug_mode
-from rlil.utils import Samples, samples_to_np
+from rlil.initializer import get_device, get_profiler, is_debug_mode
+from rlil.utils import Samples, samples_to_np, cached_ones
 from .base import BaseReplayBuffer
+from .shared_memory import SharedMemoryBuffer, _field_specs
+from .prefetcher import Prefetcher
+from .dataset import TransitionDataset
 
 
 def check_samples(samples, priorities=None):
@@ -51,7 +55,8 @@ class ExperienceReplayBuffer(BaseReplayBuffer):
     def __init__(self,
                  size, env,
                  prioritized=False, alpha=0.6, beta=0.4, eps=1e-4,
-                 n_step=1, discount_factor=0.95):
+                 n_step=1, discount_factor=0.95, shared_memory=False,
+                 prefetch=0, dataset=None):
         """
         Args:
             size (int): The capacity of replay buffer.
@@ -67,12 +72,37 @@ class ExperienceReplayBuffer(BaseReplayBuffer):
                in LazyAgent objects, not in Agent objects.
             discount_factor (float, optional): 
                 Discount factor for Nstep experience replay.
+            shared_memory (bool, optional):
+                Use rlil.memory.SharedMemoryBuffer instead of cpprb if True.
+                Sampler workers write their samples into the shared memory
+                directly, and the sampler commits only the written ranges.
+                Prioritized and Nstep replay are not supported.
+            prefetch (int, optional):
+                If prefetch > 0, self.sample returns minibatches which
+                a rlil.memory.Prefetcher samples prefetch minibatches ahead.
+            dataset (rlil.memory.TransitionDataset or str, optional):
+                Sample from the memory-mapped dataset (or its directory)
+                instead of allocating a buffer. size is ignored and
+                the buffer is read-only.
         """
 
         # common
+        self._lock = threading.Lock()
+        self._prefetch = prefetch
+        self._prefetcher = None
         self._before_add = create_before_add_func(env)
         self.device = get_device()
         env_dict = create_env_dict(env)
+        # store float32 to convert the samples to tensors without copy
+        for value in env_dict.values():
+            if np.issubdtype(value.get("dtype", np.float32), np.floating):
+                value["dtype"] = np.float32
+        if isinstance(dataset, str):
+            dataset = TransitionDataset(dataset)
+        # bytes allocated for the transitions
+        self.nbytes = 0 if dataset is not None else int(size) * sum(
+            int(np.prod(shape)) * dtype.itemsize
+            for shape, dtype in _field_specs(env_dict).values())
 
         # Nstep
         Nstep = None
@@ -84,13 +114,51 @@ class ExperienceReplayBuffer(BaseReplayBuffer):
         # PrioritizedReplayBuffer
         self.prioritized = prioritized
         self._beta = beta
-        if prioritized:
+
+        self.shared_memory = shared_memory
+        if dataset is not None:
+            assert not (prioritized or shared_memory) and n_step == 1, \
+                "dataset doesn't support prioritized, shared_memory " \
+                "and Nstep replay"
+            self._buffer = dataset
+        elif shared_memory:
+            assert not prioritized and n_step == 1, \
+                "shared_memory doesn't support prioritized and Nstep replay"
+            self._buffer = SharedMemoryBuffer(size, env_dict)
+        elif prioritized:
             self._buffer = PrioritizedReplayBuffer(size, env_dict,
                                                    alpha=alpha, eps=eps,
                                                    Nstep=Nstep)
         else:
             self._buffer = ReplayBuffer(size, env_dict, Nstep=Nstep)
 
+    @classmethod
+    def from_transitions(cls, transitions, env, size=1e7, **kwargs):
+        """
+        Make a replay_buffer of the transitions for offline algorithms.
+
+        Args:
+            transitions (dict of nparrays or rlil.memory.TransitionDataset):
+                Transitions generated by
+                cpprb.ReplayBuffer.get_all_transitions(), or a dataset
+                which is sampled without loading it.
+                If None, the replay_buffer is empty.
+            env (rlil.environments.GymEnvironment)
+            size (int): The capacity of the replay buffer.
+                It is ignored for a dataset.
+            kwargs: Other arguments of ExperienceReplayBuffer, e.g. prefetch.
+
+        Returns:
+            ExperienceReplayBuffer
+        """
+        if isinstance(transitions, TransitionDataset):
+            return cls(len(transitions), env, dataset=transitions, **kwargs)
+        replay_buffer = cls(size, env, **kwargs)
+        if transitions is not None:
+            replay_buffer.store(replay_buffer.samples_from_cpprb(
+                transitions, device="cpu"))
+        return replay_buffer
+
     @check_inputs_shapes
     def store(self, samples, priorities=None):
         """Store the samples in the buffer
@@ -106,41 +174,103 @@ class ExperienceReplayBuffer(BaseReplayBuffer):
             priorities (torch.Tensor): batch_size
         """
 
-        np_states, np_rewards, np_actions, np_next_states, \
-            np_dones, np_next_dones = samples_to_np(samples)
-
-        assert len(np_states) < self._buffer.get_buffer_size(), \
-            "The sample size exceeds the buffer size."
-
-        if self.prioritized and (~np_dones).any():
-            np_priorities = None if priorities is None \
-                else priorities.detach().cpu().numpy()[~np_dones]
-            self._buffer.add(
-                **self._before_add(obs=np_states[~np_dones],
-                                   act=np_actions[~np_dones],
-                                   rew=np_rewards[~np_dones],
-                                   done=np_next_dones[~np_dones],
-                                   next_obs=np_next_states[~np_dones]),
-                priorities=np_priorities)
-
-        # if there is at least one sample to store
-        if not self.prioritized and (~np_dones).any():
-            # remove done==1 by [~np_dones]
-            self._buffer.add(
-                **self._before_add(obs=np_states[~np_dones],
-                                   act=np_actions[~np_dones],
-                                   rew=np_rewards[~np_dones],
-                                   done=np_next_dones[~np_dones],
-                                   next_obs=np_next_states[~np_dones]))
+        with get_profiler().timer("replay_buffer/store"):
+            np_states, np_rewards, np_actions, np_next_states, \
+                np_dones, np_next_dones = samples_to_np(samples)
+
+            assert len(np_states) < self._buffer.get_buffer_size(), \
+                "The sample size exceeds the buffer size."
+
+            if self.prioritized and (~np_dones).any():
+                np_priorities = None if priorities is None \
+                    else priorities.detach().cpu().numpy()[~np_dones]
+                with self._lock:
+                    self._buffer.add(
+                        **self._before_add(obs=np_states[~np_dones],
+                                           act=np_actions[~np_dones],
+                                           rew=np_rewards[~np_dones],
+                                           done=np_next_dones[~np_dones],
+                                           next_obs=np_next_states[~np_dones]),
+                        priorities=np_priorities)
+
+            # if there is at least one sample to store
+            if not self.prioritized and (~np_dones).any():
+                # remove done==1 by [~np_dones]
+                with self._lock:
+                    self._buffer.add(
+                        **self._before_add(obs=np_states[~np_dones],
+                                           act=np_actions[~np_dones],
+                                           rew=np_rewards[~np_dones],
+                                           done=np_next_dones[~np_dones],
+                                           next_obs=np_next_states[~np_dones]))
 
     def sample(self, batch_size):
         '''Sample from the stored transitions'''
-        if self.prioritized:
-            npsamples = self._buffer.sample(batch_size, beta=self._beta)
-        else:
-            npsamples = self._buffer.sample(batch_size)
-        samples = self.samples_from_cpprb(npsamples)
-        return samples
+        if self._prefetch > 0:
+            if self._prefetcher is None \
+                    or self._prefetcher.batch_size != batch_size:
+                self.close_prefetcher()
+                self._prefetcher = self.prefetch(batch_size, self._prefetch)
+            with get_profiler().timer("replay_buffer/sample"):
+                return next(self._prefetcher)
+        with get_profiler().timer("replay_buffer/sample"):
+            return self.samples_from_cpprb(self.sample_cpprb(batch_size))
+
+    def sample_batches(self, batch_size, num_batches):
+        """
+        Sample num_batches minibatches at once and yield them one by one.
+        The samples are transferred to the device once.
+        With prioritized replay, each minibatch is sampled when it is
+        requested, so that it reflects the update_priorities of the
+        previous minibatches and has its own importance sampling weights.
+
+        Args:
+            batch_size (int): Size of each minibatch.
+            num_batches (int): Number of minibatches.
+
+        Yields:
+            rlil.utils.Samples
+        """
+        if self._prefetch > 0 or self.prioritized:
+            for _ in range(num_batches):
+                yield self.sample(batch_size)
+            return
+
+        with get_profiler().timer("replay_buffer/sample_batches"):
+            states, actions, rewards, next_states, weights, indexes = \
+                self.samples_from_cpprb(
+                    self.sample_cpprb(batch_size * num_batches))
+        for first in range(0, batch_size * num_batches, batch_size):
+            i = slice(first, first + batch_size)
+            yield Samples(states[i], actions[i], rewards[i],
+                          next_states[i], weights[i],
+                          None if indexes is None else indexes[i])
+
+    def sample_cpprb(self, batch_size):
+        '''Sample from the stored transitions as a dict of nparrays'''
+        with self._lock:
+            if self.prioritized:
+                return self._buffer.sample(batch_size, beta=self._beta)
+            return self._buffer.sample(batch_size)
+
+    def prefetch(self, batch_size, num_prefetch=2):
+        """
+        Return an iterator of minibatches sampled ahead
+        by a background thread.
+
+        Args:
+            batch_size (int): Size of minibatches.
+            num_prefetch (int): Number of minibatches sampled ahead.
+
+        Returns:
+            rlil.memory.Prefetcher
+        """
+        return Prefetcher(self, batch_size, num_prefetch)
+
+    def close_prefetcher(self):
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
 
     def update_priorities(self, indexes, td_errors):
         '''Update priorities based on the TD error'''
@@ -153,7 +283,30 @@ class ExperienceReplayBuffer(BaseReplayBuffer):
                 "td_errors must be cpu tensors"
 
         if self.prioritized:
-            self._buffer.update_priorities(indexes, td_errors.detach().numpy())
+            with self._lock:
+                self._buffer.update_priorities(
+                    indexes, td_errors.detach().numpy())
+
+    def make_writers(self, num_writers, capacity=None):
+        """
+        Make writers which store samples into the shared memory.
+        This method is available when shared_memory is True.
+
+        Args:
+            num_writers (int): Number of writers.
+            capacity (int, optional): Capacity of each writer.
+                Defaults to the unallocated capacity // num_writers.
+
+        Returns:
+            list of rlil.memory.SharedMemoryWriter
+        """
+        assert self.shared_memory, "shared_memory must be True"
+        return self._buffer.make_writers(num_writers, capacity)
+
+    def commit(self, written_range):
+        '''Make the samples written by a SharedMemoryWriter available'''
+        assert self.shared_memory, "shared_memory must be True"
+        self._buffer.commit(written_range)
 
     def get_all_transitions(self, return_cpprb=False):
         npsamples = self._buffer.get_all_transitions()
@@ -180,25 +333,39 @@ class ExperienceReplayBuffer(BaseReplayBuffer):
 
         states = State.from_numpy(npsamples["obs"], device=device)
         actions = Action.from_numpy(npsamples["act"], device=device)
-        rewards = torch.tensor(npsamples["rew"], dtype=torch.float32,
-                               device=device).squeeze()
+        rewards = torch.as_tensor(npsamples["rew"].reshape(-1),
+                                  dtype=torch.float32, device=device)
         next_states = State.from_numpy(
             npsamples["next_obs"], npsamples["done"], device=device)
         if self.prioritized:
-            weights = torch.tensor(
-                npsamples["weights"], dtype=torch.float32, device=self.device)
+            weights = torch.as_tensor(
+                npsamples["weights"], dtype=torch.float32, device=device)
             indexes = npsamples["indexes"]
         else:
-            weights = torch.ones(states.shape[0], device=self.device)
+            weights = cached_ones(states.shape[0], device=device)
             indexes = None
         return Samples(states, actions, rewards, next_states, weights, indexes)
 
+    def get_buffer_size(self):
+        return self._buffer.get_buffer_size()
+
     def on_episode_end(self):
         if self._n_step > 1:
             self._buffer.on_episode_end()
 
     def clear(self):
-        self._buffer.clear()
+        with self._lock:
+            self._buffer.clear()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_prefetcher"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
 
     def __len__(self):
         return self._buffer.get_stored_size()
@@ -0,0 +1,246 @@
+import weakref
+import numpy as np
+from collections import namedtuple
+from multiprocessing import shared_memory, resource_tracker
+
+
+WrittenRange = namedtuple("WrittenRange", ["segment", "start", "count"])
+
+# names of the shared memory created in this process
+_CREATED_NAMES = set()
+
+
+def _field_specs(env_dict):
+    # convert cpprb's env_dict into {key: (shape, dtype)}
+    specs = {}
+    for key, value in env_dict.items():
+        shape = value.get("shape", 1)
+        shape = (shape, ) if isinstance(shape, int) else tuple(shape)
+        specs[key] = (shape, np.dtype(value.get("dtype", np.float32)))
+    return specs
+
+
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    # Only the owner process unlinks the memory.
+    # Without this, the resource_tracker of the attaching process
+    # unlinks it when the process exits.
+    # See: https://bugs.python.org/issue38119
+    if name not in _CREATED_NAMES:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def _release(shms, unlink):
+    for shm in shms:
+        try:
+            shm.close()
+        except BufferError:
+            pass
+        if unlink:
+            shm.unlink()
+
+
+class _Segment:
+    """
+    A ring of transitions whose fields are stored in POSIX shared memory.
+    If names is None, the shared memory is created and
+    unlinked when the segment is garbage collected.
+    """
+
+    def __init__(self, capacity, specs, names=None):
+        self.capacity = int(capacity)
+        self.arrays = {}
+        self.names = {}
+        shms = []
+        for key, (shape, dtype) in specs.items():
+            if names is None:
+                nbytes = int(self.capacity * np.prod(shape) * dtype.itemsize)
+                shm = shared_memory.SharedMemory(create=True,
+                                                 size=max(nbytes, 1))
+                _CREATED_NAMES.add(shm.name)
+            else:
+                shm = _attach(names[key])
+            shms.append(shm)
+            self.names[key] = shm.name
+            self.arrays[key] = np.ndarray((self.capacity, ) + shape,
+                                          dtype=dtype, buffer=shm.buf)
+        weakref.finalize(self, _release, shms, names is None)
+
+    def write(self, start, transitions):
+        num_samples = len(transitions["obs"])
+        assert num_samples <= self.capacity, \
+            "The sample size exceeds the segment size."
+        indexes = (start + np.arange(num_samples)) % self.capacity
+        for key, array in self.arrays.items():
+            array[indexes] = np.asarray(transitions[key]).reshape(
+                (num_samples, ) + array.shape[1:])
+        return num_samples
+
+
+class SharedMemoryBuffer:
+    """
+    A replay buffer backend storing transitions in POSIX shared memory.
+    This class has the interface of cpprb.ReplayBuffer which is used by
+    rlil.memory.ExperienceReplayBuffer.
+
+    The buffer consists of ring segments which share the capacity, size.
+    Each segment is allocated from the capacity which is not allocated yet,
+    so the writers should be made before the first self.add.
+    The local segment stores the transitions added by self.add.
+    The other segments are written in place by SharedMemoryWriter objects,
+    e.g. in sampler workers, and their transitions are sampled after
+    the owner of the buffer commits the written ranges.
+    Since the writers don't wait for the owner, a transition which
+    is being overwritten may be sampled when a segment is full.
+
+    Args:
+        size (int): Total capacity of the segments.
+        env_dict (dict): Fields of transitions made by cpprb.create_env_dict
+    """
+
+    def __init__(self, size, env_dict):
+        self._size = int(size)
+        self._specs = _field_specs(env_dict)
+        self._segments = []
+        self._heads = []
+        self._stored = []
+        # the local segment is allocated at the first self.add
+        self._local = None
+
+    def _unallocated(self):
+        return self._size - sum(segment.capacity
+                                for segment in self._segments)
+
+    def _add_segment(self, capacity):
+        self._segments.append(_Segment(capacity, self._specs))
+        self._heads.append(0)
+        self._stored.append(0)
+        return len(self._segments) - 1
+
+    def add(self, **transitions):
+        if self._local is None:
+            # the capacity left by the writers
+            capacity = self._unallocated()
+            assert capacity > 0, \
+                "The writers use all the capacity of the buffer."
+            self._local = self._add_segment(capacity)
+        start = self._heads[self._local]
+        num_samples = self._segments[self._local].write(start, transitions)
+        self.commit(WrittenRange(self._local, start, num_samples))
+
+    def make_writers(self, num_writers, capacity=None):
+        """
+        Make writers of new segments.
+
+        Args:
+            num_writers (int): Number of writers.
+            capacity (int, optional): Capacity of each segment.
+                Defaults to the unallocated capacity // num_writers.
+
+        Returns:
+            list of SharedMemoryWriter
+        """
+        capacity = capacity or self._unallocated() // num_writers
+        assert 0 < capacity * num_writers <= self._unallocated(), \
+            "The capacity of the buffer is not enough for the writers."
+        writers = []
+        for _ in range(num_writers):
+            segment = self._add_segment(capacity)
+            writers.append(SharedMemoryWriter(
+                segment, capacity, self._specs,
+                self._segments[segment].names))
+        return writers
+
+    def commit(self, written_range):
+        '''Make the written transitions available for sampling'''
+        segment, start, count = written_range
+        capacity = self._segments[segment].capacity
+        self._heads[segment] = (start + count) % capacity
+        self._stored[segment] = min(self._stored[segment] + count, capacity)
+
+    def _physical_indexes(self, segment, offsets):
+        capacity = self._segments[segment].capacity
+        first = self._heads[segment] - self._stored[segment]
+        return (first + offsets) % capacity
+
+    def sample(self, batch_size):
+        stored = np.array(self._stored, dtype=np.int64)
+        cumsum = np.cumsum(stored)
+        assert stored.sum() > 0, "The buffer is empty."
+
+        # sample uniformly over all the stored transitions
+        samples = np.random.randint(stored.sum(), size=batch_size)
+        segments = np.searchsorted(cumsum, samples, side="right")
+        offsets = samples - (cumsum - stored)[segments]
+
+        npsamples = {key: np.empty((batch_size, ) + shape, dtype=dtype)
+                     for key, (shape, dtype) in self._specs.items()}
+        for segment in np.unique(segments):
+            mask = segments == segment
+            indexes = self._physical_indexes(segment, offsets[mask])
+            for key, array in self._segments[segment].arrays.items():
+                npsamples[key][mask] = array[indexes]
+        return npsamples
+
+    def get_all_transitions(self):
+        npsamples = {key: [] for key in self._specs}
+        for segment, stored in enumerate(self._stored):
+            indexes = self._physical_indexes(segment, np.arange(stored))
+            for key, array in self._segments[segment].arrays.items():
+                npsamples[key].append(array[indexes])
+        return {key: np.concatenate(arrays) if len(arrays) > 0
+                else np.empty((0, ) + self._specs[key][0],
+                              dtype=self._specs[key][1])
+                for key, arrays in npsamples.items()}
+
+    def get_buffer_size(self):
+        return self._size
+
+    def get_stored_size(self):
+        return sum(self._stored)
+
+    def on_episode_end(self):
+        pass
+
+    def clear(self):
+        self._stored = [0] * len(self._stored)
+
+
+class SharedMemoryWriter:
+    """
+    A picklable handle to write transitions in a segment of
+    SharedMemoryBuffer from another process.
+    The shared memory is attached at the first write.
+    """
+
+    def __init__(self, segment, capacity, specs, names):
+        self.segment = segment
+        self._capacity = capacity
+        self._specs = specs
+        self._names = names
+        self._head = 0
+        self._memory = None
+
+    def write(self, transitions):
+        """
+        Write the transitions in the segment.
+
+        Args:
+            transitions (dict of nparrays):
+                Transitions generated by cpprb.ReplayBuffer.get_all_transitions()
+
+        Returns:
+            WrittenRange: The range to be committed by the buffer owner.
+        """
+        if self._memory is None:
+            self._memory = _Segment(self._capacity, self._specs, self._names)
+        start = self._head
+        num_samples = self._memory.write(start, transitions)
+        self._head = (start + num_samples) % self._capacity
+        return WrittenRange(self.segment, start, num_samples)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_memory"] = None
+        return state
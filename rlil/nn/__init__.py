@@ -1,3 +1,4 @@
+import copy
 import torch
 from torch import nn
 from torch.nn import *  # export everthing
@@ -191,6 +192,268 @@ class Linear0(nn.Linear):
             nn.init.constant_(self.bias, 0.0)
 
 
+class EnsembleLinear(nn.Module):
+    """
+    Linear layers of an ensemble evaluated by one batched matmul.
+    The weights of the num_models layers are stacked, and the layer
+    computes num_models x batch x out_features from either
+    batch x in_features (the same input to all the models)
+    or num_models x batch x in_features.
+    Each model is initialized in the same way as nn.Linear.
+    """
+
+    def __init__(self, num_models, in_features, out_features):
+        super().__init__()
+        self.num_models = num_models
+        self.in_features = in_features
+        self.out_features = out_features
+        self.weight = nn.Parameter(
+            torch.Tensor(num_models, in_features, out_features))
+        self.bias = nn.Parameter(torch.Tensor(num_models, 1, out_features))
+        self.reset_parameters()
+
+    def reset_parameters(self):
+        bound = 1 / np.sqrt(self.in_features)
+        nn.init.uniform_(self.weight, -bound, bound)
+        nn.init.uniform_(self.bias, -bound, bound)
+
+    def forward(self, x):
+        if x.dim() == 2:
+            x = x.expand(self.num_models, -1, -1)
+        return torch.baddbmm(self.bias, x, self.weight)
+
+    def forward_model(self, x, index):
+        '''Compute batch x out_features of one model of the ensemble'''
+        return F.linear(x, self.weight[index].t(), self.bias[index, 0])
+
+    @classmethod
+    def from_linears(cls, linears):
+        '''Stack the weights of nn.Linear layers of the same shape'''
+        layer = cls(len(linears), linears[0].in_features,
+                    linears[0].out_features)
+        layer.to(linears[0].weight.device)
+        with torch.no_grad():
+            layer.weight.copy_(torch.stack([l.weight.t() for l in linears]))
+            layer.bias.copy_(torch.stack([l.bias for l in linears])
+                             .unsqueeze(1))
+        return layer
+
+    def extra_repr(self):
+        return "num_models={}, in_features={}, out_features={}".format(
+            self.num_models, self.in_features, self.out_features)
+
+
+class SplitLinear(nn.Linear):
+    """
+    nn.Linear whose input is the concatenation of state features and
+    other features, e.g. actions or latent vectors.
+    Given a tuple (states, others) with len(others) == k * len(states),
+    the states are regarded as repeated k times by repeat_interleave,
+    and the state projection is computed once for the k samples.
+    The parameters are the same as
+    nn.Linear(state_features + other_features, out_features).
+    See state_action_input.
+
+    The states are repeated as usual when state_features is smaller
+    than min_state_features, since the broadcast addition of the
+    projections costs more than it saves for small states.
+    """
+
+    min_state_features = 32
+
+    def __init__(self, state_features, other_features, out_features):
+        super().__init__(state_features + other_features, out_features)
+        self.state_features = state_features
+
+    def forward(self, x):
+        if torch.is_tensor(x):
+            return super().forward(x)
+        states, others = x
+        weight_s = self.weight[:, :self.state_features]
+        weight_o = self.weight[:, self.state_features:]
+        return _add_repeated(F.linear(states, weight_s, self.bias),
+                             F.linear(others, weight_o))
+
+
+class EnsembleSplitLinear(EnsembleLinear):
+    """
+    EnsembleLinear which projects repeated states once as SplitLinear.
+    """
+
+    min_state_features = 96
+
+    def __init__(self, num_models, state_features, other_features,
+                 out_features):
+        super().__init__(num_models, state_features + other_features,
+                         out_features)
+        self.state_features = state_features
+
+    def forward(self, x):
+        if torch.is_tensor(x):
+            return super().forward(x)
+        states, others = x
+        weight_s = self.weight[:, :self.state_features]
+        weight_o = self.weight[:, self.state_features:]
+        # num_models x batch x out_features
+        states = torch.baddbmm(
+            self.bias, states.expand(self.num_models, -1, -1), weight_s)
+        return _add_repeated(states, torch.matmul(others, weight_o))
+
+    def forward_model(self, x, index):
+        if torch.is_tensor(x):
+            return super().forward_model(x, index)
+        states, others = x
+        weight_s = self.weight[index, :self.state_features].t()
+        weight_o = self.weight[index, self.state_features:].t()
+        return _add_repeated(F.linear(states, weight_s, self.bias[index, 0]),
+                             F.linear(others, weight_o))
+
+
+def _add_repeated(states, others):
+    # ... x batch x out + ... x (batch * k) x out
+    num_states = states.shape[-2]
+    others = others.unflatten(-2, (num_states, -1))
+    return (others + states.unsqueeze(-2)).flatten(-3, -2)
+
+
+def state_action_input(model, states, others):
+    """
+    Return the input of the model for the states and the other
+    features such as actions, i.e. their concatenation.
+    If len(others) == k * len(states), the states are repeated k times
+    by repeat_interleave. The states are not repeated when the first
+    layer of the model is SplitLinear or EnsembleSplitLinear
+    with at least min_state_features state features.
+
+    Args:
+        model (nn.Module): The model taking the input.
+        states (torch.Tensor): batch x state_features.
+        others (torch.Tensor): (batch * k) x other_features.
+    """
+    if len(others) == len(states):
+        return torch.cat((states, others), dim=1)
+    if isinstance(model, nn.Sequential) and \
+            isinstance(model[0], (SplitLinear, EnsembleSplitLinear)) and \
+            model[0].state_features >= model[0].min_state_features:
+        return states, others
+    return torch.cat((repeat_to(states, len(others)), others), dim=1)
+
+
+def repeat_to(x, length):
+    '''repeat_interleave x along the first dimension up to length'''
+    if len(x) == length:
+        return x
+    return torch.repeat_interleave(x, length // len(x), 0)
+
+
+def stack_ensemble(models):
+    """
+    Convert an ensemble of nn.Sequential models of the same architecture
+    into one nn.Sequential of EnsembleLinear.
+
+    Args:
+        models (nn.ModuleList): nn.Sequential models which consist of
+            nn.Linear and parameter-free layers such as activations.
+
+    Returns:
+        nn.Sequential
+    """
+    layers = []
+    for model_layers in zip(*models):
+        if isinstance(model_layers[0], SplitLinear):
+            first = model_layers[0]
+            layer = EnsembleSplitLinear(
+                len(model_layers), first.state_features,
+                first.in_features - first.state_features,
+                first.out_features).to(first.weight.device)
+            layer.load_state_dict(
+                EnsembleLinear.from_linears(model_layers).state_dict())
+            layers.append(layer)
+        elif isinstance(model_layers[0], nn.Linear):
+            layers.append(EnsembleLinear.from_linears(model_layers))
+        else:
+            assert len(list(model_layers[0].parameters())) == 0, \
+                "{} can't be stacked".format(type(model_layers[0]))
+            layers.append(copy.deepcopy(model_layers[0]))
+    return nn.Sequential(*layers)
+
+
+def unstack_ensemble(model, index):
+    """
+    Copy a model of the ensemble stacked by stack_ensemble
+    into an nn.Sequential of nn.Linear (SplitLinear for EnsembleSplitLinear).
+
+    Args:
+        model (nn.Sequential): nn.Sequential of EnsembleLinear.
+        index (int): Index of the model in the ensemble.
+
+    Returns:
+        nn.Sequential
+    """
+    layers = []
+    for layer in model:
+        if isinstance(layer, EnsembleLinear):
+            if isinstance(layer, EnsembleSplitLinear):
+                linear = SplitLinear(
+                    layer.state_features,
+                    layer.in_features - layer.state_features,
+                    layer.out_features)
+            else:
+                linear = nn.Linear(layer.in_features, layer.out_features)
+            linear.to(layer.weight.device)
+            with torch.no_grad():
+                linear.weight.copy_(layer.weight[index].t())
+                linear.bias.copy_(layer.bias[index, 0])
+            layers.append(linear)
+        else:
+            layers.append(copy.deepcopy(layer))
+    return nn.Sequential(*layers)
+
+
+def ensemble_model_forward(model, x, index):
+    """
+    Compute the output of a model of the ensemble stacked by stack_ensemble
+    without computing the other models, i.e.
+    model(x)[index] == unstack_ensemble(model, index)(x).
+
+    Args:
+        model (nn.Sequential): nn.Sequential of EnsembleLinear.
+        x (torch.Tensor): batch x in_features, or a tuple given by
+            state_action_input.
+        index (int): Index of the model in the ensemble.
+    """
+    for layer in model:
+        if isinstance(layer, EnsembleLinear):
+            x = layer.forward_model(x, index)
+        else:
+            x = layer(x)
+    return x
+
+
+def unstacked_state_dict(model, index):
+    """
+    Return the state_dict of unstack_ensemble(model, index)
+    without copying the model. The tensors are views of
+    the stacked parameters.
+
+    Args:
+        model (nn.Sequential): nn.Sequential of EnsembleLinear.
+        index (int): Index of the model in the ensemble.
+
+    Returns:
+        dict: {key: tensor}
+    """
+    state_dict = {}
+    for i, layer in enumerate(model):
+        if isinstance(layer, EnsembleLinear):
+            state_dict["{}.weight".format(i)] = layer.weight[index].t()
+            state_dict["{}.bias".format(i)] = layer.bias[index, 0]
+        else:
+            for key, value in layer.state_dict().items():
+                state_dict["{}.{}".format(i, key)] = value
+    return state_dict
+
+
 def kl_gaussian(mean1, log_var1, mean2, log_var2, epsilon=1e-4):
     # KL(p||q) when q == N(mean1, log_var1.exp())
     # and p == N(mean2, log_var2.exp())
@@ -212,23 +475,10 @@ def mmd_laplacian(samples1, samples2, sigma=10.0):
     This code was stolen from: https://github.com/aviralkumar2907/BEAR/blob/master/algos.py
     sigma is set to 10.0 for hopper, cheetah and 20 for walker/ant
     """
-
-    # Batch x num_samples x num_samples x dimension
-    diff_x_x = samples1.unsqueeze(2) - samples1.unsqueeze(1)
-    diff_x_x = torch.mean(
-        (-(diff_x_x.abs()).sum(-1)/(2.0 * sigma)).exp(), dim=(1, 2))
-
-    diff_x_y = samples1.unsqueeze(2) - samples2.unsqueeze(1)
-    diff_x_y = torch.mean(
-        (-(diff_x_y.abs()).sum(-1)/(2.0 * sigma)).exp(), dim=(1, 2))
-
-    # Batch x num_samples x num_samples x dimension
-    diff_y_y = samples2.unsqueeze(2) - samples2.unsqueeze(1)
-    diff_y_y = torch.mean(
-        (-(diff_y_y.abs()).sum(-1)/(2.0 * sigma)).exp(), dim=(1, 2))
-
-    overall_loss = (diff_x_x + diff_y_y - 2.0 * diff_x_y + 1e-6).sqrt()
-    return overall_loss
+    # L1 distances of the pairs
+    def distances(x, y):
+        return torch.cdist(x, y, p=1)
+    return _mmd(samples1, samples2, sigma, distances)
 
 
 def mmd_gaussian(samples1, samples2, sigma=10.0):
@@ -237,21 +487,24 @@ def mmd_gaussian(samples1, samples2, sigma=10.0):
     This code was stolen from: https://github.com/aviralkumar2907/BEAR/blob/master/algos.py
     sigma is set to 10.0 for hopper, cheetah and 20 for walker/ant
     """
-
-    # Batch x num_samples x num_samples x dimension
-    diff_x_x = samples1.unsqueeze(
-        2) - samples1.unsqueeze(1)
-    diff_x_x = torch.mean(
-        (-(diff_x_x.pow(2)).sum(-1)/(2.0 * sigma)).exp(), dim=(1, 2))
-
-    diff_x_y = samples1.unsqueeze(2) - samples2.unsqueeze(1)
-    diff_x_y = torch.mean(
-        (-(diff_x_y.pow(2)).sum(-1)/(2.0 * sigma)).exp(), dim=(1, 2))
-
-    # Batch x num_samples x num_samples x dimension
-    diff_y_y = samples2.unsqueeze(2) - samples2.unsqueeze(1)
-    diff_y_y = torch.mean(
-        (-(diff_y_y.pow(2)).sum(-1)/(2.0 * sigma)).exp(), dim=(1, 2))
+    # squared L2 distances of the pairs.
+    # the matmul-based distances are not used since they lose precision
+    def distances(x, y):
+        return torch.cdist(
+            x, y, compute_mode="donot_use_mm_for_euclid_dist").pow(2)
+    return _mmd(samples1, samples2, sigma, distances)
+
+
+def _mmd(samples1, samples2, sigma, distances):
+    # torch.cdist computes Batch x num_samples x num_samples distances
+    # without Batch x num_samples x num_samples x dimension differences
+    def kernel_mean(x, y):
+        return torch.mean((-distances(x, y) / (2.0 * sigma)).exp(),
+                          dim=(1, 2))
+
+    diff_x_x = kernel_mean(samples1, samples1)
+    diff_x_y = kernel_mean(samples1, samples2)
+    diff_y_y = kernel_mean(samples2, samples2)
 
     overall_loss = (diff_x_x + diff_y_y - 2.0 * diff_x_y + 1e-6).sqrt()
     return overall_loss
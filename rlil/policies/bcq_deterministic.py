@@ -1,6 +1,7 @@
 import torch
 from rlil.environments import squash_action
 from rlil.approximation import Approximation
+from rlil import nn
 from rlil.nn import RLNetwork
 
 
@@ -35,9 +36,11 @@ class BCQDeterministicPolicyNetwork(RLNetwork):
         self.phi = phi
 
     def forward(self, states, vae_actions):
-        x = torch.cat((states.features.float(),
-                       vae_actions.features.float()), dim=1)
-        actions = self.model(x) * states.mask.float().unsqueeze(-1)
+        # each state is repeated if vae_actions are k times longer
+        x = nn.state_action_input(self.model, states.features.float(),
+                                  vae_actions.features.float())
+        mask = nn.repeat_to(states.mask.float(), len(vae_actions))
+        actions = self.model(x) * mask.unsqueeze(-1)
         actions = self.phi * \
             squash_action(actions, self._tanh_scale, self._tanh_mean)
         return vae_actions.features + actions
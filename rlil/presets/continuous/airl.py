@@ -27,7 +27,8 @@ def airl(
 
     Args:
         transitions:
-            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions() 
+            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions()
+            or rlil.memory.TransitionDataset which is sampled without loading it.
         base_agent_fn (function):
             A function generated by a preset of an agent such as sac, td3, ddpg
             Currently, the base_agent_fn must be ppo preset.
@@ -57,11 +58,8 @@ def airl(
                             value_optimizer,
                             name='airl_v')
 
-        expert_replay_buffer = ExperienceReplayBuffer(1e7, env)
-        if transitions is not None:
-            samples = expert_replay_buffer.samples_from_cpprb(
-                transitions, device="cpu")
-            expert_replay_buffer.store(samples)
+        expert_replay_buffer = ExperienceReplayBuffer.from_transitions(
+            transitions, env)
 
         replay_buffer = get_replay_buffer()
         replay_buffer = AirlWrapper(buffer=replay_buffer,
@@ -21,7 +21,8 @@ def bc(
 
     Args:
         transitions:
-            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions() 
+            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions()
+            or rlil.memory.TransitionDataset which is sampled without loading it.
         lr_pi (float): Learning rate for the policy network.
         minibatch_size (int): Number of experiences to sample in each training update.
     """
@@ -37,11 +38,8 @@ def bc(
             env.action_space,
         )
 
-        replay_buffer = ExperienceReplayBuffer(1e7, env)
-        if transitions is not None:
-            samples = replay_buffer.samples_from_cpprb(
-                transitions, device="cpu")
-            replay_buffer.store(samples)
+        replay_buffer = ExperienceReplayBuffer.from_transitions(
+            transitions, env)
         set_replay_buffer(replay_buffer)
 
         return BC(
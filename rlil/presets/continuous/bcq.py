@@ -1,8 +1,9 @@
 import torch
 from torch.optim import Adam
 from rlil.agents import BCQ
-from rlil.approximation import (QContinuous,
+from rlil.approximation import (TwinQContinuous,
                                 PolyakTarget,
+                                PolyakUpdates,
                                 BcqEncoder,
                                 BcqDecoder)
 from rlil.policies import BCQDeterministicPolicy
@@ -10,7 +11,7 @@ from rlil.memory import ExperienceReplayBuffer
 from rlil.initializer import (get_device,
                               set_replay_buffer,
                               disable_on_policy_mode)
-from .models import (fc_q,
+from .models import (fc_ensemble_q,
                      fc_bcq_deterministic_policy,
                      fc_bcq_encoder,
                      fc_bcq_decoder)
@@ -28,6 +29,7 @@ def bcq(
         # Training settings
         minibatch_size=100,
         polyak_rate=0.005,
+        prefetch=0,
         # Exploration settings
 ):
     """
@@ -35,7 +37,8 @@ def bcq(
 
     Args:
         transitions:
-            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions() 
+            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions()
+            or rlil.memory.TransitionDataset which is sampled without loading it.
         discount_factor (float): Discount factor for future rewards.
         lr_q (float): Learning rate for the Q network.
         lr_pi (float): Learning rate for the policy network.
@@ -43,27 +46,21 @@ def bcq(
         lr_dec (float): Learning rate for the decoder.
         minibatch_size (int): Number of experiences to sample in each training update.
         polyak_rate (float): Speed with which to update the target network towards the online network.
+        prefetch (int): Number of minibatches sampled ahead by a background thread. Disabled if 0.
     """
     def _bcq(env):
         disable_on_policy_mode()
 
         device = get_device()
-        q_1_model = fc_q(env).to(device)
-        q_1_optimizer = Adam(q_1_model.parameters(), lr=lr_q)
-        q_1 = QContinuous(
-            q_1_model,
-            q_1_optimizer,
-            target=PolyakTarget(polyak_rate),
-            name='q_1'
-        )
-
-        q_2_model = fc_q(env).to(device)
-        q_2_optimizer = Adam(q_2_model.parameters(), lr=lr_q)
-        q_2 = QContinuous(
-            q_2_model,
-            q_2_optimizer,
-            target=PolyakTarget(polyak_rate),
-            name='q_2'
+        # the targets of the agent are averaged at once
+        polyak_updates = PolyakUpdates()
+        q_model = fc_ensemble_q(env, num_qs=2).to(device)
+        q_optimizer = Adam(q_model.parameters(), lr=lr_q)
+        qs = TwinQContinuous(
+            q_model,
+            q_optimizer,
+            target=PolyakTarget(polyak_rate, updates=polyak_updates),
+            name='qs'
         )
 
         policy_model = fc_bcq_deterministic_policy(env).to(device)
@@ -72,7 +69,7 @@ def bcq(
             policy_model,
             policy_optimizer,
             env.action_space,
-            target=PolyakTarget(polyak_rate),
+            target=PolyakTarget(polyak_rate, updates=polyak_updates),
         )
 
         latent_dim = env.action_space.shape[0] * 2
@@ -95,16 +92,12 @@ def bcq(
             name="decoder",
         )
 
-        replay_buffer = ExperienceReplayBuffer(1e7, env)
-        if transitions is not None:
-            samples = replay_buffer.samples_from_cpprb(
-                transitions, device="cpu")
-            replay_buffer.store(samples)
+        replay_buffer = ExperienceReplayBuffer.from_transitions(
+            transitions, env, prefetch=prefetch)
         set_replay_buffer(replay_buffer)
 
         return BCQ(
-            q_1=q_1,
-            q_2=q_2,
+            qs=qs,
             encoder=encoder,
             decoder=decoder,
             policy=policy,
@@ -1,9 +1,9 @@
 import torch
-from torch import nn
 from torch.optim import Adam
 from rlil.agents import BEAR
 from rlil.approximation import (EnsembleQContinuous,
                                 PolyakTarget,
+                                PolyakUpdates,
                                 BcqEncoder,
                                 BcqDecoder)
 from rlil.policies import SoftDeterministicPolicy
@@ -11,7 +11,7 @@ from rlil.memory import ExperienceReplayBuffer
 from rlil.initializer import (get_device,
                               set_replay_buffer,
                               disable_on_policy_mode)
-from .models import (fc_q,
+from .models import (fc_ensemble_q,
                      fc_soft_policy,
                      fc_bcq_encoder,
                      fc_bcq_decoder)
@@ -29,6 +29,7 @@ def bear(
         # Training settings
         minibatch_size=100,
         polyak_rate=0.005,
+        prefetch=0,
         # BEAR settings
         num_qs=2,
         kernel_type="laplacian",
@@ -38,7 +39,8 @@ def bear(
 
     Args:
         transitions:
-            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions() 
+            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions()
+            or rlil.memory.TransitionDataset which is sampled without loading it.
         discount_factor (float): Discount factor for future rewards.
         lr_q (float): Learning rate for the Q network.
         lr_pi (float): Learning rate for the policy network.
@@ -46,18 +48,21 @@ def bear(
         lr_dec (float): Learning rate for the decoder.
         minibatch_size (int): Number of experiences to sample in each training update.
         polyak_rate (float): Speed with which to update the target network towards the online network.
+        prefetch (int): Number of minibatches sampled ahead by a background thread. Disabled if 0.
         num_qs (int): Number of q functions for ensemble.
     """
     def _bear(env):
         disable_on_policy_mode()
 
         device = get_device()
-        q_models = nn.ModuleList([fc_q(env) for _ in range(num_qs)]).to(device)
+        # the targets of the agent are averaged at once
+        polyak_updates = PolyakUpdates()
+        q_models = fc_ensemble_q(env, num_qs=num_qs).to(device)
         qs_optimizer = Adam(q_models.parameters(), lr=lr_q)
         qs = EnsembleQContinuous(
             q_models,
             qs_optimizer,
-            target=PolyakTarget(polyak_rate),
+            target=PolyakTarget(polyak_rate, updates=polyak_updates),
             name='qs'
         )
 
@@ -67,7 +72,7 @@ def bear(
             policy_model,
             policy_optimizer,
             env.action_space,
-            target=PolyakTarget(polyak_rate),
+            target=PolyakTarget(polyak_rate, updates=polyak_updates),
         )
 
         latent_dim = env.action_space.shape[0] * 2
@@ -89,11 +94,8 @@ def bear(
             name="decoder",
         )
 
-        replay_buffer = ExperienceReplayBuffer(1e7, env)
-        if transitions is not None:
-            samples = replay_buffer.samples_from_cpprb(
-                transitions, device="cpu")
-            replay_buffer.store(samples)
+        replay_buffer = ExperienceReplayBuffer.from_transitions(
+            transitions, env, prefetch=prefetch)
         set_replay_buffer(replay_buffer)
 
         return BEAR(
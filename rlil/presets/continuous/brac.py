@@ -2,8 +2,9 @@ import torch
 from torch import nn
 from torch.optim import Adam
 from rlil.agents import BRAC
-from rlil.approximation import (QContinuous,
+from rlil.approximation import (TwinQContinuous,
                                 PolyakTarget,
+                                PolyakUpdates,
                                 BcqEncoder,
                                 BcqDecoder)
 from rlil.policies import SoftDeterministicPolicy
@@ -11,7 +12,7 @@ from rlil.memory import ExperienceReplayBuffer
 from rlil.initializer import (get_device,
                               set_replay_buffer,
                               disable_on_policy_mode)
-from .models import (fc_q,
+from .models import (fc_ensemble_q,
                      fc_soft_policy,
                      fc_bcq_encoder,
                      fc_bcq_decoder)
@@ -35,7 +36,8 @@ def brac(
 
     Args:
         transitions:
-            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions() 
+            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions()
+            or rlil.memory.TransitionDataset which is sampled without loading it.
         discount_factor (float): Discount factor for future rewards.
         lr_q (float): Learning rate for the Q network.
         lr_pi (float): Learning rate for the policy network.
@@ -47,22 +49,15 @@ def brac(
         disable_on_policy_mode()
 
         device = get_device()
-        q_1_model = fc_q(env).to(device)
-        q_1_optimizer = Adam(q_1_model.parameters(), lr=lr_q)
-        q_1 = QContinuous(
-            q_1_model,
-            q_1_optimizer,
-            target=PolyakTarget(polyak_rate),
-            name='q_1'
-        )
-
-        q_2_model = fc_q(env).to(device)
-        q_2_optimizer = Adam(q_2_model.parameters(), lr=lr_q)
-        q_2 = QContinuous(
-            q_2_model,
-            q_2_optimizer,
-            target=PolyakTarget(polyak_rate),
-            name='q_2'
+        # the targets of the agent are averaged at once
+        polyak_updates = PolyakUpdates()
+        q_model = fc_ensemble_q(env, num_qs=2).to(device)
+        q_optimizer = Adam(q_model.parameters(), lr=lr_q)
+        qs = TwinQContinuous(
+            q_model,
+            q_optimizer,
+            target=PolyakTarget(polyak_rate, updates=polyak_updates),
+            name='qs'
         )
 
         policy_model = fc_soft_policy(env).to(device)
@@ -71,7 +66,7 @@ def brac(
             policy_model,
             policy_optimizer,
             env.action_space,
-            target=PolyakTarget(polyak_rate),
+            target=PolyakTarget(polyak_rate, updates=polyak_updates),
         )
 
         behavior_model = fc_soft_policy(env).to(device)
@@ -80,20 +75,16 @@ def brac(
             behavior_model,
             behavior_optimizer,
             env.action_space,
-            target=PolyakTarget(polyak_rate),
+            target=PolyakTarget(polyak_rate, updates=polyak_updates),
             name='behavior_policy'
         )
 
-        replay_buffer = ExperienceReplayBuffer(1e7, env)
-        if transitions is not None:
-            samples = replay_buffer.samples_from_cpprb(
-                transitions, device="cpu")
-            replay_buffer.store(samples)
+        replay_buffer = ExperienceReplayBuffer.from_transitions(
+            transitions, env)
         set_replay_buffer(replay_buffer)
 
         return BRAC(
-            q_1=q_1,
-            q_2=q_2,
+            qs=qs,
             policy=policy,
             behavior_policy=behavior_policy,
             bc_iters=bc_iters,
@@ -1,7 +1,7 @@
 import torch
 from torch.optim import Adam
 from rlil.agents import DDPG
-from rlil.approximation import QContinuous, PolyakTarget
+from rlil.approximation import QContinuous, PolyakTarget, PolyakUpdates
 from rlil.policies import DeterministicPolicy
 from rlil.memory import ExperienceReplayBuffer
 from rlil.initializer import (get_device,
@@ -27,6 +27,8 @@ def ddpg(
         prioritized=False,
         use_apex=False,
         n_step=1,
+        prefetch=0,
+        compile_options=None,
         # Exploration settings
         noise=0.1,
 ):
@@ -44,18 +46,23 @@ def ddpg(
         prioritized (bool): Use prioritized experience replay if True.
         use_apex (bool): Use apex if True.
         n_step (int): Number of steps for N step experience replay.
+        prefetch (int): Number of minibatches sampled ahead by a background thread. Disabled if 0.
+        compile_options (dict): If not None, the networks and optimizer steps are compiled by torch.compile with the options. See rlil.approximation.Compiler.
         noise (float): The amount of exploration noise to add.
     """
     def _ddpg(env):
         disable_on_policy_mode()
 
         device = get_device()
+        # the targets of the agent are averaged at once
+        polyak_updates = PolyakUpdates()
         q_model = fc_q(env).to(device)
         q_optimizer = Adam(q_model.parameters(), lr=lr_q)
         q = QContinuous(
             q_model,
             q_optimizer,
-            target=PolyakTarget(polyak_rate),
+            target=PolyakTarget(polyak_rate, updates=polyak_updates),
+            compile_options=compile_options,
         )
 
         policy_model = fc_deterministic_policy(env).to(device)
@@ -64,7 +71,8 @@ def ddpg(
             policy_model,
             policy_optimizer,
             env.action_space,
-            target=PolyakTarget(polyak_rate),
+            target=PolyakTarget(polyak_rate, updates=polyak_updates),
+            compile_options=compile_options,
         )
 
         if use_apex:
@@ -72,7 +80,8 @@ def ddpg(
         set_n_step(n_step=n_step, discount_factor=discount_factor)
         replay_buffer = ExperienceReplayBuffer(
             replay_buffer_size, env,
-            prioritized=prioritized or use_apex)
+            prioritized=prioritized or use_apex,
+            prefetch=prefetch)
         set_replay_buffer(replay_buffer)
 
         return DDPG(
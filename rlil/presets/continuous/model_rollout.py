@@ -0,0 +1,47 @@
+from torch.optim import Adam
+from rlil.approximation import EnsembleDynamics
+from rlil.memory import ModelRolloutWrapper
+from rlil.environments import REWARDS, TERMINATIONS
+from rlil.initializer import get_device
+from .models import fc_ensemble_dynamics
+
+
+def model_rollout_buffer(replay_buffer,
+                         env,
+                         policy,
+                         real_ratio=0.05,
+                         rollout_frequency=250,
+                         rollout_batch_size=1000,
+                         rollout_length=1,
+                         lr_dyn=1e-3,
+                         ensemble_size=5):
+    """
+    Wrap the replay_buffer of an off-policy preset with
+    rlil.memory.ModelRolloutWrapper, which mixes the rollouts of
+    a probabilistic ensemble dynamics into the minibatches.
+    The reward and the termination functions of env must be registered
+    in rlil.environments.REWARDS and rlil.environments.TERMINATIONS.
+    """
+    assert env.name in REWARDS, \
+        "The reward function of {} is not registered in " \
+        "rlil.environments.reward_fns.".format(env.name)
+    assert env.name in TERMINATIONS, \
+        "The termination function of {} is not registered in " \
+        "rlil.environments.reward_fns.".format(env.name)
+
+    dynamics_model = fc_ensemble_dynamics(
+        env, num_models=ensemble_size).to(get_device())
+    dynamics_optimizer = Adam(dynamics_model.parameters(), lr=lr_dyn)
+    dynamics = EnsembleDynamics(dynamics_model, dynamics_optimizer)
+
+    return ModelRolloutWrapper(
+        replay_buffer,
+        env,
+        dynamics,
+        REWARDS[env.name](),
+        policy,
+        termination_fn=TERMINATIONS[env.name](),
+        real_ratio=real_ratio,
+        rollout_frequency=rollout_frequency,
+        rollout_batch_size=rollout_batch_size,
+        rollout_length=rollout_length)
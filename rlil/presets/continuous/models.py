@@ -8,8 +8,8 @@ from rlil import nn
 
 def fc_q(env, hidden1=400, hidden2=300):
     return nn.Sequential(
-        nn.Linear(env.state_space.shape[0] +
-                  env.action_space.shape[0], hidden1),
+        nn.SplitLinear(env.state_space.shape[0],
+                       env.action_space.shape[0], hidden1),
         nn.LeakyReLU(),
         nn.Linear(hidden1, hidden2),
         nn.LeakyReLU(),
@@ -17,6 +17,17 @@ def fc_q(env, hidden1=400, hidden2=300):
     )
 
 
+def fc_ensemble_q(env, num_qs=2, hidden1=400, hidden2=300):
+    return nn.Sequential(
+        nn.EnsembleSplitLinear(num_qs, env.state_space.shape[0],
+                               env.action_space.shape[0], hidden1),
+        nn.LeakyReLU(),
+        nn.EnsembleLinear(num_qs, hidden1, hidden2),
+        nn.LeakyReLU(),
+        nn.EnsembleLinear(num_qs, hidden2, 1),
+    )
+
+
 def fc_v(env, hidden1=400, hidden2=300):
     return nn.Sequential(
         nn.Linear(env.state_space.shape[0], hidden1),
@@ -103,7 +114,7 @@ def fc_bcq_encoder(env, latent_dim=32, hidden1=400, hidden2=300):
 
 def fc_bcq_decoder(env, latent_dim=32, hidden1=300, hidden2=400):
     return nn.Sequential(
-        nn.Linear(env.state_space.shape[0] + latent_dim, hidden1),
+        nn.SplitLinear(env.state_space.shape[0], latent_dim, hidden1),
         nn.LeakyReLU(),
         nn.Linear(hidden1, hidden2),
         nn.LeakyReLU(),
@@ -113,8 +124,8 @@ def fc_bcq_decoder(env, latent_dim=32, hidden1=300, hidden2=400):
 
 def fc_bcq_deterministic_policy(env, hidden1=400, hidden2=300):
     return nn.Sequential(
-        nn.Linear(env.state_space.shape[0] +
-                  env.action_space.shape[0], hidden1),
+        nn.SplitLinear(env.state_space.shape[0],
+                       env.action_space.shape[0], hidden1),
         nn.LeakyReLU(),
         nn.Linear(hidden1, hidden2),
         nn.LeakyReLU(),
@@ -142,3 +153,16 @@ def fc_dynamics(env, hidden1=500, hidden2=500):
         nn.LeakyReLU(),
         nn.Linear(hidden2, env.state_space.shape[0]),
     )
+
+
+def fc_ensemble_dynamics(env, num_models=5, hidden1=200, hidden2=200):
+    # outputs the means and the log variances of the state differences
+    return nn.Sequential(
+        nn.EnsembleLinear(num_models, env.state_space.shape[0] +
+                          env.action_space.shape[0], hidden1),
+        nn.LeakyReLU(),
+        nn.EnsembleLinear(num_models, hidden1, hidden2),
+        nn.LeakyReLU(),
+        nn.EnsembleLinear(num_models, hidden2,
+                          env.state_space.shape[0] * 2),
+    )
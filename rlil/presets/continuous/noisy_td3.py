@@ -1,14 +1,14 @@
 import torch
 from torch.optim import Adam
 from rlil.agents import NoisyTD3
-from rlil.approximation import QContinuous, PolyakTarget
+from rlil.approximation import TwinQContinuous, PolyakTarget, PolyakUpdates
 from rlil.policies import DeterministicPolicy
 from rlil.memory import ExperienceReplayBuffer
 from rlil.initializer import (get_device,
                               set_replay_buffer,
                               disable_on_policy_mode,
                               set_n_step)
-from .models import fc_q, fc_deterministic_noisy_policy
+from .models import fc_ensemble_q, fc_deterministic_noisy_policy
 
 
 def noisy_td3(
@@ -46,22 +46,15 @@ def noisy_td3(
         disable_on_policy_mode()
 
         device = get_device()
-        q_1_model = fc_q(env).to(device)
-        q_1_optimizer = Adam(q_1_model.parameters(), lr=lr_q)
-        q_1 = QContinuous(
-            q_1_model,
-            q_1_optimizer,
-            target=PolyakTarget(polyak_rate),
-            name='q_1'
-        )
-
-        q_2_model = fc_q(env).to(device)
-        q_2_optimizer = Adam(q_2_model.parameters(), lr=lr_q)
-        q_2 = QContinuous(
-            q_2_model,
-            q_2_optimizer,
-            target=PolyakTarget(polyak_rate),
-            name='q_2'
+        # the targets of the agent are averaged at once
+        polyak_updates = PolyakUpdates()
+        q_model = fc_ensemble_q(env, num_qs=2).to(device)
+        q_optimizer = Adam(q_model.parameters(), lr=lr_q)
+        qs = TwinQContinuous(
+            q_model,
+            q_optimizer,
+            target=PolyakTarget(polyak_rate, updates=polyak_updates),
+            name='qs'
         )
 
         policy_model = fc_deterministic_noisy_policy(env).to(device)
@@ -70,7 +63,7 @@ def noisy_td3(
             policy_model,
             policy_optimizer,
             env.action_space,
-            target=PolyakTarget(polyak_rate),
+            target=PolyakTarget(polyak_rate, updates=polyak_updates),
         )
 
         set_n_step(n_step=n_step, discount_factor=discount_factor)
@@ -78,8 +71,7 @@ def noisy_td3(
         set_replay_buffer(replay_buffer)
 
         return NoisyTD3(
-            q_1,
-            q_2,
+            qs,
             policy,
             noise_td3=noise_td3,
             policy_update_td3=policy_update_td3,
@@ -1,18 +1,25 @@
 import torch
 from torch.optim import Adam
 from rlil.agents import RsMPC
+from rlil.agents.planners import RandomShooting, CEM, MPPI
 from rlil.initializer import (get_device,
                               set_replay_buffer,
                               disable_on_policy_mode)
-from rlil.approximation import Dynamics
+from rlil.approximation import Dynamics, EnsembleDynamics
 from rlil.memory import ExperienceReplayBuffer
 from rlil.environments import REWARDS
-from .models import fc_dynamics
+from .models import fc_dynamics, fc_ensemble_dynamics
 
 
 def rs_mpc(
         horizon=20,
         num_samples=1000,
+        planner="random",
+        num_iterations=5,
+        num_elites=50,
+        temperature=1.0,
+        ensemble_size=None,
+        num_particles=None,
         # Adam optimizer settings
         lr_dyn=1e-3,
         # Training settings
@@ -26,7 +33,18 @@ def rs_mpc(
 
     Args:
         horizon (int): Control horizon.
-        num_samples (int): Number of action samples for random shooting.
+        num_samples (int): Number of action sequences for each state.
+        planner (str): "random" for random shooting, "cem" or "mppi".
+            CEM and MPPI reuse the previous plan as the warm start.
+        num_iterations (int): Number of iterations of CEM and MPPI.
+        num_elites (int): Number of the elite sequences of CEM.
+        temperature (float): Temperature of MPPI.
+        ensemble_size (int, optional): If not None, the dynamics is an
+            ensemble of probabilistic models of the size, and the
+            candidates are propagated by trajectory sampling.
+        num_particles (int, optional): Number of particles propagating
+            each action sequence. Defaults to ensemble_size, i.e. one
+            particle per model, or 1 without the ensemble.
         lr_dyn (float): Learning rate for the dynamics network.
         minibatch_size (int): Number of experiences to sample in each training update.
         replay_buffer_size (int): Maximum number of experiences to store in the replay buffer.
@@ -39,12 +57,36 @@ def rs_mpc(
         disable_on_policy_mode()
         device = get_device()
 
-        dynamics_model = fc_dynamics(env).to(device)
-        dynamics_optimizer = Adam(dynamics_model.parameters(), lr=lr_dyn)
-        dynamics = Dynamics(
-            dynamics_model,
-            dynamics_optimizer,
-        )
+        if ensemble_size is None:
+            dynamics_model = fc_dynamics(env).to(device)
+            dynamics_optimizer = Adam(dynamics_model.parameters(), lr=lr_dyn)
+            dynamics = Dynamics(
+                dynamics_model,
+                dynamics_optimizer,
+            )
+        else:
+            dynamics_model = fc_ensemble_dynamics(
+                env, num_models=ensemble_size).to(device)
+            dynamics_optimizer = Adam(dynamics_model.parameters(), lr=lr_dyn)
+            dynamics = EnsembleDynamics(
+                dynamics_model,
+                dynamics_optimizer,
+            )
+
+        assert planner in ("random", "cem", "mppi"), \
+            "Unknown planner: {}".format(planner)
+        if planner == "random":
+            mpc_planner = RandomShooting(horizon, num_samples, device=device)
+        elif planner == "cem":
+            mpc_planner = CEM(horizon, num_samples,
+                              num_iterations=num_iterations,
+                              num_elites=num_elites,
+                              device=device)
+        else:
+            mpc_planner = MPPI(horizon, num_samples,
+                               num_iterations=num_iterations,
+                               temperature=temperature,
+                               device=device)
 
         replay_buffer = ExperienceReplayBuffer(replay_buffer_size, env)
         set_replay_buffer(replay_buffer)
@@ -52,10 +94,10 @@ def rs_mpc(
         return RsMPC(
             dynamics=dynamics,
             reward_fn=reward_fn,
-            horizon=horizon,
-            num_samples=num_samples,
+            planner=mpc_planner,
             minibatch_size=minibatch_size,
-            replay_start_size=replay_start_size
+            replay_start_size=replay_start_size,
+            num_particles=num_particles or ensemble_size or 1
         )
     return _rs_mpc
 
@@ -1,7 +1,7 @@
 import torch
 from torch.optim import Adam
 from rlil.agents import SAC
-from rlil.approximation import QContinuous, PolyakTarget, VNetwork
+from rlil.approximation import TwinQContinuous, PolyakTarget, VNetwork
 from rlil.policies.soft_deterministic import SoftDeterministicPolicy
 from rlil.memory import ExperienceReplayBuffer
 from rlil.initializer import (get_device,
@@ -9,7 +9,8 @@ from rlil.initializer import (get_device,
                               disable_on_policy_mode,
                               set_n_step,
                               enable_apex)
-from .models import fc_q, fc_v, fc_soft_policy
+from .model_rollout import model_rollout_buffer
+from .models import fc_ensemble_q, fc_v, fc_soft_policy
 
 
 def sac(
@@ -28,6 +29,13 @@ def sac(
         prioritized=False,
         use_apex=False,
         n_step=1,
+        prefetch=0,
+        compile_options=None,
+        # Model rollout settings
+        real_ratio=1.,
+        rollout_frequency=250,
+        rollout_batch_size=1000,
+        rollout_length=1,
         # Exploration settings
         temperature_initial=0.1,
         lr_temperature=1e-5,
@@ -48,6 +56,12 @@ def sac(
         prioritized (bool): Use prioritized experience replay if True.
         use_apex (bool): Use apex if True.
         n_step (int): Number of steps for N step experience replay.
+        prefetch (int): Number of minibatches sampled ahead by a background thread. Disabled if 0.
+        compile_options (dict): If not None, the networks and optimizer steps are compiled by torch.compile with the options. See rlil.approximation.Compiler.
+        real_ratio (float): Ratio of the real transitions in a minibatch. If real_ratio < 1, the rest are sampled from the rollouts of a learned dynamics model (MBPO). See rlil.memory.ModelRolloutWrapper.
+        rollout_frequency (int): Number of training updates between the model rollouts.
+        rollout_batch_size (int): Number of real states to branch the model rollouts from.
+        rollout_length (int): Number of steps of each model rollout.
         temperature_initial (float): Initial value of the temperature parameter.
         lr_temperature (float): Learning rate for the temperature. Should be low compared to other learning rates.
         entropy_target_scaling (float): The target entropy will be -(entropy_target_scaling * env.action_space.shape[0])
@@ -56,20 +70,13 @@ def sac(
         disable_on_policy_mode()
 
         device = get_device()
-        q_1_model = fc_q(env).to(device)
-        q_1_optimizer = Adam(q_1_model.parameters(), lr=lr_q)
-        q_1 = QContinuous(
-            q_1_model,
-            q_1_optimizer,
-            name='q_1'
-        )
-
-        q_2_model = fc_q(env).to(device)
-        q_2_optimizer = Adam(q_2_model.parameters(), lr=lr_q)
-        q_2 = QContinuous(
-            q_2_model,
-            q_2_optimizer,
-            name='q_2'
+        q_model = fc_ensemble_q(env, num_qs=2).to(device)
+        q_optimizer = Adam(q_model.parameters(), lr=lr_q)
+        qs = TwinQContinuous(
+            q_model,
+            q_optimizer,
+            name='qs',
+            compile_options=compile_options,
         )
 
         v_model = fc_v(env).to(device)
@@ -79,6 +86,7 @@ def sac(
             v_optimizer,
             target=PolyakTarget(polyak_rate),
             name='v',
+            compile_options=compile_options,
         )
 
         policy_model = fc_soft_policy(env).to(device)
@@ -87,6 +95,7 @@ def sac(
             policy_model,
             policy_optimizer,
             env.action_space,
+            compile_options=compile_options,
         )
 
         if use_apex:
@@ -94,13 +103,22 @@ def sac(
         set_n_step(n_step=n_step, discount_factor=discount_factor)
         replay_buffer = ExperienceReplayBuffer(
             replay_buffer_size, env,
-            prioritized=prioritized or use_apex)
+            prioritized=prioritized or use_apex,
+            prefetch=prefetch)
+        if real_ratio < 1:
+            assert n_step == 1, \
+                "The model rollouts don't support N step replay"
+            replay_buffer = model_rollout_buffer(
+                replay_buffer, env, policy,
+                real_ratio=real_ratio,
+                rollout_frequency=rollout_frequency,
+                rollout_batch_size=rollout_batch_size,
+                rollout_length=rollout_length)
         set_replay_buffer(replay_buffer)
 
         return SAC(
             policy,
-            q_1,
-            q_2,
+            qs,
             v,
             temperature_initial=temperature_initial,
             entropy_target=(-env.action_space.shape[0]
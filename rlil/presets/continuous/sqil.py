@@ -15,7 +15,8 @@ def sqil(
 
     Args:
         transitions:
-            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions() 
+            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions()
+            or rlil.memory.TransitionDataset which is sampled without loading it.
         base_agent_fn (function):
             A function generated by a preset of an agent such as sac, td3, ddpg
         replay_start_size (int): Number of experiences in replay buffer when training begins.
@@ -23,11 +24,8 @@ def sqil(
     """
     def _sqil(env):
         base_agent = base_agent_fn(env)
-        expert_replay_buffer = ExperienceReplayBuffer(1e7, env)
-        if transitions is not None:
-            samples = expert_replay_buffer.samples_from_cpprb(
-                transitions, device="cpu")
-            expert_replay_buffer.store(samples)
+        expert_replay_buffer = ExperienceReplayBuffer.from_transitions(
+            transitions, env)
 
         replay_buffer = get_replay_buffer()
         replay_buffer = SqilWrapper(replay_buffer,
@@ -1,7 +1,7 @@
 import torch
 from torch.optim import Adam
 from rlil.agents import TD3
-from rlil.approximation import QContinuous, PolyakTarget
+from rlil.approximation import TwinQContinuous, PolyakTarget, PolyakUpdates
 from rlil.policies import DeterministicPolicy
 from rlil.memory import ExperienceReplayBuffer
 from rlil.initializer import (get_device,
@@ -9,7 +9,8 @@ from rlil.initializer import (get_device,
                               disable_on_policy_mode,
                               set_n_step,
                               enable_apex)
-from .models import fc_q, fc_deterministic_policy
+from .model_rollout import model_rollout_buffer
+from .models import fc_ensemble_q, fc_deterministic_policy
 
 
 def td3(
@@ -29,6 +30,13 @@ def td3(
         prioritized=False,
         use_apex=False,
         n_step=1,
+        prefetch=0,
+        compile_options=None,
+        # Model rollout settings
+        real_ratio=1.,
+        rollout_frequency=250,
+        rollout_batch_size=1000,
+        rollout_length=1,
         # Exploration settings
         noise_policy=0.1,
 ):
@@ -48,28 +56,28 @@ def td3(
         prioritized (bool): Use prioritized experience replay if True.
         use_apex (bool): Use apex if True.
         n_step (int): Number of steps for N step experience replay.
+        prefetch (int): Number of minibatches sampled ahead by a background thread. Disabled if 0.
+        compile_options (dict): If not None, the networks and optimizer steps are compiled by torch.compile with the options. See rlil.approximation.Compiler.
+        real_ratio (float): Ratio of the real transitions in a minibatch. If real_ratio < 1, the rest are sampled from the rollouts of a learned dynamics model (MBPO). See rlil.memory.ModelRolloutWrapper.
+        rollout_frequency (int): Number of training updates between the model rollouts.
+        rollout_batch_size (int): Number of real states to branch the model rollouts from.
+        rollout_length (int): Number of steps of each model rollout.
         noise_policy (float): The amount of exploration noise to add.
     """
     def _td3(env):
         disable_on_policy_mode()
 
         device = get_device()
-        q_1_model = fc_q(env).to(device)
-        q_1_optimizer = Adam(q_1_model.parameters(), lr=lr_q)
-        q_1 = QContinuous(
-            q_1_model,
-            q_1_optimizer,
-            target=PolyakTarget(polyak_rate),
-            name='q_1'
-        )
-
-        q_2_model = fc_q(env).to(device)
-        q_2_optimizer = Adam(q_2_model.parameters(), lr=lr_q)
-        q_2 = QContinuous(
-            q_2_model,
-            q_2_optimizer,
-            target=PolyakTarget(polyak_rate),
-            name='q_2'
+        # the targets of the agent are averaged at once
+        polyak_updates = PolyakUpdates()
+        q_model = fc_ensemble_q(env, num_qs=2).to(device)
+        q_optimizer = Adam(q_model.parameters(), lr=lr_q)
+        qs = TwinQContinuous(
+            q_model,
+            q_optimizer,
+            target=PolyakTarget(polyak_rate, updates=polyak_updates),
+            name='qs',
+            compile_options=compile_options,
         )
 
         policy_model = fc_deterministic_policy(env).to(device)
@@ -78,7 +86,8 @@ def td3(
             policy_model,
             policy_optimizer,
             env.action_space,
-            target=PolyakTarget(polyak_rate),
+            target=PolyakTarget(polyak_rate, updates=polyak_updates),
+            compile_options=compile_options,
         )
 
         if use_apex:
@@ -86,12 +95,21 @@ def td3(
         set_n_step(n_step=n_step, discount_factor=discount_factor)
         replay_buffer = ExperienceReplayBuffer(
             replay_buffer_size, env,
-            prioritized=prioritized or use_apex)
+            prioritized=prioritized or use_apex,
+            prefetch=prefetch)
+        if real_ratio < 1:
+            assert n_step == 1, \
+                "The model rollouts don't support N step replay"
+            replay_buffer = model_rollout_buffer(
+                replay_buffer, env, policy,
+                real_ratio=real_ratio,
+                rollout_frequency=rollout_frequency,
+                rollout_batch_size=rollout_batch_size,
+                rollout_length=rollout_length)
         set_replay_buffer(replay_buffer)
 
         return TD3(
-            q_1,
-            q_2,
+            qs,
             policy,
             noise_policy=noise_policy,
             noise_td3=noise_td3,
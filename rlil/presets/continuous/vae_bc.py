@@ -24,7 +24,8 @@ def vae_bc(
 
     Args:
         transitions:
-            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions() 
+            dictionary of transitions generated by cpprb.ReplayBuffer.get_all_transitions()
+            or rlil.memory.TransitionDataset which is sampled without loading it.
         lr_enc (float): Learning rate for the encoder.
         lr_dec (float): Learning rate for the decoder.
         minibatch_size (int): Number of experiences to sample in each training update.
@@ -53,11 +54,8 @@ def vae_bc(
             name="decoder",
         )
 
-        replay_buffer = ExperienceReplayBuffer(1e7, env)
-        if transitions is not None:
-            samples = replay_buffer.samples_from_cpprb(
-                transitions, device="cpu")
-            replay_buffer.store(samples)
+        replay_buffer = ExperienceReplayBuffer.from_transitions(
+            transitions, env)
         set_replay_buffer(replay_buffer)
 
         return VaeBC(
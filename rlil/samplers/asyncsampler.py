@@ -1,9 +1,13 @@
 import ray
 import numpy as np
 import os
+import resource
+import time
 import torch
-from rlil.initializer import get_replay_buffer, call_seed
+from rlil.initializer import (get_replay_buffer, call_seed,
+                              enable_profiling, get_profiler)
 from rlil.environments import State, Action
+from rlil.memory import WrittenRange
 from rlil.samplers import Sampler
 from collections import defaultdict, namedtuple
 
@@ -14,24 +18,52 @@ StartInfo = namedtuple("StartInfo",
                         "train_steps"],
                        defaults=(None, ) * 3)
 
+# template: ObjectRef of a LazyAgent, or None to keep the worker's LazyAgent
+# weights: list of ObjectRefs of the state_dicts to be loaded in order
+# delta: if True, the weights are fp16 differences from the previous ones
+LazyAgentUpdate = namedtuple("LazyAgentUpdate",
+                             ["template", "weights", "delta"])
+
 
 @ray.remote
 class Worker:
-    def __init__(self, make_env, seed):
+    def __init__(self, make_env, seed, num_envs=1, writer=None,
+                 profile=False, nice=0):
+        if nice > 0:
+            # lower the scheduling priority of the worker
+            os.nice(nice)
         self.seed = seed
         np.random.seed(seed)
         torch.manual_seed(seed)
         if torch.cuda.is_available():
             torch.cuda.manual_seed_all(seed)
-        self._env = make_env()
-        self._env.seed(seed)
+        # each environment has its own seed
+        self._envs = [make_env() for _ in range(num_envs)]
+        for i, env in enumerate(self._envs):
+            env.seed(seed + i)
+        self._env = self._envs[0]
+        # rlil.memory.SharedMemoryWriter
+        self._writer = writer
+        # persistent LazyAgent updated by LazyAgentUpdate
+        self._lazy_agent = None
+        # staging replay_buffers reused between sample calls.
+        # keys are (n_step, discount_factor) of lazy_agents.
+        self._replay_buffers = {}
+        # None if the env has no time limit
+        self._max_episode_steps = getattr(
+            self._env.env, "_max_episode_steps", None)
+        # the timings are returned with sample_info
+        self._profiler = get_profiler()
+        if profile:
+            enable_profiling()
 
         print("Worker initialized in PID: {}".format(os.getpid()))
 
     def sample(self, lazy_agent, worker_frames, worker_episodes):
         """
         Args:
-            lazy_agent (rlil.agent.LazyAgent): agent for sampling
+            lazy_agent (rlil.agent.LazyAgent or LazyAgentUpdate):
+                agent for sampling, or the update of the worker's agent
             worker_frames (int): number of frames to collect
             worker_episodes (int): number of episodes to collect
 
@@ -40,12 +72,25 @@ class Worker:
                 keys: 
                     frames: the number of frames each episode
                     returns: the return per episode
+                    sample_seconds: wall time of the sample call
+                    timings: durations of the profiled phases
+                        if profiling is enabled
 
             (States, Actions, rewards, NextStates)
+            or rlil.memory.WrittenRange if the worker has a writer
         """
 
+        self._sample_start = time.perf_counter()
+        if isinstance(lazy_agent, LazyAgentUpdate):
+            lazy_agent = self._update_lazy_agent(lazy_agent)
+
+        if len(self._envs) > 1:
+            return self._sample_vectorized(
+                lazy_agent, worker_frames, worker_episodes)
+
+        profiler = self._profiler
         sample_info = {"frames": [], "returns": []}
-        lazy_agent.set_replay_buffer(self._env)
+        self._set_replay_buffer(lazy_agent, worker_frames, worker_episodes)
 
         # Sample until it reaches worker_frames or worker_episodes.
         while sum(sample_info["frames"]) < worker_frames \
@@ -57,8 +102,10 @@ class Worker:
             _frames = 0
 
             while not self._env.done:
-                self._env.step(action)
-                action = lazy_agent.act(self._env.state, self._env.reward)
+                with profiler.timer("worker/env_step"):
+                    self._env.step(action)
+                with profiler.timer("worker/act"):
+                    action = lazy_agent.act(self._env.state, self._env.reward)
                 _frames += 1
                 _return += self._env.reward.item()
 
@@ -66,10 +113,198 @@ class Worker:
             sample_info["frames"].append(_frames)
             sample_info["returns"].append(_return)
 
+        return self._add_timings(sample_info), self._get_samples(lazy_agent)
+
+    def _sample_vectorized(self, lazy_agent, worker_frames, worker_episodes):
+        """
+        Step all the environments in lockstep and compute their actions
+        with a single forward pass of the lazy_agent.
+        An environment which finishes its episode is reset if more frames or
+        episodes are required. Otherwise, it stays idle with its terminal
+        state, whose transitions are not stored in the replay_buffer.
+        """
+
+        assert lazy_agent._n_step == 1, \
+            "Nstep replay buffer is not supported with num_envs > 1"
+
+        profiler = self._profiler
+        sample_info = {"frames": [], "returns": []}
+        self._set_replay_buffer(lazy_agent, worker_frames, worker_episodes)
+
+        num_envs = len(self._envs)
+        active = [False] * num_envs
+        frames = [0] * num_envs
+        returns = [0.0] * num_envs
+
+        def should_start():
+            # count the frames and episodes of the running episodes
+            started_frames = sum(sample_info["frames"]) + sum(frames)
+            started_episodes = len(sample_info["frames"]) + sum(active)
+            return started_frames < worker_frames \
+                and started_episodes < worker_episodes
+
+        for i, env in enumerate(self._envs):
+            env.reset()
+            active[i] = should_start()
+
+        while any(active):
+            states = State.from_list(
+                [env.state if active[i] else _terminal(env.state)
+                 for i, env in enumerate(self._envs)])
+            rewards = torch.cat([env.reward for env in self._envs])
+            with profiler.timer("worker/act"):
+                actions = lazy_agent.act(states, rewards)
+
+            for i, env in enumerate(self._envs):
+                if not active[i]:
+                    continue
+
+                # the terminal transition was stored by the act above
+                if env.done:
+                    active[i] = False
+                    if should_start():
+                        env.reset()
+                        active[i] = True
+                    continue
+
+                with profiler.timer("worker/env_step"):
+                    env.step(actions[i])
+                frames[i] += 1
+                returns[i] += env.reward.item()
+
+                if env.done:
+                    sample_info["frames"].append(frames[i])
+                    sample_info["returns"].append(returns[i])
+                    frames[i] = 0
+                    returns[i] = 0.0
+
+        return self._add_timings(sample_info), self._get_samples(lazy_agent)
+
+    def set_writer(self, writer):
+        '''Write the samples into the shared memory with the writer'''
+        self._writer = writer
+
+    def _add_timings(self, sample_info):
+        sample_info["sample_seconds"] = \
+            time.perf_counter() - self._sample_start
+        if self._profiler.enabled:
+            sample_info["timings"] = self._profiler.pop_recent()
+        return sample_info
+
+    def _update_lazy_agent(self, update):
+        if update.template is not None:
+            self._lazy_agent = ray.get(update.template)
+        for weights in update.weights:
+            _load_state_dicts(self._lazy_agent, ray.get(weights), update.delta)
+        return self._lazy_agent
+
+    def _staging_size(self, worker_frames, worker_episodes):
+        # upper bound of the number of transitions in a sample call
+        if self._max_episode_steps is None:
+            return 1e7
+        sizes = [1e7]
+        if worker_episodes != np.inf:
+            sizes.append(worker_episodes * self._max_episode_steps)
+        if worker_frames != np.inf:
+            # the running episodes may exceed worker_frames
+            sizes.append(worker_frames
+                         + len(self._envs) * self._max_episode_steps)
+        # +1 since the replay_buffer requires a larger size than the samples
+        return int(min(sizes)) + 1
+
+    def _set_replay_buffer(self, lazy_agent, worker_frames, worker_episodes):
+        """
+        Set a staging replay_buffer to the lazy_agent.
+        The buffer is allocated only when the worker has no buffer
+        large enough for the lazy_agent. Otherwise, the buffer is cleared
+        and reused.
+        """
+        size = self._staging_size(worker_frames, worker_episodes)
+        key = (lazy_agent._n_step, lazy_agent._discount_factor)
+        replay_buffer = self._replay_buffers.get(key)
+        if replay_buffer is None or replay_buffer.get_buffer_size() < size:
+            # release the old buffer before allocating the new one
+            self._replay_buffers.pop(key, None)
+            lazy_agent.set_replay_buffer(self._env, size=size)
+            self._replay_buffers[key] = lazy_agent.replay_buffer
+        else:
+            replay_buffer.clear()
+            lazy_agent.replay_buffer = replay_buffer
+
+    def memory_usage(self):
+        """
+        Returns:
+            dict:
+                keys:
+                    staging_buffer_bytes: bytes of the staging replay_buffers
+                    max_rss_bytes: peak resident set size of the worker
+        """
+        return {"staging_buffer_bytes":
+                sum(buffer.nbytes for buffer
+                    in self._replay_buffers.values()),
+                # ru_maxrss is in kilobytes on linux
+                "max_rss_bytes":
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+    def _get_samples(self, lazy_agent):
+        if self._writer is not None:
+            # write the samples into the shared memory replay_buffer
+            return self._writer.write(
+                lazy_agent.replay_buffer.get_all_transitions(
+                    return_cpprb=True))
+
         samples = lazy_agent.replay_buffer.get_all_transitions()
         samples.weights = lazy_agent.compute_priorities(samples)
+        return samples
+
+
+def _state_dicts(models):
+    # copy the weights of the models or the state_dicts to cpu
+    return {name: {key: value.detach().to("cpu", copy=True)
+                   for key, value in (model if isinstance(model, dict)
+                                      else model.state_dict()).items()}
+            for name, model in models.items()}
+
+
+def _fp16_delta(state_dicts, base):
+    """
+    Return the fp16 difference between state_dicts and base.
+    base is updated to base + delta, which the workers reproduce exactly,
+    so that the rounding errors don't accumulate.
+    """
+    deltas = {}
+    for name, state_dict in state_dicts.items():
+        deltas[name] = {}
+        for key, value in state_dict.items():
+            if value.is_floating_point():
+                delta = (value - base[name][key]).half()
+                base[name][key] += delta.to(value.dtype)
+            else:
+                delta = value
+                base[name][key] = value
+            deltas[name][key] = delta
+    return deltas
+
+
+def _load_state_dicts(lazy_agent, state_dicts, delta=False):
+    for name, state_dict in state_dicts.items():
+        model = getattr(lazy_agent, name)
+        if not delta:
+            model.load_state_dict(state_dict)
+            continue
+        current = model.state_dict()
+        for key, value in state_dict.items():
+            if current[key].is_floating_point():
+                current[key].add_(value.to(current[key].dtype))
+            else:
+                current[key].copy_(value)
+
 
-        return sample_info, samples
+def _terminal(state):
+    # the transitions from done states are removed by the replay_buffer
+    return State(state.features,
+                 torch.zeros(len(state), dtype=torch.bool),
+                 state.info)
 
 
 class AsyncSampler(Sampler):
@@ -77,22 +312,156 @@ class AsyncSampler(Sampler):
     AsyncSampler collects samples with asynchronous workers.
     All the workers have the same agent, which is given by the argument
     of the start_sampling method.
+
+    Args:
+        env (rlil.environments.GymEnvironment): Environment to be duplicated
+        num_workers (int): Number of workers
+        num_envs (int): Number of environments each worker steps in lockstep.
+            The actions of all the environments are computed with
+            a single batched forward pass of the lazy_agent.
+        fp16_delta (bool): If True, update_agent broadcasts the weights
+            as fp16 differences from the previous version.
+        nice (int): Niceness added to the worker processes, e.g. 10 for
+            evaluation workers which shouldn't slow down the training.
     """
 
     def __init__(
             self,
             env,
             num_workers=1,
+            num_envs=1,
+            fp16_delta=False,
+            nice=0,
     ):
         self._env = env
         seed = call_seed()
-        self._workers = [Worker.remote(env.duplicate, seed+i)
+        self.replay_buffer = get_replay_buffer()
+        self._profiler = get_profiler()
+        self._workers = [Worker.remote(env.duplicate,
+                                       seed + i * num_envs,
+                                       num_envs,
+                                       None,
+                                       self._profiler.enabled,
+                                       nice)
                          for i in range(num_workers)]
+        # the writers of the shared memory replay_buffer are made
+        # when the workers first sample with store_samples=True
+        self._has_writers = False
         self._work_ids = {worker: None for worker in self._workers}
-        self.replay_buffer = get_replay_buffer()
+        # total seconds the workers spent in the sample calls
+        self.sample_seconds = 0.0
+
+        # broadcast of the lazy_agent
+        self._fp16_delta = fp16_delta
+        self._lazy_agent = None
+        self._template = None
+        self._template_id = 0
+        self._template_kwargs = None
+        self._version = 0
+        # weights of the latest version, and its ObjectRef if put
+        self._weights = None
+        self._weights_ref = None
+        # {version: ObjectRef of the delta from version - 1}
+        self._deltas = {}
+        # {worker: (template_id, version)} of the worker's lazy_agent
+        self._worker_versions = {worker: (None, None)
+                                 for worker in self._workers}
+
+    def update_agent(self, agent, evaluation=False, store_samples=True):
+        """
+        Update the lazy_agent used by start_sampling without lazy_agent.
+        If agent.lazy_agent_models() is not None, the workers keep
+        their lazy_agents and receive only the versioned weights,
+        which are put in the object store once and shared by all the workers.
+        Otherwise, a new lazy_agent is made and sent to every worker.
+
+        Args:
+            agent (rlil.agents.Agent): Agent to make the lazy_agent
+            evaluation (bool): Argument of agent.make_lazy_agent
+            store_samples (bool): Argument of agent.make_lazy_agent
+        """
+        kwargs = {"evaluation": evaluation, "store_samples": store_samples}
+        if store_samples:
+            self._make_writers()
+        models = agent.lazy_agent_models()
+        if models is None:
+            with self._profiler.timer("sampler/make_lazy_agent"):
+                self._lazy_agent = agent.make_lazy_agent(**kwargs)
+            self._template = None
+            return
+        self._lazy_agent = None
+
+        if self._template is None or kwargs != self._template_kwargs:
+            # the template has the weights of version 0
+            with self._profiler.timer("sampler/make_lazy_agent"):
+                lazy_agent = agent.make_lazy_agent(**kwargs)
+            self._template = ray.put(lazy_agent)
+            self._template_id += 1
+            self._template_kwargs = kwargs
+            self._version = 0
+            self._weights = _state_dicts(
+                {name: getattr(lazy_agent, name) for name in models})
+            self._weights_ref = None
+            self._deltas = {}
+            return
+
+        self._version += 1
+        self._weights_ref = None
+        weights = _state_dicts(models)
+        if self._fp16_delta:
+            self._deltas[self._version] = \
+                ray.put(_fp16_delta(weights, self._weights))
+        else:
+            self._weights = weights
+
+    def _make_writers(self):
+        # workers write samples into the shared memory replay_buffer
+        if self._has_writers or not self.replay_buffer.shared_memory:
+            return
+        writers = self.replay_buffer.make_writers(len(self._workers))
+        for worker, writer in zip(self._workers, writers):
+            worker.set_writer.remote(writer)
+        self._has_writers = True
+
+    def _lazy_agent_update(self, worker):
+        template_id, version = self._worker_versions[worker]
+        self._worker_versions[worker] = (self._template_id, self._version)
+
+        if template_id != self._template_id:
+            update = LazyAgentUpdate(self._template, [], False)
+            if self._version == 0:
+                return update
+        elif version == self._version:
+            return LazyAgentUpdate(None, [], False)
+        elif self._fp16_delta and \
+                all(v in self._deltas
+                    for v in range(version + 1, self._version + 1)):
+            return LazyAgentUpdate(
+                None,
+                [self._deltas[v]
+                 for v in range(version + 1, self._version + 1)],
+                True)
+        else:
+            update = LazyAgentUpdate(None, [], False)
+
+        # send the latest weights
+        if self._weights_ref is None:
+            self._weights_ref = ray.put(self._weights)
+        return update._replace(weights=[self._weights_ref])
+
+    def _prune_deltas(self):
+        # remove the deltas which all the workers have received.
+        # the workers with another template receive the full weights.
+        versions = [version for template_id, version
+                    in self._worker_versions.values()
+                    if template_id == self._template_id]
+        oldest = min(versions, default=self._version)
+        for version in list(self._deltas):
+            if version <= oldest:
+                del self._deltas[version]
 
     def start_sampling(self,
-                       lazy_agent,
+                       lazy_agent=None,
                        start_info=StartInfo(),
                        worker_frames=np.inf,
                        worker_episodes=np.inf,
@@ -101,14 +470,44 @@ class AsyncSampler(Sampler):
         # start_info has the information about when the sampling starts
         assert worker_frames != np.inf or worker_episodes != np.inf, \
             "worker_frames or worker_episodes must be specified"
+        if lazy_agent is not None \
+                and getattr(lazy_agent, "_store_samples", True):
+            self._make_writers()
 
         # start sample method if the worker is ready
         for worker in self._workers:
             if self._work_ids[worker] is None:
+                if lazy_agent is not None:
+                    worker_agent = lazy_agent
+                    # the worker's lazy_agent is replaced
+                    self._worker_versions[worker] = (None, None)
+                elif self._template is None:
+                    assert self._lazy_agent is not None, \
+                        "Call update_agent before start_sampling."
+                    worker_agent = self._lazy_agent
+                    self._worker_versions[worker] = (None, None)
+                else:
+                    worker_agent = self._lazy_agent_update(worker)
                 self._work_ids[worker] = \
                     {"id": worker.sample.remote(
-                        lazy_agent, worker_frames, worker_episodes),
+                        worker_agent, worker_frames, worker_episodes),
                      "start_info": start_info}
+        self._prune_deltas()
+
+    @property
+    def num_workers(self):
+        return len(self._workers)
+
+    def memory_usage(self):
+        """
+        Return the memory usage of each worker.
+        This method blocks until the running sample calls finish.
+
+        Returns:
+            list of dict: See Worker.memory_usage
+        """
+        return ray.get([worker.memory_usage.remote()
+                        for worker in self._workers])
 
     def store_samples(self, timeout=-1, evaluation=False):
         # if timeout < 0, wait until the sampling finishes
@@ -121,20 +520,71 @@ class AsyncSampler(Sampler):
             _id = item["id"]
             start_info = item["start_info"]
             if timeout > 0:
-                ready_id, remaining_id = \
-                    ray.wait([_id], num_returns=1, timeout=timeout)
+                with self._profiler.timer("sampler/ray_wait"):
+                    ready_id, remaining_id = \
+                        ray.wait([_id], num_returns=1, timeout=timeout)
             else:
                 ready_id = [_id]
 
             # if there is at least one finished worker
             if len(ready_id) > 0:
                 # merge results
-                sample_info, samples = ray.get(ready_id[0])
+                with self._profiler.timer("sampler/ray_get"):
+                    sample_info, samples = ray.get(ready_id[0])
+                self._profiler.merge(sample_info.pop("timings", {}))
+                self.sample_seconds += sample_info.pop("sample_seconds", 0.0)
                 result[start_info]["frames"] += sample_info["frames"]
                 result[start_info]["returns"] += sample_info["returns"]
 
                 self._work_ids[worker] = None
                 if not evaluation:
-                    self.replay_buffer.store(samples, priorities=samples.weights)
+                    self.store(samples)
 
         return result
+
+    def collect_samples(self, timeout=None):
+        """
+        Wait until at least one worker finishes sampling, and return
+        the results of the finished workers without storing the samples.
+        The finished workers become ready for start_sampling.
+
+        Args:
+            timeout (float, optional): Maximum seconds to wait.
+                If None, wait until a worker finishes.
+
+        Returns:
+            list of (start_info, sample_info, samples)
+        """
+        running = {item["id"]: worker
+                   for worker, item in self._work_ids.items()
+                   if item is not None}
+        if len(running) == 0:
+            return []
+
+        with self._profiler.timer("sampler/ray_wait"):
+            ready_ids, _ = ray.wait(list(running), num_returns=1,
+                                    timeout=timeout)
+        if len(ready_ids) > 0:
+            # the other finished workers are also collected
+            ready_ids, _ = ray.wait(list(running),
+                                    num_returns=len(running), timeout=0)
+
+        results = []
+        for _id in ready_ids:
+            worker = running[_id]
+            with self._profiler.timer("sampler/ray_get"):
+                sample_info, samples = ray.get(_id)
+            self._profiler.merge(sample_info.pop("timings", {}))
+            self.sample_seconds += sample_info.pop("sample_seconds", 0.0)
+            results.append((self._work_ids[worker]["start_info"],
+                            sample_info,
+                            samples))
+            self._work_ids[worker] = None
+        return results
+
+    def store(self, samples):
+        '''Store the samples returned by collect_samples'''
+        if isinstance(samples, WrittenRange):
+            self.replay_buffer.commit(samples)
+        else:
+            self.replay_buffer.store(samples, priorities=samples.weights)
@@ -1,3 +1,7 @@
+import torch
+from functools import lru_cache
+
+
 class Samples:
     def __init__(self, states=None, actions=None, rewards=None,
                  next_states=None, weights=None, indexes=None):
@@ -21,3 +25,16 @@ def samples_to_np(samples):
     np_next_states, np_next_dones = samples.next_states.raw_numpy()
     return np_states, np_rewards, np_actions, np_next_states, \
         np_dones, np_next_dones
+
+
+@lru_cache(maxsize=64)
+def _cached_ones(size, dtype, device):
+    return torch.ones(size, dtype=dtype, device=device)
+
+
+def cached_ones(size, dtype=torch.float32, device="cpu"):
+    """
+    Return a tensor of ones which is shared by the callers
+    with the same arguments. Don't modify it in place.
+    """
+    return _cached_ones(size, dtype, torch.device(device))
@@ -0,0 +1,163 @@
+import random
+import time
+import threading
+import numpy as np
+import torch
+from collections import defaultdict
+from functools import wraps
+
+
+class Profiler:
+    """
+    Profiler measures the wall time of the named phases of the training
+    loop, e.g. replay_buffer/sample or reinforce/q.
+    timer returns a shared no-op context manager while the profiler is
+    disabled, so that the timers can stay in the hot paths.
+
+    Each phase keeps the number of calls, the total and the max seconds
+    for the summary table, and the recent durations for the histograms,
+    which are popped when the writer writes the histograms.
+    CUDA kernels run asynchronously: if synchronize is True,
+    the device is synchronized at the phase boundaries so that the
+    kernels are charged to the phase launching them.
+
+    Args:
+        max_recent (int): Number of the recent durations kept per phase.
+            If more durations are recorded before they are popped,
+            max_recent of them are kept by reservoir sampling.
+    """
+
+    def __init__(self, max_recent=10000):
+        self.enabled = False
+        self.synchronize = False
+        self._max_recent = max_recent
+        self._lock = threading.Lock()
+        # {name: [count, total, max]}
+        self._stats = defaultdict(lambda: [0, 0.0, 0.0])
+        self._recent = defaultdict(list)
+        # number of the durations recorded since the last pop
+        self._num_recent = defaultdict(int)
+
+    def timer(self, name):
+        '''Context manager measuring the phase'''
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def timed(self, name):
+        '''Decorator measuring the calls of the function'''
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record(self, name, seconds):
+        with self._lock:
+            stats = self._stats[name]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            recent = self._recent[name]
+            self._num_recent[name] += 1
+            if len(recent) < self._max_recent:
+                recent.append(seconds)
+            else:
+                i = random.randrange(self._num_recent[name])
+                if i < self._max_recent:
+                    recent[i] = seconds
+
+    def merge(self, durations):
+        """
+        Record the durations measured by another process,
+        e.g. the output of pop_recent of a worker.
+
+        Args:
+            durations (dict): {name: list of seconds}
+        """
+        for name, seconds in durations.items():
+            for s in seconds:
+                self.record(name, s)
+
+    def pop_recent(self, names=None):
+        """
+        Return and clear the recent durations as {name: list}
+
+        Args:
+            names (list, optional): Names of the phases to be popped.
+                If None, all the phases are popped.
+        """
+        with self._lock:
+            if names is None:
+                names = list(self._recent)
+            recent = {name: self._recent.pop(name) for name in names
+                      if name in self._recent}
+            for name in recent:
+                self._num_recent.pop(name, None)
+        return recent
+
+    def write(self, writer, step="train_steps"):
+        """
+        Write the histograms of the recent durations in milliseconds.
+        The durations of a phase are kept until the writer writes
+        its histogram, see Writer.histogram_due.
+        """
+        with self._lock:
+            names = list(self._recent)
+        names = [name for name in names
+                 if writer.histogram_due("profile/" + name, step)]
+        for name, seconds in self.pop_recent(names).items():
+            if len(seconds) > 0:
+                writer.add_histogram("profile/" + name,
+                                     np.array(seconds) * 1e3, step=step)
+
+    def summary(self):
+        '''Return the table of the phases sorted by the total time'''
+        with self._lock:
+            stats = sorted(self._stats.items(),
+                           key=lambda item: item[1][1], reverse=True)
+        rows = ["{:<32}{:>10}{:>12}{:>12}{:>12}".format(
+            "phase", "calls", "total [s]", "mean [ms]", "max [ms]")]
+        for name, (count, total, max_seconds) in stats:
+            rows.append("{:<32}{:>10}{:>12.3f}{:>12.3f}{:>12.3f}".format(
+                name, count, total, total / count * 1e3, max_seconds * 1e3))
+        return "\n".join(rows)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._recent.clear()
+            self._num_recent.clear()
+
+
+class _Timer:
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        if self._profiler.synchronize and torch.cuda.is_available():
+            torch.cuda.synchronize()
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if self._profiler.synchronize and torch.cuda.is_available():
+            torch.cuda.synchronize()
+        self._profiler.record(self._name, time.perf_counter() - self._start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
@@ -1,6 +1,9 @@
 import csv
 import os
 import subprocess
+import threading
+import queue
+import time
 import torch
 import numpy as np
 from abc import ABC, abstractmethod
@@ -21,6 +24,10 @@ class Writer(ABC):
     def add_text(self, name, text, step="sample_frames"):
         pass
 
+    def histogram_due(self, name, step="train_steps"):
+        '''Return True if add_histogram of the name writes the values'''
+        return True
+
     def _get_step_value(self, _type):
         if type(_type) is not str:
             raise ValueError("step must be str")
@@ -46,13 +53,33 @@ class DummyWriter(Writer):
     def add_text(self, name, text, step="sample_frames"):
         pass
 
+    def add_histogram(self, name, values, step="train_steps"):
+        pass
+
 
 class ExperimentWriter(SummaryWriter, Writer):
+    """
+    Writer of the experiment results to TensorBoard.
+    Scalars are written every sample_frame_interval,
+    sample_episode_interval and train_step_interval.
+
+    add_scalar doesn't transfer tensors to the cpu. The values passing
+    the interval check are kept as detached tensors, and the pending
+    values are transferred at once and written by a background thread
+    when max_pending_scalars values are pending or pending_scalar_secs
+    have passed. Call flush or close to write all the values.
+    Tensors passed to add_scalar must not be modified in place.
+    add_scalar can be called from multiple threads. The errors of the
+    background thread are logged, and the first one is raised by close.
+    """
+
     def __init__(self, agent_name, env_name,
                  sample_frame_interval=1e4,
                  sample_episode_interval=1e2,
                  train_step_interval=1e2,
-                 exp_info="default_experiments"):
+                 exp_info="default_experiments",
+                 max_pending_scalars=1000,
+                 pending_scalar_secs=10):
         try:
             os.mkdir("runs")
         except FileExistsError:
@@ -78,41 +105,142 @@ class ExperimentWriter(SummaryWriter, Writer):
         self._name_frame_history = defaultdict(lambda: 0)
         super().__init__(log_dir=self.log_dir)
 
+        # scalars waiting for the transfer
+        self._max_pending_scalars = max_pending_scalars
+        self._pending_scalar_secs = pending_scalar_secs
+        self._pending_scalars = []
+        self._scalar_lock = threading.Lock()
+        self._last_scalar_flush = time.time()
+        self._scalar_queue = queue.Queue()
+        self._scalar_error = None
+        self._scalar_closed = False
+        self._scalar_thread = threading.Thread(
+            target=self._write_scalars_loop, daemon=True)
+        self._scalar_thread.start()
+
     def add_scalar(self, name, value, step="train_steps",
                    step_value=None, save_csv=False):
-        if isinstance(value, torch.Tensor):
-            value = value.cpu().detach().item()
-        if isinstance(value, np.ndarray):
-            value = value.item()
-
         step_value = self._get_step_value(
             step) if step_value is None else step_value
         value_name = self.env_name + "/" + name + "/" + step
 
-        # add data every self._add_scalar_interval
-        if step_value - self._name_frame_history[value_name] >= self._add_scalar_interval[step]:
-            super().add_scalar(value_name, value, step_value)
+        if isinstance(value, torch.Tensor):
+            value = value.detach()
+        elif isinstance(value, np.ndarray):
+            value = value.item()
+        csv_path = os.path.join(self.log_dir, name + ".csv") \
+            if save_csv else None
+
+        with self._scalar_lock:
+            # add data every self._add_scalar_interval
+            if step_value - self._name_frame_history[value_name] < \
+                    self._add_scalar_interval[step]:
+                return
             self._name_frame_history[value_name] = step_value
-
-            if save_csv:
-                with open(os.path.join(self.log_dir, name + ".csv"), "a") as csvfile:
-                    csv.writer(csvfile).writerow(
-                        [step_value, value])
+            self._pending_scalars.append(
+                (value_name, value, step_value, csv_path))
+            should_flush = \
+                len(self._pending_scalars) >= self._max_pending_scalars or \
+                time.time() - self._last_scalar_flush \
+                >= self._pending_scalar_secs
+
+        if should_flush:
+            self.flush_scalars()
+
+    def flush_scalars(self):
+        '''Pass the pending scalars to the background thread'''
+        with self._scalar_lock:
+            self._last_scalar_flush = time.time()
+            if len(self._pending_scalars) == 0:
+                return
+            pending, self._pending_scalars = self._pending_scalars, []
+            # put in the lock to keep the order of the scalars
+            if not self._scalar_closed:
+                self._scalar_queue.put(pending)
+                return
+        # closed writer
+        self._write_scalars(pending)
+
+    def flush(self):
+        self.flush_scalars()
+        self._scalar_queue.join()
+        super().flush()
+
+    def close(self):
+        self.flush_scalars()
+        with self._scalar_lock:
+            if not self._scalar_closed:
+                self._scalar_closed = True
+                self._scalar_queue.put(None)
+        self._scalar_thread.join()
+        super().close()
+        if self._scalar_error is not None:
+            error, self._scalar_error = self._scalar_error, None
+            raise error
+
+    def _write_scalars_loop(self):
+        while True:
+            pending = self._scalar_queue.get()
+            try:
+                if pending is None:
+                    return
+                self._write_scalars(pending)
+            except Exception as e:
+                # a logging failure doesn't stop the training.
+                # the first error is raised by close.
+                from rlil.initializer import get_logger
+                get_logger().exception("Failed to write the scalars")
+                if self._scalar_error is None:
+                    self._scalar_error = e
+            finally:
+                self._scalar_queue.task_done()
+
+    def _write_scalars(self, pending):
+        values = to_floats([value for _, value, _, _ in pending])
+        for (value_name, _, step_value, csv_path), value \
+                in zip(pending, values):
+            super().add_scalar(value_name, value, step_value)
+            if csv_path is not None:
+                with open(csv_path, "a") as csvfile:
+                    csv.writer(csvfile).writerow([step_value, value])
 
     def add_text(self, name, text, step="train_steps"):
         name = self.env_name + "/" + name
         super().add_text(name, text, self._get_step_value(step))
 
-    def add_histogram(self, name, values, step="train_steps"):
+    def histogram_due(self, name, step="train_steps"):
         # add histogram every self._add_scalar_interval * 100
-        step_value = self._get_step_value(step)
         value_name = self.env_name + "/" + name + "/" + step
-        if step_value - self._name_frame_history[value_name] \
-                >= self._add_scalar_interval[step] * 100:
-            super().add_histogram(value_name, values, self._get_step_value(step))
+        return self._get_step_value(step) \
+            - self._name_frame_history[value_name] \
+            >= self._add_scalar_interval[step] * 100
+
+    def add_histogram(self, name, values, step="train_steps"):
+        if self.histogram_due(name, step):
+            step_value = self._get_step_value(step)
+            value_name = self.env_name + "/" + name + "/" + step
+            super().add_histogram(value_name, values, step_value)
             self._name_frame_history[value_name] = step_value
 
 
+def to_floats(values):
+    """
+    Convert a list of scalars to floats. The tensors on the same device
+    are stacked and transferred to the cpu at once.
+    """
+    values = list(values)
+    devices = defaultdict(list)
+    for i, value in enumerate(values):
+        if isinstance(value, torch.Tensor):
+            devices[value.device].append(i)
+    for indexes in devices.values():
+        stacked = torch.stack([values[i].reshape(()).to(torch.float64)
+                               for i in indexes])
+        for i, value in zip(indexes, stacked.cpu().tolist()):
+            values[i] = value
+    return values
+
+
 def get_commit_hash():
     result = subprocess.run(
         ["git", "rev-parse", "--short", "HEAD"],
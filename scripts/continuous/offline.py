@@ -6,6 +6,7 @@ from rlil.experiments import Experiment
 from rlil.presets import get_default_args
 from rlil.presets import continuous
 from rlil.initializer import get_logger, set_device, set_seed, get_writer
+from rlil.memory import TransitionDataset
 import torch
 import logging
 import ray
@@ -21,7 +22,7 @@ def main():
     parser.add_argument("agent",
                         help="Name of the agent (e.g. bc). See presets for available agents.")
     parser.add_argument("dir",
-                        help="Directory where the transitions.pkl is saved.")
+                        help="Directory where the transitions are saved.")
     parser.add_argument("--device", default="cuda",
                         help="The name of the device to run the agent on (e.g. cpu, cuda, cuda:0)")
     parser.add_argument("--seed", type=int, default=0,
@@ -53,8 +54,13 @@ def main():
     # set agent
     agent_name = args.agent
     preset = getattr(continuous, agent_name)
-    with open(os.path.join(args.dir, "transitions.pkl"), mode='rb') as f:
-        transitions = pickle.load(f)
+    transitions_path = os.path.join(args.dir, "transitions")
+    if os.path.isdir(transitions_path):
+        transitions = TransitionDataset(transitions_path)
+    else:
+        # transitions.pkl recorded by older versions
+        with open(transitions_path + ".pkl", mode='rb') as f:
+            transitions = pickle.load(f)
     agent_fn = preset(transitions)
 
     # set args_dict
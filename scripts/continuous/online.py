@@ -4,7 +4,8 @@ import pybullet_envs
 from rlil.environments import GymEnvironment, ENVS
 from rlil.experiments import Experiment
 from rlil.presets import get_default_args, continuous
-from rlil.initializer import get_logger, set_device, set_seed
+from rlil.initializer import (
+    get_logger, set_device, set_seed, enable_profiling)
 import torch
 import logging
 import ray
@@ -24,6 +25,30 @@ def main():
                         help="Minutes to train.")
     parser.add_argument("--num_workers", type=int, default=1,
                         help="Number of workers for training")
+    parser.add_argument("--num_envs", type=int, default=1,
+                        help="Number of environments per worker")
+    parser.add_argument("--async_training", action="store_true",
+                        help="Train the agent while the workers are sampling")
+    parser.add_argument("--max_train_sample_ratio", type=float,
+                        default=float("inf"),
+                        help="Maximum ratio of train steps to sample frames \
+                            in async training")
+    parser.add_argument("--replay_ratio", type=float, default=None,
+                        help="Target ratio of train steps to sample frames \
+                            counted from the frame where the agent becomes \
+                            trainable, e.g. after replay_start_size. \
+                            The training or the sampling is throttled \
+                            to keep the ratio.")
+    parser.add_argument("--num_envs_eval", type=int, default=1,
+                        help="Number of environments per evaluation worker")
+    parser.add_argument("--eval_frame_interval", type=int, default=None,
+                        help="Sample frames between evaluations")
+    parser.add_argument("--eval_busy_fraction", type=float, default=1.0,
+                        help="Maximum fraction of the time the evaluation \
+                            workers spend in sampling")
+    parser.add_argument("--profile", action="store_true",
+                        help="Log the wall time of the phases \
+                            of the training loop")
     parser.add_argument("--exp_info", default="default experiment",
                         help="One line descriptions of the experiment. \
                             Experiments' results are saved in 'runs/[exp_info]/[env_id]/'")
@@ -34,6 +59,8 @@ def main():
     ray.init(include_webui=False, ignore_reinit_error=True)
     set_device(torch.device(args.device))
     set_seed(args.seed)
+    if args.profile:
+        enable_profiling()
     logger = get_logger()
     logger.setLevel(logging.DEBUG)
 
@@ -58,6 +85,13 @@ def main():
     Experiment(
         agent_fn, env,
         num_workers=args.num_workers,
+        num_envs=args.num_envs,
+        async_training=args.async_training,
+        max_train_sample_ratio=args.max_train_sample_ratio,
+        replay_ratio=args.replay_ratio,
+        num_envs_eval=args.num_envs_eval,
+        eval_options={"frame_interval": args.eval_frame_interval,
+                      "max_busy_fraction": args.eval_busy_fraction},
         train_minutes=args.train_minutes,
         args_dict=args_dict,
         seed=args.seed,
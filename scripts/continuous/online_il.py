@@ -6,6 +6,7 @@ from rlil.experiments import Experiment
 from rlil.presets import get_default_args
 from rlil.presets import continuous
 from rlil.initializer import get_logger, set_device, set_seed, get_writer
+from rlil.memory import TransitionDataset
 import torch
 import logging
 import ray
@@ -25,7 +26,7 @@ def main():
                         help="Name of the base agent (e.g. ddpg). \
                             See presets for available agents.")
     parser.add_argument("dir",
-                        help="Directory where the transitions.pkl is saved.")
+                        help="Directory where the transitions are saved.")
     parser.add_argument("--device", default="cuda",
                         help="The name of the device to run the agent on (e.g. cpu, cuda, cuda:0)")
     parser.add_argument("--seed", type=int, default=0,
@@ -36,6 +37,14 @@ def main():
                         help="Number of training steps per episode")
     parser.add_argument("--num_workers", type=int,
                         default=1, help="Number of workers for training")
+    parser.add_argument("--num_envs", type=int, default=1,
+                        help="Number of environments per worker")
+    parser.add_argument("--async_training", action="store_true",
+                        help="Train the agent while the workers are sampling")
+    parser.add_argument("--max_train_sample_ratio", type=float,
+                        default=float("inf"),
+                        help="Maximum ratio of train steps to sample frames \
+                            in async training")
     parser.add_argument("--exp_info", default="default experiment",
                         help="One line descriptions of the experiment. \
                             Experiments' results are saved in 'runs/[exp_info]/[env_id]/'")
@@ -61,8 +70,13 @@ def main():
     base_agent_fn = base_preset()
 
     # set agent
-    with open(os.path.join(args.dir, "transitions.pkl"), mode='rb') as f:
-        transitions = pickle.load(f)
+    transitions_path = os.path.join(args.dir, "transitions")
+    if os.path.isdir(transitions_path):
+        transitions = TransitionDataset(transitions_path)
+    else:
+        # transitions.pkl recorded by older versions
+        with open(transitions_path + ".pkl", mode='rb') as f:
+            transitions = pickle.load(f)
     preset = getattr(continuous, args.agent)
     agent_fn = preset(
         transitions=transitions,
@@ -82,6 +96,9 @@ def main():
         agent_fn, env,
         agent_name=agent_name + "-" + base_agent_name,
         num_workers=args.num_workers,
+        num_envs=args.num_envs,
+        async_training=args.async_training,
+        max_train_sample_ratio=args.max_train_sample_ratio,
         train_minutes=args.train_minutes,
         trains_per_episode=args.trains_per_episode,
         args_dict=args_dict,
@@ -3,12 +3,10 @@ import pybullet
 import pybullet_envs
 import os
 import time
-import pickle
 import json
 import numpy as np
 import ray
-from rlil.memory import ExperienceReplayBuffer
-from rlil.initializer import set_replay_buffer, get_replay_buffer
+from rlil.memory import TrajectoryRecorder
 from rlil.samplers import AsyncSampler
 from rlil.environments import GymEnvironment
 from rlil.presets import continuous
@@ -16,7 +14,8 @@ from rlil.presets import continuous
 
 def main():
     parser = argparse.ArgumentParser(description="Record a trajectory of trained agent. \
-        The trajectory will be stored as transitions.pkl in the args.dir.")
+        The trajectory will be stored as a memory-mapped dataset \
+        in args.dir/transitions. The recording resumes if it exists.")
     parser.add_argument(
         "dir", help="Directory where the agent's model is saved.")
     parser.add_argument(
@@ -30,6 +29,8 @@ def main():
                         help="Number of workers for training")
     parser.add_argument("--frames", type=int, default=1e6,
                         help="Number of frames to store")
+    parser.add_argument("--shard_size", type=int, default=1e5,
+                        help="Number of frames written to the disk at once")
 
     args = parser.parse_args()
     ray.init(include_webui=False, ignore_reinit_error=True)
@@ -49,38 +50,30 @@ def main():
     lazy_agent = agent.make_lazy_agent(
         evaluation=not args.train, store_samples=True)
 
-    # reset ExperienceReplayBuffer
-    set_replay_buffer(ExperienceReplayBuffer(args.frames + 10, env))
+    # set recorder
+    filepath = os.path.join(args.dir, 'transitions')
+    recorder = TrajectoryRecorder(filepath, env, shard_size=args.shard_size)
 
     # set sampler
     sampler = AsyncSampler(env, num_workers=args.num_workers)
 
     # start recording
-    replay_buffer = get_replay_buffer()
-
-    returns = []
-    while len(replay_buffer) < args.frames:
+    while len(recorder) < args.frames:
         sampler.start_sampling(
             lazy_agent, worker_episodes=1)
 
-        sample_result = sampler.store_samples(timeout=1)
-        for sample_info in sample_result.values():
-            returns += sample_info["returns"]
+        # write the samples as they arrive
+        for _, sample_info, samples in sampler.collect_samples(timeout=1):
+            recorder.store(samples, sample_info["returns"])
+    recorder.flush()
 
     # save return info of the policy
-    returns_dict = {"mean": np.mean(returns), "std": np.std(returns)}
-    filepath = os.path.join(args.dir, 'demo_return.json')
-    with open(filepath, mode='w') as f:
-        json.dump(returns_dict, f)
-
-    # save replay buffer
-    filepath = os.path.join(args.dir, 'transitions.pkl')
-    with open(filepath, mode='wb') as f:
-        samples = replay_buffer.get_all_transitions(return_cpprb=True)
-        pickle.dump(samples, f)
+    return_path = os.path.join(args.dir, 'demo_return.json')
+    with open(return_path, mode='w') as f:
+        json.dump(recorder.return_stats(), f)
 
     print("Transitions (size: {}) is saved at {}".format(
-        len(replay_buffer), filepath))
+        len(recorder), filepath))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+import pytest
+import gym
+import numpy as np
+import torch
+import torch_testing as tt
+from rlil.agents.planners import RandomShooting, CEM, MPPI
+from rlil.environments import Action
+
+TARGETS = torch.tensor([[0.5, -0.5], [-0.2, 0.8], [0.0, 0.3]])
+
+
+@pytest.fixture
+def setUp():
+    Action.set_action_space(
+        gym.spaces.Box(low=-np.ones(2), high=np.ones(2), dtype=np.float32))
+
+
+def evaluate(sequences):
+    # the best sequence of the i-th state repeats TARGETS[i]
+    return -((sequences - TARGETS[:, None, None]) ** 2).sum(dim=(2, 3))
+
+
+def test_random_shooting(setUp):
+    planner = RandomShooting(horizon=3, num_samples=100)
+    actions = planner.plan(evaluate, 3)
+    assert actions.shape == (3, 2)
+    assert (actions.abs() <= 1).all()
+
+
+@pytest.mark.parametrize("planner_class", [CEM, MPPI])
+def test_plan(setUp, planner_class):
+    # GIVEN a planner
+    planner = planner_class(horizon=3, num_samples=200, num_iterations=10)
+
+    # WHEN the actions of 3 states are planned at once
+    actions = planner.plan(evaluate, 3)
+
+    # THEN the actions are close to the best ones
+    tt.assert_almost_equal(actions, TARGETS, decimal=1)
+
+
+def test_warm_start(setUp):
+    planner = CEM(horizon=3, num_samples=200, num_iterations=10)
+    planner.plan(evaluate, 3)
+
+    # the previous plan is shifted by a step
+    mean = planner._init_mean(3)
+    tt.assert_equal(mean[:, :-1], planner._mean[:, 1:])
+    tt.assert_equal(mean[:, -1], torch.zeros(3, 2))
+
+    # a lazy agent's planner starts from scratch
+    assert planner.to("cpu")._mean is None
+    planner.reset()
+    tt.assert_equal(planner._init_mean(3), torch.zeros(3, 3, 2))
+
+
+def test_reset_dones(setUp):
+    planner = CEM(horizon=3, num_samples=200, num_iterations=10)
+    planner.plan(evaluate, 3)
+    mean = planner._mean.clone()
+
+    # WHEN the episode of the second state ends
+    planner.reset(torch.tensor([False, True, False]))
+
+    # THEN only its plan is forgotten
+    tt.assert_equal(planner._mean[[0, 2]], mean[[0, 2]])
+    tt.assert_equal(planner._mean[1], torch.zeros(3, 2))
+
+
+def test_min_std(setUp):
+    with pytest.raises(AssertionError):
+        CEM(horizon=3, num_samples=200, num_elites=1)
+
+    # GIVEN the same elite sequences
+    planner = CEM(horizon=3, num_samples=4, num_elites=2, min_std=0.1)
+    sequences = torch.zeros(3, 4, 3, 2)
+    returns = torch.randn(3, 4)
+
+    # THEN the std doesn't collapse
+    _, std = planner._update(sequences, returns)
+    tt.assert_equal(std, torch.full((3, 3, 2), 0.1))
@@ -0,0 +1,56 @@
+import pytest
+import torch
+import torch_testing as tt
+from rlil.environments import GymEnvironment, State, Action
+from rlil.presets.continuous import rs_mpc
+from rlil.agents.planners import CEM
+
+
+@pytest.fixture
+def setUp():
+    env = GymEnvironment("Pendulum-v0", append_time=True)
+    agent = rs_mpc(ensemble_size=5, num_particles=10, horizon=3,
+                   num_samples=4)(env)
+    # the models without noise
+    agent.dynamics.model.max_log_var.fill_(-30)
+    agent.dynamics.model.min_log_var.fill_(-40)
+    states = State(torch.randn(2, env.state_space.shape[0]))
+    sequences = torch.rand(2, 4, 3, env.action_space.shape[0]) * 4 - 2
+    yield agent, states, sequences
+
+
+def test_rollout_particles(setUp):
+    agent, states, sequences = setUp
+
+    # WHEN the sequences are rolled out with particles
+    returns = agent._rollout(states, sequences)
+
+    # THEN the returns are averaged over the models of the ensemble
+    features = states.features.repeat_interleave(4, dim=0)
+    sequences = sequences.reshape(8, 3, -1)
+    expected = torch.zeros(8)
+    with torch.no_grad():
+        for k in range(5):
+            state = State(features)
+            for i in range(3):
+                actions = Action(sequences[:, i])
+                means, _ = agent.dynamics.model.dist(state, actions)
+                next_state = State(state.features + means[k])
+                expected += agent._reward_fn(state, next_state, actions) / 5
+                state = next_state
+    assert returns.shape == (2, 4)
+    tt.assert_almost_equal(returns, expected.view(2, 4), decimal=3)
+
+
+def test_reset_planner(setUp):
+    agent, states, _ = setUp
+    agent._planner = CEM(horizon=3, num_samples=4, num_elites=2)
+    agent._mpc(states)
+
+    # WHEN the episode of the first state ends
+    done_states = State(states.features, torch.tensor([False, True]))
+    agent._mpc(done_states)
+
+    # THEN the next plan of the state doesn't start from the previous one
+    tt.assert_equal(agent._planner._mean[0],
+                    agent._planner._center(1)[0])
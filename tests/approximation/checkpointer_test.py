@@ -0,0 +1,205 @@
+import pytest
+import os
+import threading
+import torch
+import torch_testing as tt
+from rlil.approximation import (QContinuous,
+                                PeriodicCheckpointer,
+                                list_checkpoints,
+                                flush_checkpoints)
+from rlil.approximation.checkpointer import get_checkpoint_service
+from rlil.environments import State, Action, GymEnvironment
+from rlil.initializer import get_writer, set_writer, set_replay_buffer
+from rlil.memory import ExperienceReplayBuffer
+from rlil.presets.continuous.models import fc_q
+from rlil.utils.writer import Writer, DummyWriter
+
+
+class LogDirWriter(Writer):
+    def __init__(self, log_dir):
+        self.log_dir = str(log_dir)
+        self.sample_frames = 0
+        self.sample_episodes = 0
+        self.train_steps = 0
+
+    def add_scalar(self, name, value, step="sample_frames",
+                   step_value=None, save_csv=False):
+        pass
+
+    def add_text(self, name, text, step="sample_frames"):
+        pass
+
+
+@pytest.fixture
+def setUp(tmp_path):
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    Action.set_action_space(env.action_space)
+    set_writer(LogDirWriter(tmp_path))
+    set_replay_buffer(ExperienceReplayBuffer(1000, env))
+    states = State(torch.randn(5, env.state_space.shape[0]))
+    actions = Action(torch.randn(5, env.action_space.shape[0]))
+    yield env, states, actions
+    set_writer(DummyWriter())
+
+
+def make_q(env, name, frequency=2, keep_checkpoints=5):
+    model = fc_q(env)
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-2)
+    checkpointer = PeriodicCheckpointer(
+        frequency, keep_checkpoints=keep_checkpoints)
+    return QContinuous(model, optimizer, checkpointer=checkpointer,
+                       name=name)
+
+
+def train(qs, states, actions, train_steps):
+    writer = get_writer()
+    for _ in range(train_steps):
+        for q in qs:
+            q.reinforce(q(states, actions).pow(2).mean())
+        writer.train_steps += 1
+
+
+def test_bundle(setUp):
+    env, states, actions = setUp
+    q1, q2 = make_q(env, "q_1"), make_q(env, "q_2")
+
+    # WHEN the approximations are trained
+    train([q1, q2], states, actions, 3)
+    flush_checkpoints()
+
+    # THEN the bundles of the due steps have the models and the optimizers
+    log_dir = get_writer().log_dir
+    paths = list_checkpoints(log_dir)
+    assert [os.path.basename(path) for path in paths] == \
+        ["checkpoint_0.pt", "checkpoint_2.pt"]
+    bundle = torch.load(paths[-1])
+    assert bundle["train_steps"] == 2
+    assert set(bundle["models"]) == {"q_1", "q_2"}
+    assert set(bundle["optimizers"]) == {"q_1", "q_2"}
+    assert bundle["metadata"]["replay_buffer"] == \
+        {"size": 0, "capacity": 1000}
+    for name, q in [("q_1", q1), ("q_2", q2)]:
+        tt.assert_equal(bundle["models"][name]["model.0.weight"],
+                        q.model.state_dict()["model.0.weight"])
+
+    # THEN the models are saved for Agent.load without temporary files
+    model = torch.load(os.path.join(log_dir, "q_1.pt"), weights_only=False)
+    tt.assert_equal(model(states, actions), q1.model(states, actions))
+    assert not any(f.endswith(".tmp") for f in os.listdir(log_dir))
+
+
+def test_consistent_bundle(setUp):
+    env, states, actions = setUp
+    q1, q2 = make_q(env, "q_1"), make_q(env, "q_2")
+    train([q1, q2], states, actions, 2)
+
+    # GIVEN q_2 not updated in the due step, e.g. the delayed policy
+    train([q1], states, actions, 1)
+    expected = q2.model.state_dict()["model.0.weight"].clone()
+
+    # WHEN q_2 is updated in the next step
+    train([q2, q1], states, actions, 1)
+    flush_checkpoints()
+
+    # THEN the bundle has q_2 of the due step
+    bundle = torch.load(list_checkpoints(get_writer().log_dir)[-1])
+    assert bundle["train_steps"] == 2
+    tt.assert_equal(bundle["models"]["q_2"]["model.0.weight"], expected)
+
+
+def test_keep_checkpoints(setUp):
+    env, states, actions = setUp
+    q = make_q(env, "q", frequency=1, keep_checkpoints=2)
+
+    # WHEN the approximation is trained
+    train([q], states, actions, 5)
+    flush_checkpoints()
+
+    # THEN the latest bundles are kept
+    paths = list_checkpoints(get_writer().log_dir)
+    assert [os.path.basename(path) for path in paths] == \
+        ["checkpoint_3.pt", "checkpoint_4.pt"]
+
+
+def test_snapshot(setUp):
+    env, states, actions = setUp
+    q = make_q(env, "q")
+
+    # GIVEN a snapshot of the model
+    model, optimizer = q._checkpointer.snapshot()
+    expected = q.model.state_dict()["model.0.weight"].clone()
+
+    # WHEN the model is updated
+    train([q], states, actions, 1)
+
+    # THEN the snapshot is not changed
+    tt.assert_equal(model["model.0.weight"], expected)
+    assert "state" in optimizer
+
+
+def test_writers(setUp, tmp_path):
+    env, states, actions = setUp
+    q1 = make_q(env, "q")
+    train([q1], states, actions, 1)
+
+    # GIVEN an approximation of another writer with the same name
+    set_writer(LogDirWriter(tmp_path / "other"))
+    q2 = make_q(env, "q")
+
+    # WHEN the approximation is trained
+    train([q2], states, actions, 3)
+    flush_checkpoints()
+
+    # THEN the bundles of each writer have its own model
+    paths = list_checkpoints(str(tmp_path))
+    assert [os.path.basename(path) for path in paths] == ["checkpoint_0.pt"]
+    bundle = torch.load(paths[-1])
+    tt.assert_equal(bundle["models"]["q"]["model.0.weight"],
+                    q1.model.state_dict()["model.0.weight"])
+    paths = list_checkpoints(str(tmp_path / "other"))
+    assert [os.path.basename(path) for path in paths] == \
+        ["checkpoint_0.pt", "checkpoint_2.pt"]
+
+
+def test_dummy_writer(setUp, tmp_path):
+    env, states, actions = setUp
+    writer = DummyWriter()
+    writer.log_dir = str(tmp_path)
+    set_writer(writer)
+    q = make_q(env, "q")
+
+    # WHEN the approximation is trained with DummyWriter
+    train([q], states, actions, 3)
+    flush_checkpoints()
+
+    # THEN nothing is saved
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_max_pending_bundles(setUp):
+    env, states, actions = setUp
+    q = make_q(env, "q", frequency=1)
+
+    # GIVEN a disk which doesn't finish the writes
+    service = get_checkpoint_service(get_writer())
+    write = service._write
+    written = threading.Event()
+
+    def slow_write(*args):
+        written.wait()
+        write(*args)
+    service._write = slow_write
+
+    # WHEN the approximation is trained
+    thread = threading.Thread(
+        target=train, args=([q], states, actions, 5), daemon=True)
+    thread.start()
+    thread.join(timeout=1)
+
+    # THEN the training waits for the pending bundle
+    assert thread.is_alive()
+    assert service._queue.qsize() == 1
+    written.set()
+    thread.join()
+    flush_checkpoints()
+    assert len(list_checkpoints(get_writer().log_dir)) == 5
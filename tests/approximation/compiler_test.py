@@ -0,0 +1,58 @@
+import pytest
+import copy
+import torch
+import torch_testing as tt
+from rlil.approximation import QContinuous, PolyakTarget
+from rlil.environments import State, Action, GymEnvironment
+from rlil.presets.continuous.models import fc_q
+
+# aot_eager traces the graphs without generating kernels
+COMPILE_OPTIONS = {"backend": "aot_eager"}
+
+
+@pytest.fixture
+def setUp():
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    Action.set_action_space(env.action_space)
+    model = fc_q(env)
+    states = State(torch.randn(5, env.state_space.shape[0]))
+    actions = Action(torch.randn(5, env.action_space.shape[0]))
+    yield env, model, states, actions
+
+
+def make_q(model, compile_options=None):
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-2)
+    return QContinuous(model, optimizer, target=PolyakTarget(0.1),
+                       compile_options=compile_options)
+
+
+def test_compiled_step(setUp):
+    _, model, states, actions = setUp
+
+    # GIVEN an approximation and its compiled copy
+    q = make_q(model)
+    compiled_q = make_q(copy.deepcopy(model), COMPILE_OPTIONS)
+
+    # WHEN they are updated with the same loss
+    for _ in range(3):
+        q.reinforce(q(states, actions).pow(2).mean())
+        compiled_q.reinforce(compiled_q(states, actions).pow(2).mean())
+
+    # THEN the outputs are the same
+    tt.assert_almost_equal(compiled_q.no_grad(states, actions),
+                           q.no_grad(states, actions), decimal=3)
+    tt.assert_almost_equal(compiled_q.target(states, actions),
+                           q.target(states, actions), decimal=3)
+
+
+def test_replaced_model(setUp):
+    env, model, states, actions = setUp
+    q = make_q(model, COMPILE_OPTIONS)
+    q(states, actions)
+
+    # GIVEN the model replaced, e.g. by Agent.load
+    q.model = make_q(fc_q(env)).model
+
+    # THEN the new model is compiled and used
+    tt.assert_equal(q.no_grad(states, actions),
+                    q.model(states, actions).detach())
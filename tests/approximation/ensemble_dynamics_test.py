@@ -0,0 +1,76 @@
+import pytest
+import torch
+import torch_testing as tt
+from rlil.approximation import EnsembleDynamics
+from rlil.environments import State, Action, GymEnvironment
+from rlil.presets.continuous.models import fc_ensemble_dynamics
+
+
+@pytest.fixture
+def setUp():
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    Action.set_action_space(env.action_space)
+    model = fc_ensemble_dynamics(env, num_models=5)
+    dynamics = EnsembleDynamics(model, torch.optim.Adam(model.parameters()))
+    states = State(torch.randn(10, env.state_space.shape[0]))
+    actions = Action(torch.randn(10, env.action_space.shape[0]).clamp(-1, 1))
+    yield env, dynamics, states, actions
+
+
+def test_dist(setUp):
+    env, dynamics, states, actions = setUp
+    means, log_vars = dynamics.model.dist(states, actions)
+    assert means.shape == (5, 10, env.state_space.shape[0])
+    assert log_vars.shape == (5, 10, env.state_space.shape[0])
+    assert (log_vars <= 0.5).all() and (log_vars >= -10).all()
+
+
+@pytest.mark.parametrize("batch_size", [10, 7])
+def test_trajectory_sampling(setUp, batch_size):
+    _, dynamics, states, actions = setUp
+    states, actions = states[:batch_size], actions[:batch_size]
+
+    # GIVEN the models without noise
+    dynamics.model.max_log_var.fill_(-30)
+    dynamics.model.min_log_var.fill_(-40)
+    means, _ = dynamics.model.dist(states, actions)
+
+    # WHEN the next states are sampled
+    next_states = dynamics.no_grad(states, actions)
+
+    # THEN the i-th state is propagated by the (i % 5)-th model
+    indexes = torch.arange(batch_size)
+    expected = states.features + means[indexes % 5, indexes]
+    tt.assert_almost_equal(next_states.features, expected.detach(),
+                           decimal=3)
+
+
+@pytest.mark.parametrize("bootstrap", [False, True])
+def test_bootstrap(setUp, bootstrap):
+    env, _, states, actions = setUp
+
+    # GIVEN the models with the same weights
+    model = fc_ensemble_dynamics(env, num_models=5)
+    with torch.no_grad():
+        for param in model.parameters():
+            param.copy_(param[0].expand_as(param))
+    dynamics = EnsembleDynamics(model, torch.optim.Adam(model.parameters()),
+                                bootstrap=bootstrap)
+
+    # WHEN they are trained on a minibatch
+    next_states = State(torch.randn(10, env.state_space.shape[0]))
+    dynamics.loss(states, actions, next_states).backward()
+
+    # THEN the models have different gradients only with bootstrap
+    grad = model[0].weight.grad
+    assert torch.allclose(grad, grad[0].expand_as(grad)) != bootstrap
+
+
+def test_reinforce(setUp):
+    _, dynamics, states, actions = setUp
+    next_states = State(states.features + 0.1)
+    loss = dynamics.loss(states, actions, next_states)
+    for _ in range(10):
+        new_loss = dynamics.loss(states, actions, next_states)
+        dynamics.reinforce(new_loss)
+    assert new_loss < loss
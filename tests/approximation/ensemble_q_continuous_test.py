@@ -5,7 +5,7 @@ from torch.nn.functional import mse_loss
 from rlil import nn
 from rlil.approximation.ensemble_q_continuous import EnsembleQContinuous
 from rlil.environments import State, Action, GymEnvironment
-from rlil.presets.continuous.models import fc_q
+from rlil.presets.continuous.models import fc_q, fc_ensemble_q
 import numpy as np
 
 
@@ -50,3 +50,37 @@ def test_reinforce(setUp):
     for param, new_param in zip(qs_params, new_qs_params):
         with pytest.raises(AssertionError):
             tt.assert_almost_equal(param, new_param)
+
+
+def test_stacked(setUp):
+    qs, states, actions = setUp
+
+    # GIVEN an ensemble of nn.ModuleList
+    # WHEN the models are stacked
+    stacked_model = qs.model.stacked()
+    assert isinstance(stacked_model.model[0], nn.EnsembleLinear)
+
+    # THEN the stacked model returns the same q values
+    tt.assert_almost_equal(stacked_model(states, actions),
+                           qs.model(states, actions), decimal=5)
+    tt.assert_almost_equal(stacked_model.q1(states, actions),
+                           qs.q1(states, actions), decimal=5)
+
+
+def test_fc_ensemble_q():
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    q_models = fc_ensemble_q(env, num_qs=4)
+    qs = EnsembleQContinuous(q_models, torch.optim.Adam(q_models.parameters()))
+    states = State(torch.randn(5, env.state_space.shape[0]),
+                   torch.tensor([1, 1, 0, 1, 1]).bool())
+    actions = Action(torch.randn(5, env.action_space.shape[0]))
+
+    q_values = qs(states, actions)
+    assert q_values.shape == (5, 4)
+    tt.assert_equal(q_values[2], torch.zeros(4))
+    assert qs.q1(states, actions).shape == (5, )
+
+    params = [param.data.clone() for param in qs.model.parameters()]
+    qs.reinforce(q_values.sum())
+    for param, new_param in zip(params, qs.model.parameters()):
+        assert not torch.allclose(param, new_param)
@@ -0,0 +1,88 @@
+import pytest
+import torch
+import torch_testing as tt
+from torch import nn
+from rlil.approximation import Approximation, PolyakTarget, PolyakUpdates
+
+RATE = 0.1
+
+
+@pytest.fixture
+def setUp():
+    torch.manual_seed(0)
+    updates = PolyakUpdates()
+    approximations = [make_approximation(updates) for _ in range(2)]
+    yield approximations, torch.randn(5, 3)
+
+
+def make_approximation(updates=None):
+    model = nn.Sequential(nn.Linear(3, 4), nn.ReLU(), nn.Linear(4, 1))
+    return Approximation(
+        model, torch.optim.SGD(model.parameters(), lr=0.1),
+        target=PolyakTarget(RATE, updates=updates))
+
+
+def polyak(target_params, model):
+    # the update before the foreach implementation
+    return [target_param * (1.0 - RATE) + source_param.detach() * RATE
+            for target_param, source_param
+            in zip(target_params, model.parameters())]
+
+
+def target_params(approximation):
+    return [param.clone()
+            for param in approximation._target._target.parameters()]
+
+
+def test_update(setUp):
+    approximations, inputs = setUp
+    expected = [target_params(approx) for approx in approximations]
+
+    for _ in range(3):
+        # WHEN the approximations are updated in a step
+        for i, approx in enumerate(approximations):
+            approx.reinforce(approx(inputs).mean())
+            expected[i] = polyak(expected[i], approx.model)
+        # THEN the targets are the polyak averages
+        for approx, params in zip(approximations, expected):
+            for param, expected_param in zip(target_params(approx), params):
+                tt.assert_almost_equal(param, expected_param)
+
+
+def test_deferred_update(setUp):
+    approximations, inputs = setUp
+    approx = approximations[0]
+    expected = target_params(approx)
+
+    # GIVEN an update pending
+    approx.reinforce(approx(inputs).mean())
+    expected = polyak(expected, approx.model)
+
+    # WHEN the source is updated twice without using the target
+    approx.reinforce(approx(inputs).mean())
+    expected = polyak(expected, approx.model)
+    approx.reinforce(approx(inputs).mean())
+    expected = polyak(expected, approx.model)
+
+    # THEN the update is applied before the source changes
+    for param, expected_param in zip(target_params(approx), expected):
+        tt.assert_almost_equal(param, expected_param)
+    tt.assert_almost_equal(approx.target(inputs),
+                           approx._target._target_model(inputs).detach())
+
+
+def test_agents(setUp):
+    approximations, inputs = setUp
+
+    # GIVEN a target of another agent
+    other = make_approximation()
+    other.reinforce(other(inputs).mean())
+
+    # WHEN the targets of the agent are used
+    approx = approximations[0]
+    approx.reinforce(approx(inputs).mean())
+    approx.target(inputs)
+
+    # THEN the update of the other agent is still pending
+    assert other._target._updates.is_pending(other._target)
+    assert not approx._target._updates.is_pending(approx._target)
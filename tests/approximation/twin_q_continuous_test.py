@@ -0,0 +1,117 @@
+import pytest
+import torch
+import torch_testing as tt
+from rlil import nn
+from rlil.approximation import TwinQContinuous
+from rlil.approximation.q_continuous import QContinuousModule
+from rlil.approximation.twin_q_continuous import TwinQContinuousModule
+from rlil.environments import State, Action, GymEnvironment
+from rlil.presets.continuous.models import fc_q, fc_ensemble_q
+
+
+@pytest.fixture
+def setUp():
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    q_model = fc_ensemble_q(env, num_qs=2)
+    qs = TwinQContinuous(q_model, torch.optim.Adam(q_model.parameters()))
+    states = State(torch.randn(5, env.state_space.shape[0]),
+                   torch.tensor([1, 1, 0, 1, 1]).bool())
+    actions = Action(torch.randn(5, env.action_space.shape[0]))
+    yield env, qs, states, actions
+
+
+def test_forward(setUp):
+    _, qs, states, actions = setUp
+    q_1_values, q_2_values = qs(states, actions)
+    assert q_1_values.shape == (5, )
+    assert q_2_values.shape == (5, )
+    assert q_1_values[2] == 0 and q_2_values[2] == 0
+    assert not torch.allclose(q_1_values, q_2_values)
+    tt.assert_almost_equal(qs.q1(states, actions), q_1_values, decimal=5)
+
+
+def test_q1(setUp):
+    _, qs, states, _ = setUp
+    actions = Action(torch.randn(15, 2))
+
+    # WHEN q_1 is computed without q_2
+    # THEN the values are the same as those of the twin forward pass
+    tt.assert_almost_equal(qs.q1(states, actions),
+                           qs(states, actions)[0], decimal=5)
+    assert qs.q1(states, actions).shape == (15, )
+
+
+def test_head(setUp):
+    _, qs, states, actions = setUp
+
+    # GIVEN twin q functions
+    # WHEN a head is copied
+    q_2 = qs.model.head(1)
+
+    # THEN it returns the same q values as a QContinuousModule
+    assert isinstance(q_2, QContinuousModule)
+    tt.assert_almost_equal(q_2(states, actions),
+                           qs(states, actions)[1], decimal=5)
+
+
+def test_head_state_dict(setUp):
+    _, qs, _, _ = setUp
+
+    # GIVEN twin q functions
+    # WHEN the state_dict of a head is returned
+    state_dict = qs.model.head_state_dict(1)
+
+    # THEN it is the state_dict of the copied head
+    # and shares the memory with the twin
+    expected = qs.model.head(1).state_dict()
+    assert state_dict.keys() == expected.keys()
+    for key, value in expected.items():
+        tt.assert_equal(state_dict[key], value)
+    params = [p.data_ptr() for p in qs.model.parameters()]
+    storages = [v.untyped_storage().data_ptr() for v in state_dict.values()]
+    assert set(storages) <= set(params)
+
+
+def test_from_heads(setUp):
+    env, _, states, actions = setUp
+
+    # GIVEN q_1 and q_2 saved separately
+    q_1 = QContinuousModule(fc_q(env))
+    q_2 = QContinuousModule(fc_q(env))
+
+    # WHEN they are stacked
+    qs = TwinQContinuousModule.from_heads(q_1, q_2)
+
+    # THEN the twin returns the same q values
+    q_1_values, q_2_values = qs(states, actions)
+    tt.assert_almost_equal(q_1_values, q_1(states, actions), decimal=5)
+    tt.assert_almost_equal(q_2_values, q_2(states, actions), decimal=5)
+
+
+def test_reinforce(setUp):
+    _, qs, states, actions = setUp
+    targets = torch.randn(5)
+
+    # one step updates both q functions
+    params = [param.data.clone() for param in qs.model.parameters()]
+    q_1_values, q_2_values = qs(states, actions)
+    qs.reinforce(((q_1_values - targets) ** 2).mean() +
+                 ((q_2_values - targets) ** 2).mean())
+    for param, new_param in zip(params, qs.model.parameters()):
+        assert not torch.allclose(param[0], new_param[0])
+        assert not torch.allclose(param[1], new_param[1])
+
+
+def test_repeated_states(setUp):
+    _, qs, states, _ = setUp
+    actions = Action(torch.randn(15, 2))
+
+    # GIVEN 3 actions for each state
+    repeated_states = State(
+        torch.repeat_interleave(states.features, 3, 0),
+        torch.repeat_interleave(states.mask, 3, 0))
+
+    # THEN the states don't have to be repeated
+    for expected, q_values in zip(qs(repeated_states, actions),
+                                  qs(states, actions)):
+        tt.assert_almost_equal(q_values, expected, decimal=5)
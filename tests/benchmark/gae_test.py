@@ -0,0 +1,20 @@
+import torch
+from rlil.environments import GymEnvironment
+from rlil.memory import ExperienceReplayBuffer, GaeWrapper
+
+
+def test_compute_gae(benchmark, use_cpu):
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    gae_buffer = GaeWrapper(ExperienceReplayBuffer(1, env),
+                            discount_factor=0.99, lam=0.95)
+
+    # a rollout of 100k transitions with episodes of 1000 steps
+    rewards = torch.randn(100000)
+    values = torch.randn(100000)
+    next_values = torch.randn(100000)
+    masks = torch.ones(100000, dtype=torch.bool)
+    masks[999::1000] = False
+
+    benchmark.pedantic(gae_buffer.compute_gae,
+                       args=(rewards, values, next_values, masks),
+                       rounds=20)
@@ -0,0 +1,16 @@
+import pytest
+import torch
+from rlil import nn
+
+
+@pytest.mark.parametrize("mmd", [nn.mmd_laplacian, nn.mmd_gaussian])
+@pytest.mark.parametrize("num_samples", [10, 100])
+def test_mmd(benchmark, mmd, num_samples):
+    # the minibatch of BEAR with num_samples_match samples
+    samples1 = torch.randn(100, num_samples, 6, requires_grad=True)
+    samples2 = torch.randn(100, num_samples, 6)
+
+    def mmd_step():
+        mmd(samples1, samples2).mean().backward()
+
+    benchmark.pedantic(mmd_step, rounds=20)
@@ -0,0 +1,16 @@
+import pytest
+import torch
+from rlil.environments import GymEnvironment, State
+from rlil.presets.continuous import rs_mpc
+
+
+@pytest.mark.parametrize("ensemble_size, num_particles",
+                         [(None, None), (5, 5), (5, 20)])
+def test_rs_mpc_planning(benchmark, ensemble_size, num_particles):
+    env = GymEnvironment("Pendulum-v0", append_time=True)
+    agent = rs_mpc(ensemble_size=ensemble_size,
+                   num_particles=num_particles)(env)
+
+    # the actions of 8 envs are planned at once
+    states = State(torch.randn(8, env.state_space.shape[0]))
+    benchmark.pedantic(agent._mpc, args=(states, ), rounds=5)
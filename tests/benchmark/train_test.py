@@ -2,7 +2,7 @@ import pytest
 import torch
 import numpy as np
 from rlil.environments import GymEnvironment, State
-from rlil.presets.continuous import ddpg, sac, td3, bc
+from rlil.presets.continuous import ddpg, sac, td3, bc, bear
 from ..presets.offline_continuous_test import get_transitions
 
 
@@ -47,3 +47,12 @@ def test_bc(benchmark):
     agent = agent_fn(env)
     assert len(transitions["obs"]) > 100
     benchmark.pedantic(agent.train, rounds=100)
+
+
+@pytest.mark.parametrize("num_qs", [2, 10])
+def test_bear(benchmark, num_qs):
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    transitions = get_transitions(env)
+    agent_fn = bear(transitions, num_qs=num_qs)
+    agent = agent_fn(env)
+    benchmark.pedantic(agent.train, rounds=100)
@@ -0,0 +1,21 @@
+import torch
+from shutil import rmtree
+from rlil.utils.writer import ExperimentWriter
+
+
+def test_add_scalar(benchmark, use_cpu):
+    writer = ExperimentWriter(agent_name="test_agent",
+                              env_name="test_env",
+                              exp_info="test_benchmark",
+                              train_step_interval=1)
+    losses = [torch.randn(256).mean() for _ in range(10)]
+
+    # the scalars of a training step are written every step
+    def train_step():
+        writer.train_steps += 1
+        for i, loss in enumerate(losses):
+            writer.add_scalar("loss/" + str(i), loss)
+
+    benchmark.pedantic(train_step, rounds=1000)
+    writer.close()
+    rmtree("runs/test_benchmark", ignore_errors=True)
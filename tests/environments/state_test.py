@@ -77,6 +77,29 @@ def test_from_numpy():
     assert state.info == ['a']
 
 
+def test_from_numpy_without_copy():
+    gym_obs = np.random.randn(3, 5).astype(np.float32)
+    done = np.array([[0.], [1.], [0.]], dtype=np.float32)
+    state = State.from_numpy(gym_obs, done)
+
+    # GIVEN float32 arrays
+    # WHEN State.from_numpy is called
+    # THEN the raw shares the memory with the array
+    gym_obs[0, 0] = 10.
+    assert state.raw[0, 0] == 10.
+    tt.assert_equal(state.mask, torch.tensor([True, False, True]))
+
+
+def test_cached_mask():
+    # GIVEN states of the same size without masks
+    # WHEN the states are created
+    # THEN the masks of ones are shared
+    state_1 = State(torch.randn(3, 4))
+    state_2 = State(torch.randn(3, 4))
+    assert state_1.mask is state_2.mask
+    tt.assert_equal(state_1.mask, torch.ones(3, dtype=torch.bool))
+
+
 def test_raw_numpy():
     np_raws = np.random.randn(3, 4)
     np_masks = np.ones(3)
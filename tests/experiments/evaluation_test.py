@@ -0,0 +1,92 @@
+import pytest
+from rlil.experiments import EvaluationScheduler
+from rlil.samplers import StartInfo
+
+
+class MockSampler:
+    def __init__(self, num_workers=2):
+        self.num_workers = num_workers
+        self.sample_seconds = 0.0
+        self.updates = 0
+        self.started = []
+        self.finished = []
+
+    def update_agent(self, agent, evaluation=False, store_samples=True):
+        assert evaluation and not store_samples
+        self.updates += 1
+
+    def start_sampling(self, start_info=StartInfo(), worker_episodes=None):
+        self.started.append(start_info)
+
+    def collect_samples(self, timeout=None):
+        assert timeout == 0
+        finished, self.finished = self.finished, []
+        return finished
+
+    def finish(self, returns):
+        sample_info = {"frames": [1] * len(returns), "returns": returns}
+        self.finished.append((self.started[-1], sample_info, None))
+
+
+def test_evaluate():
+    sampler = MockSampler()
+    scheduler = EvaluationScheduler(sampler, frame_interval=100)
+
+    # GIVEN the first evaluation
+    assert scheduler.evaluate(None, StartInfo(0, 0, 0)) == []
+    assert sampler.updates == 1
+
+    # WHEN the workers are running
+    # THEN the agent is not copied
+    sampler.finish([1.0])
+    assert scheduler.evaluate(None, StartInfo(200, 2, 10)) == []
+    assert sampler.updates == 1
+
+    # WHEN all the workers finish
+    # THEN the results are merged and cached
+    sampler.finish([3.0])
+    (start_info, sample_info), = \
+        scheduler.evaluate(None, StartInfo(50, 2, 10))
+    assert start_info == StartInfo(0, 0, 0)
+    assert sample_info["returns"] == [1.0, 3.0]
+    assert scheduler.results[0] is sample_info
+    # frame_interval has not passed
+    assert sampler.updates == 1
+
+    assert scheduler.evaluate(None, StartInfo(100, 3, 20)) == []
+    assert sampler.updates == 2
+
+
+def test_policy_version():
+    sampler = MockSampler(num_workers=1)
+    scheduler = EvaluationScheduler(sampler)
+    scheduler.evaluate(None, StartInfo(0, 0, 0))
+    sampler.finish([1.0])
+    scheduler.evaluate(None, StartInfo(100, 1, 0))
+
+    # GIVEN the evaluated policy
+    # THEN it is not evaluated again
+    assert sampler.updates == 1
+    scheduler.evaluate(None, StartInfo(200, 2, 1))
+    assert sampler.updates == 2
+
+
+def test_max_busy_fraction(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("rlil.experiments.evaluation.time.time",
+                        lambda: now[0])
+    sampler = MockSampler(num_workers=1)
+    scheduler = EvaluationScheduler(sampler, max_busy_fraction=0.1)
+    scheduler.evaluate(None, StartInfo(0, 0, 0))
+
+    # GIVEN the workers sampled for 5 of 10 seconds
+    now[0] = 10.0
+    sampler.sample_seconds = 5.0
+    sampler.finish([1.0])
+    scheduler.evaluate(None, StartInfo(100, 1, 1))
+
+    # THEN the next evaluation waits until the fraction is below 0.1
+    assert sampler.updates == 1
+    now[0] = 50.0
+    scheduler.evaluate(None, StartInfo(100, 1, 1))
+    assert sampler.updates == 2
@@ -0,0 +1,34 @@
+import pytest
+from rlil.experiments import ThroughputMeter
+
+
+def test_throughput(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("rlil.experiments.throughput.time.time",
+                        lambda: now[0])
+    meter = ThroughputMeter(min_interval=1.0)
+
+    # the first call starts the measurement
+    assert meter.update(0, 0, sample_seconds=0.0, num_workers=2) is None
+
+    # GIVEN 2 workers sampling 1000 frames in 2 of 4 worker-seconds
+    now[0] += 2.0
+    metrics = meter.update(1000, 500, sample_seconds=2.0, num_workers=2,
+                           buffer_size=1000, buffer_capacity=4000)
+
+    # THEN the rates are measured per second
+    assert metrics["sample_frames_per_sec"] == pytest.approx(500)
+    assert metrics["train_steps_per_sec"] == pytest.approx(250)
+    assert metrics["replay_ratio"] == pytest.approx(0.5)
+    assert metrics["worker_idle"] == pytest.approx(0.5)
+    assert metrics["buffer_fill"] == pytest.approx(0.25)
+
+    # WHEN min_interval has not passed
+    # THEN nothing is measured
+    now[0] += 0.5
+    assert meter.update(2000, 600) is None
+    now[0] += 0.5
+    metrics = meter.update(2000, 600)
+    assert metrics["sample_frames_per_sec"] == pytest.approx(1000)
+    assert "worker_idle" not in metrics
+    assert "buffer_fill" not in metrics
@@ -10,7 +10,10 @@ from rlil import nn
 from rlil.experiments import Trainer
 from rlil.samplers import AsyncSampler
 from rlil.memory import ExperienceReplayBuffer
-from rlil.initializer import set_replay_buffer
+from rlil.initializer import (set_replay_buffer, set_writer,
+                              enable_profiling, disable_profiling,
+                              get_profiler)
+from rlil.utils.writer import DummyWriter
 from rlil.presets.continuous import sac
 from ..mock_agent import MockAgent
 
@@ -58,3 +61,96 @@ def test_training(setUp):
 
     trainer = Trainer(agent, sampler, max_sample_episodes=5)
     trainer.start_training()
+
+
+def test_async_training(setUp):
+    env, agent, _ = setUp
+    # reset the counts of the other tests
+    set_writer(DummyWriter())
+    agent_fn = sac(replay_start_size=50)
+    agent = agent_fn(env)
+    # the sampler stores samples in the replay_buffer of the agent
+    sampler = AsyncSampler(env, num_workers=3)
+
+    max_train_sample_ratio = 0.5
+    trainer = Trainer(agent, sampler,
+                      max_sample_frames=300,
+                      async_training=True,
+                      max_train_sample_ratio=max_train_sample_ratio)
+    trainer.start_training()
+
+    # GIVEN the async training with max_train_sample_ratio
+    # WHEN the training finishes
+    # THEN the agent trains up to the ratio of the sample frames
+    writer = trainer._writer
+    assert writer.sample_frames > 300
+    assert 0 < writer.train_steps <= \
+        max_train_sample_ratio * writer.sample_frames + 1
+
+
+def test_replay_ratio(setUp):
+    env, agent, _ = setUp
+    set_writer(DummyWriter())
+    agent = sac(replay_start_size=50)(env)
+    sampler = AsyncSampler(env, num_workers=3)
+
+    # GIVEN the target replay_ratio
+    replay_ratio = 0.5
+    trainer = Trainer(agent, sampler, max_sample_episodes=5,
+                      replay_ratio=replay_ratio)
+    trainer.start_training()
+
+    # THEN the agent trains up to the ratio after every iteration,
+    # counted from the frame where the agent became trainable
+    writer = trainer._writer
+    start_frames, start_steps = trainer._replay_start
+    assert start_frames > 50 and start_steps == 0
+    assert 0 < writer.train_steps == \
+        int(replay_ratio * (writer.sample_frames - start_frames))
+
+
+def test_async_replay_ratio(setUp):
+    env, agent, _ = setUp
+    set_writer(DummyWriter())
+    agent = sac(replay_start_size=50)(env)
+    sampler = AsyncSampler(env, num_workers=3)
+
+    replay_ratio = 0.5
+    trainer = Trainer(agent, sampler,
+                      max_sample_frames=300,
+                      async_training=True,
+                      replay_ratio=replay_ratio)
+    trainer.start_training()
+
+    # the workers wait for the agent, and the agent waits for the samples
+    writer = trainer._writer
+    start_frames, _ = trainer._replay_start
+    assert 0 < writer.train_steps <= \
+        replay_ratio * (writer.sample_frames - start_frames) + 1
+
+
+def test_profiling(setUp):
+    env, agent, _ = setUp
+    set_writer(DummyWriter())
+    enable_profiling()
+    profiler = get_profiler()
+    profiler.reset()
+    try:
+        agent = sac(replay_start_size=50)(env)
+        # the workers are made after enable_profiling
+        sampler = AsyncSampler(env, num_workers=1)
+        trainer = Trainer(agent, sampler, max_sample_episodes=3)
+        trainer.start_training()
+        summary = profiler.summary()
+    finally:
+        disable_profiling()
+        profiler.reset()
+
+    # GIVEN the profiling enabled
+    # THEN the phases of the learner and the workers are measured
+    for phase in ["trainer/train", "train/critic", "train/actor",
+                  "reinforce/q", "replay_buffer/store",
+                  "replay_buffer/sample_batches", "sampler/ray_get",
+                  "sampler/make_lazy_agent", "worker/env_step",
+                  "worker/act"]:
+        assert phase in summary
@@ -0,0 +1,89 @@
+import pytest
+import numpy as np
+import torch
+import torch_testing as tt
+from rlil.environments import State, Action, GymEnvironment
+from rlil.utils import Samples
+from rlil.memory import ExperienceReplayBuffer, TransitionDataset
+
+
+@pytest.fixture
+def transitions():
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    replay_buffer = ExperienceReplayBuffer(10000, env)
+
+    states = State(torch.randn(21, env.state_space.shape[0]))
+    actions = Action(torch.randn(20, env.action_space.shape[0]))
+    rewards = torch.arange(0, 20, dtype=torch.float)
+    replay_buffer.store(Samples(states[:-1], actions, rewards, states[1:]))
+    return env, replay_buffer.get_all_transitions(return_cpprb=True)
+
+
+def test_create(tmpdir, transitions):
+    _, npsamples = transitions
+
+    # GIVEN transitions saved as a dataset
+    TransitionDataset.create(str(tmpdir), npsamples)
+
+    # WHEN the dataset is loaded
+    dataset = TransitionDataset(str(tmpdir))
+
+    # THEN the transitions are memory-mapped and unchanged
+    assert len(dataset) == 20
+    assert isinstance(dataset._chunks[0]["obs"], np.memmap)
+    for key, value in dataset.get_all_transitions().items():
+        np.testing.assert_equal(value, npsamples[key])
+
+
+def test_append(tmpdir, transitions):
+    _, npsamples = transitions
+    dataset = TransitionDataset.create(str(tmpdir), npsamples)
+
+    # GIVEN a dataset
+    # WHEN a chunk is appended
+    dataset.append({key: value[:5] for key, value in npsamples.items()},
+                   info={"returns": [1.0]})
+
+    # THEN the transitions are gathered across the chunks
+    dataset = TransitionDataset(str(tmpdir))
+    assert len(dataset) == 25
+    assert dataset.chunks_info == [None, {"returns": [1.0]}]
+    npsamples = dataset.get([3, 19, 20, 24])
+    np.testing.assert_equal(npsamples["rew"].reshape(-1), [3, 19, 0, 4])
+
+
+def test_replay_buffer(tmpdir, transitions):
+    env, npsamples = transitions
+    dataset = TransitionDataset.create(str(tmpdir), npsamples)
+
+    # GIVEN a replay buffer backed by the dataset
+    replay_buffer = ExperienceReplayBuffer(
+        len(dataset), env, dataset=str(tmpdir))
+    assert len(replay_buffer) == 20
+
+    # WHEN it is sampled
+    states, actions, rewards, next_states, weights, _ = \
+        replay_buffer.sample(10)
+
+    # THEN the samples are those of the dataset
+    assert states.shape == (10, 9)
+    assert actions.shape == (10, 2)
+    assert ((rewards >= 0) & (rewards < 20)).all()
+    tt.assert_equal(weights, torch.ones(10, device=replay_buffer.device))
+
+    # and the dataset is read-only
+    with pytest.raises(RuntimeError):
+        replay_buffer.clear()
+
+
+def test_from_transitions(tmpdir, transitions):
+    env, npsamples = transitions
+    dataset = TransitionDataset.create(str(tmpdir), npsamples)
+
+    # GIVEN the transitions as a dataset or as nparrays
+    # WHEN replay_buffers are made from them
+    # THEN the dataset is not loaded, and the nparrays are stored
+    replay_buffer = ExperienceReplayBuffer.from_transitions(dataset, env)
+    assert replay_buffer._buffer is dataset
+    replay_buffer = ExperienceReplayBuffer.from_transitions(npsamples, env)
+    assert len(replay_buffer) == 20
@@ -8,6 +8,7 @@ import torch_testing as tt
 from rlil.approximation import VNetwork, FeatureNetwork
 from rlil.environments import State, Action, GymEnvironment
 from rlil.memory import ExperienceReplayBuffer, GaeWrapper
+from rlil.memory.gae_wrapper import reverse_scan
 from rlil.presets.continuous.models import fc_actor_critic
 from rlil.utils import Samples
 
@@ -60,3 +61,17 @@ def test_advantage(setUp):
     tt.assert_almost_equal(
         advantages,
         (expected - expected.mean()) / expected.std(), decimal=3)
+
+
+def test_reverse_scan():
+    values = torch.randn(1000)
+    discounts = 0.95 * (torch.rand(1000) > 0.01).float()
+
+    expected = torch.zeros(1000)
+    y = 0.0
+    for i in reversed(range(1000)):
+        y = values[i] + discounts[i] * y
+        expected[i] = y
+
+    tt.assert_almost_equal(reverse_scan(values, discounts), expected,
+                           decimal=4)
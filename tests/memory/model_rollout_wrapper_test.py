@@ -0,0 +1,115 @@
+import pytest
+import torch
+import torch_testing as tt
+from rlil.approximation import EnsembleDynamics
+from rlil.environments import (State, Action, GymEnvironment,
+                               REWARDS, TERMINATIONS)
+from rlil.memory import ExperienceReplayBuffer, ModelRolloutWrapper
+from rlil.presets.continuous.models import fc_ensemble_dynamics
+from rlil.utils import Samples
+
+
+class DummyPolicy:
+    def no_grad(self, states):
+        actions = torch.zeros(len(states), 1)
+        return actions, torch.zeros(len(states))
+
+
+@pytest.fixture
+def setUp(use_cpu):
+    env = GymEnvironment('Pendulum-v0', append_time=True)
+    Action.set_action_space(env.action_space)
+    replay_buffer = ExperienceReplayBuffer(1000, env)
+    states = State(torch.randn(101, env.state_space.shape[0]))
+    actions = Action(torch.zeros(100, 1))
+    rewards = torch.zeros(100)
+    replay_buffer.store(Samples(states[:-1], actions, rewards, states[1:]))
+
+    model = fc_ensemble_dynamics(env)
+    dynamics = EnsembleDynamics(model, torch.optim.Adam(model.parameters()))
+    buffer = ModelRolloutWrapper(replay_buffer, env, dynamics,
+                                 REWARDS[env.name](), DummyPolicy(),
+                                 real_ratio=0.5,
+                                 rollout_frequency=4,
+                                 rollout_batch_size=10,
+                                 rollout_length=2,
+                                 dynamics_train_steps=2,
+                                 dynamics_minibatch_size=10)
+    yield buffer
+
+
+def test_rollout(setUp):
+    buffer = setUp
+
+    # WHEN the first minibatches are sampled
+    batches = list(buffer.sample_batches(8, 4))
+
+    # THEN the rollouts are stored and mixed into the minibatches
+    assert len(buffer.model_buffer) == 20
+    assert len(batches) == 4
+    for states, actions, rewards, next_states, weights, indexes in batches:
+        assert len(states) == 8 and len(next_states) == 8
+        assert rewards.shape == (8, ) and weights.shape == (8, )
+        assert indexes is None
+        # the model rewards are given by the reward function
+        tt.assert_almost_equal(
+            rewards[4:], REWARDS["Pendulum-v0"]()(
+                states[4:], next_states[4:], actions[4:]))
+
+
+def test_rollout_frequency(setUp):
+    buffer = setUp
+    buffer.sample(8)
+    assert len(buffer.model_buffer) == 20
+    for _ in range(3):
+        buffer.sample(8)
+    assert len(buffer.model_buffer) == 20
+    # the 5th minibatch triggers the next rollout
+    list(buffer.sample_batches(8, 2))
+    assert len(buffer.model_buffer) == 40
+
+
+def test_small_real_ratio(setUp):
+    buffer = setUp
+    buffer.real_ratio = 0.05
+
+    # WHEN int(batch_size * real_ratio) == 0
+    states, actions, rewards, next_states, _, _ = buffer.sample(8)
+
+    # THEN the first transition is real and the rest are synthetic
+    assert len(states) == 8
+    assert rewards[0] == 0
+    tt.assert_almost_equal(
+        rewards[1:], REWARDS["Pendulum-v0"]()(
+            states[1:], next_states[1:], actions[1:]))
+
+
+class GoalDynamics:
+    def no_grad(self, states, actions):
+        # move all the cars to the goal
+        features = states.features.clone()
+        features[:, 0] = 0.5
+        features[:, 1] = 0.01
+        return State(features)
+
+
+def test_termination(use_cpu):
+    env = GymEnvironment('MountainCarContinuous-v0', append_time=True)
+    Action.set_action_space(env.action_space)
+    replay_buffer = ExperienceReplayBuffer(1000, env)
+    states = State(torch.zeros(11, env.state_space.shape[0]))
+    replay_buffer.store(Samples(states[:-1], Action(torch.zeros(10, 1)),
+                                torch.zeros(10), states[1:]))
+    buffer = ModelRolloutWrapper(replay_buffer, env, GoalDynamics(),
+                                 REWARDS[env.name](), DummyPolicy(),
+                                 TERMINATIONS[env.name](),
+                                 rollout_batch_size=10,
+                                 rollout_length=3)
+
+    # WHEN the rollouts reach the goal in the first step
+    buffer.rollout()
+
+    # THEN the rollouts end with the terminal next_states
+    assert len(buffer.model_buffer) == 10
+    next_states = buffer.model_buffer.sample(10).next_states
+    assert not next_states.mask.any()
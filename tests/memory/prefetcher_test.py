@@ -0,0 +1,45 @@
+import pytest
+import torch
+import torch_testing as tt
+from rlil.environments import State, Action, GymEnvironment
+from rlil.utils import Samples
+from rlil.memory import ExperienceReplayBuffer, Prefetcher
+
+
+@pytest.fixture
+def replay_buffer():
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    replay_buffer = ExperienceReplayBuffer(10000, env, prefetch=2)
+
+    states = State(torch.randn(21, env.state_space.shape[0]))
+    actions = Action(torch.randn(20, env.action_space.shape[0]))
+    rewards = torch.arange(0, 20, dtype=torch.float)
+    replay_buffer.store(Samples(states[:-1], actions, rewards, states[1:]))
+    yield replay_buffer
+    replay_buffer.close_prefetcher()
+
+
+def test_prefetch(replay_buffer):
+    prefetcher = replay_buffer.prefetch(5, num_prefetch=3)
+    assert isinstance(prefetcher, Prefetcher)
+
+    # GIVEN a prefetcher of a replay_buffer
+    # WHEN minibatches are pulled from the prefetcher
+    # THEN they are sampled from the stored transitions
+    for _, samples in zip(range(10), prefetcher):
+        states, actions, rewards, next_states, weights, indexes = samples
+        assert states.shape == (5, 9)
+        assert actions.shape == (5, 2)
+        assert states.device == replay_buffer.device
+        assert ((rewards >= 0) & (rewards < 20)).all()
+        tt.assert_equal(weights, torch.ones(5, device=replay_buffer.device))
+    prefetcher.close()
+
+
+def test_sample_with_prefetch(replay_buffer):
+    # GIVEN a replay_buffer with prefetch > 0
+    # WHEN sample is called with different batch sizes
+    # THEN the minibatches have the requested sizes
+    assert len(replay_buffer.sample(4).rewards) == 4
+    assert len(replay_buffer.sample(4).rewards) == 4
+    assert len(replay_buffer.sample(8).rewards) == 8
@@ -0,0 +1,61 @@
+import pytest
+import numpy as np
+import torch
+from rlil.environments import State, Action, GymEnvironment
+from rlil.utils import Samples
+from rlil.memory import TrajectoryRecorder, TransitionDataset
+
+
+@pytest.fixture
+def env():
+    return GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+
+
+def make_samples(env, size, reward):
+    states = State(torch.randn(size + 1, env.state_space.shape[0]))
+    actions = Action(torch.randn(size, env.action_space.shape[0]))
+    rewards = torch.full((size, ), reward, dtype=torch.float)
+    return Samples(states[:-1], actions, rewards, states[1:])
+
+
+def test_store(tmpdir, env):
+    recorder = TrajectoryRecorder(str(tmpdir), env, shard_size=10)
+
+    # GIVEN a recorder
+    # WHEN samples exceeding the shard_size are stored
+    recorder.store(make_samples(env, 6, 0), returns=[0.0])
+    recorder.store(make_samples(env, 6, 1), returns=[6.0])
+    recorder.store(make_samples(env, 3, 2), returns=[6.0])
+
+    # THEN the staged samples are written as a shard
+    assert len(recorder.dataset) == 12
+    assert len(recorder) == 15
+    assert recorder.returns == [0.0, 6.0]
+
+    # and the rest are written by flush
+    recorder.flush()
+    dataset = TransitionDataset(str(tmpdir))
+    assert len(dataset) == 15
+    np.testing.assert_equal(dataset.get([0, 6, 12])["rew"].reshape(-1),
+                            [0, 1, 2])
+    stats = recorder.return_stats()
+    assert stats["mean"] == 4.0
+    assert [shard["mean"] for shard in stats["shards"]] == [3.0, 6.0]
+
+
+def test_resume(tmpdir, env):
+    recorder = TrajectoryRecorder(str(tmpdir), env, shard_size=10)
+    recorder.store(make_samples(env, 10, 0), returns=[0.0])
+
+    # GIVEN a recording interrupted with staged samples
+    recorder.store(make_samples(env, 5, 1), returns=[5.0])
+
+    # WHEN the recording resumes
+    recorder = TrajectoryRecorder(str(tmpdir), env, shard_size=10)
+
+    # THEN the written shards are kept and the staged samples are lost
+    assert len(recorder) == 10
+    assert recorder.returns == [0.0]
+    recorder.store(make_samples(env, 10, 2), returns=[20.0])
+    assert len(recorder.dataset) == 20
+    assert recorder.returns == [0.0, 20.0]
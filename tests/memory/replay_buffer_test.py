@@ -1,4 +1,5 @@
 import pytest
+import pickle
 import random
 import torch
 import numpy as np
@@ -125,3 +126,120 @@ def test_per_run():
     (s, a, r, n, w, i) = replay_buffer.sample(3)
     assert r.sum() < 3
     assert w.sum() == 3.
+
+
+def test_shared_memory_run():
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    replay_buffer = ExperienceReplayBuffer(15, env, shared_memory=True)
+
+    states = State(torch.tensor([env.observation_space.sample()]*11))
+    actions = Action(torch.tensor([env.action_space.sample()]*10))
+    rewards = torch.arange(0, 10, dtype=torch.float)
+    samples = Samples(states[:-1], actions, rewards, states[1:])
+    replay_buffer.store(samples)
+    replay_buffer.store(samples)
+
+    # the oldest samples are overwritten
+    assert len(replay_buffer) == 15
+    s, a, r, n, w, i = replay_buffer.get_all_transitions()
+    tt.assert_equal(r, torch.cat((rewards[5:], rewards)))
+
+    (s, a, r, n, w, i) = replay_buffer.sample(3)
+    assert len(r) == 3
+    replay_buffer.clear()
+    assert len(replay_buffer) == 0
+
+
+def test_shared_memory_writer():
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    replay_buffer = ExperienceReplayBuffer(100, env, shared_memory=True)
+    writers = replay_buffer.make_writers(2)
+
+    # GIVEN a writer copied to another process
+    writer = pickle.loads(pickle.dumps(writers[1]))
+    transitions = {
+        "obs": np.ones((5, 9), dtype=np.float32),
+        "act": np.zeros((5, 2), dtype=np.float32),
+        "rew": np.arange(5, dtype=np.float32).reshape(-1, 1),
+        "next_obs": np.ones((5, 9), dtype=np.float32),
+        "done": np.zeros((5, 1), dtype=np.float32)
+    }
+    written_range = writer.write(transitions)
+    # WHEN the written range is not committed
+    # THEN the samples are not stored
+    assert len(replay_buffer) == 0
+
+    # WHEN the written range is committed
+    # THEN the samples are stored
+    replay_buffer.commit(written_range)
+    assert len(replay_buffer) == 5
+    s, a, r, n, w, i = replay_buffer.sample(10)
+    assert (s.features == 1).all()
+    assert set(r.tolist()) <= set(range(5))
+
+
+def test_shared_memory_capacity():
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    replay_buffer = ExperienceReplayBuffer(100, env, shared_memory=True)
+
+    # GIVEN writers with a part of the capacity
+    replay_buffer.make_writers(2, capacity=30)
+
+    # WHEN samples are stored by the owner
+    states = State(torch.tensor([env.observation_space.sample()]*31))
+    actions = Action(torch.tensor([env.action_space.sample()]*30))
+    rewards = torch.arange(0, 30, dtype=torch.float)
+    samples = Samples(states[:-1], actions, rewards, states[1:])
+    replay_buffer.store(samples)
+    replay_buffer.store(samples)
+
+    # THEN the local segment has the rest of the capacity
+    assert len(replay_buffer) == 40
+    with pytest.raises(AssertionError):
+        replay_buffer.make_writers(1)
+
+
+def test_sample_batches():
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    replay_buffer = ExperienceReplayBuffer(10000, env, prioritized=True)
+
+    states = State(torch.randn(21, env.state_space.shape[0]))
+    actions = Action(torch.randn(20, env.action_space.shape[0]))
+    rewards = torch.arange(0, 20, dtype=torch.float)
+    replay_buffer.store(Samples(states[:-1], actions, rewards, states[1:]))
+
+    # GIVEN a replay_buffer
+    # WHEN sample_batches is called
+    # THEN it yields num_batches minibatches of batch_size
+    batches = list(replay_buffer.sample_batches(5, 3))
+    assert len(batches) == 3
+    for s, a, r, n, w, i in batches:
+        assert s.shape == (5, 9)
+        assert a.shape == (5, 2)
+        assert r.shape == (5, )
+        assert n.shape == (5, 9)
+        assert w.shape == (5, )
+        assert len(i) == 5
+        replay_buffer.update_priorities(i, torch.ones(5))
+
+
+def test_sample_batches_priorities():
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    replay_buffer = ExperienceReplayBuffer(10000, env, prioritized=True)
+
+    states = State(torch.randn(21, env.state_space.shape[0]))
+    actions = Action(torch.randn(20, env.action_space.shape[0]))
+    rewards = torch.arange(0, 20, dtype=torch.float)
+    replay_buffer.store(Samples(states[:-1], actions, rewards, states[1:]))
+
+    # GIVEN the priorities updated after the first minibatch
+    batches = replay_buffer.sample_batches(5, 2)
+    next(batches)
+    td_errors = torch.zeros(20)
+    td_errors[7] = 1e3
+    replay_buffer.update_priorities(np.arange(20), td_errors)
+
+    # WHEN the next minibatch is sampled
+    # THEN it is sampled with the updated priorities
+    s, a, r, n, w, i = next(batches)
+    assert (r == 7).all()
@@ -1,4 +1,5 @@
 import unittest
+from copy import deepcopy
 import numpy as np
 import torch
 from rlil import nn
@@ -35,10 +36,13 @@ class MockAgent:
         self._action = Action(action).to("cpu")
         return self._action
 
-    def make_lazy_agent(self):
-        return MockLazyAgent(self.policy_model)
+    def make_lazy_agent(self, *args, **kwargs):
+        return MockLazyAgent(deepcopy(self.policy_model))
 
-    def train(self):
+    def lazy_agent_models(self):
+        return {"policy_model": self.policy_model}
+
+    def train(self, n_steps=1):
         pass
 
 
@@ -51,9 +55,9 @@ class MockLazyAgent:
         # for N step replay buffer
         self._n_step, self._discount_factor = get_n_step()
 
-    def set_replay_buffer(self, env):
+    def set_replay_buffer(self, env, size=1e7):
         self.replay_buffer = ExperienceReplayBuffer(
-            1e7, env, n_step=self._n_step,
+            size, env, n_step=self._n_step,
             discount_factor=self._discount_factor)
 
     def act(self, state, reward):
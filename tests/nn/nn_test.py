@@ -158,9 +158,119 @@ def test_mmd(setUp):
     nn.mmd_gaussian(sample_actions1, sample_actions2)
 
 
+def reference_mmd(samples1, samples2, sigma, norm):
+    # the batch x n x m x dimension implementation of the BEAR paper
+    def kernel_mean(x, y):
+        diff = norm(x.unsqueeze(2) - y.unsqueeze(1)).sum(-1)
+        return (-diff / (2.0 * sigma)).exp().mean(dim=(1, 2))
+    return (kernel_mean(samples1, samples1) + kernel_mean(samples2, samples2)
+            - 2.0 * kernel_mean(samples1, samples2) + 1e-6).sqrt()
+
+
+@pytest.mark.parametrize("sample_size", [5, 30])
+def test_mmd_values(setUp, sample_size):
+    sample_actions1 = torch.randn([10, sample_size, 3], requires_grad=True)
+    sample_actions2 = torch.randn([10, sample_size + 1, 3])
+
+    for mmd, norm in [(nn.mmd_laplacian, torch.abs),
+                      (nn.mmd_gaussian, lambda x: x.pow(2))]:
+        loss = mmd(sample_actions1, sample_actions2, sigma=1.0)
+        expected = reference_mmd(sample_actions1, sample_actions2, 1.0, norm)
+        tt.assert_almost_equal(loss, expected, decimal=6)
+
+        grad, = torch.autograd.grad(loss.sum(), sample_actions1)
+        expected_grad, = torch.autograd.grad(expected.sum(), sample_actions1)
+        tt.assert_almost_equal(grad, expected_grad, decimal=5)
+
+
 def assert_array_equal(actual, expected):
     for first, second in zip(actual, expected):
         if second is None:
             assertIsNone(first)
         else:
             tt.assert_almost_equal(first, second, decimal=3)
+
+
+def test_ensemble_linear(setUp):
+    linears = [nn.Linear(3, 2) for _ in range(4)]
+    model = nn.EnsembleLinear.from_linears(linears)
+    x = torch.randn(5, 3)
+
+    # the same input to all the models
+    expected = torch.stack([linear(x) for linear in linears])
+    tt.assert_almost_equal(model(x), expected, decimal=5)
+
+    # an input to each model
+    xs = torch.randn(4, 5, 3)
+    expected = torch.stack([linear(x) for linear, x in zip(linears, xs)])
+    tt.assert_almost_equal(model(xs), expected, decimal=5)
+
+
+def test_split_linear(setUp):
+    layer = nn.SplitLinear(3, 2, 4)
+    states = torch.randn(5, 3)
+    actions = torch.randn(15, 2)
+
+    # GIVEN the states repeated 3 times
+    repeated = torch.repeat_interleave(states, 3, 0)
+    expected = layer(torch.cat((repeated, actions), dim=1))
+
+    # WHEN the states are given without repeating
+    # THEN the outputs are the same
+    tt.assert_almost_equal(layer((states, actions)), expected, decimal=5)
+
+    # small states are repeated as usual
+    model = nn.Sequential(layer)
+    tt.assert_almost_equal(nn.state_action_input(model, states, actions),
+                           torch.cat((repeated, actions), dim=1))
+    large_states = torch.randn(5, 32)
+    model = nn.Sequential(nn.SplitLinear(32, 2, 4))
+    tt.assert_almost_equal(
+        nn.state_action_input(model, large_states, actions)[0],
+        large_states)
+
+
+def test_ensemble_split_linear(setUp):
+    layer = nn.EnsembleSplitLinear(2, 3, 2, 4)
+    states = torch.randn(5, 3)
+    actions = torch.randn(15, 2)
+    repeated = torch.repeat_interleave(states, 3, 0)
+    expected = layer(torch.cat((repeated, actions), dim=1))
+    tt.assert_almost_equal(layer((states, actions)), expected, decimal=5)
+
+    # stack_ensemble and unstack_ensemble keep the split
+    model = nn.Sequential(layer, nn.ReLU(), nn.EnsembleLinear(2, 4, 1))
+    head = nn.unstack_ensemble(model, 1)
+    assert isinstance(head[0], nn.SplitLinear)
+    tt.assert_almost_equal(head((states, actions)),
+                           model((states, actions))[1], decimal=5)
+    stacked = nn.stack_ensemble([nn.unstack_ensemble(model, 0), head])
+    assert isinstance(stacked[0], nn.EnsembleSplitLinear)
+    tt.assert_almost_equal(stacked((states, actions)),
+                           model((states, actions)), decimal=5)
+
+
+def test_stack_ensemble(setUp):
+    models = nn.ModuleList([
+        nn.Sequential(nn.Linear(3, 4), nn.ReLU(), nn.Linear(4, 1))
+        for _ in range(2)])
+    stacked = nn.stack_ensemble(models)
+    x = torch.randn(5, 3)
+    expected = torch.stack([model(x) for model in models])
+    tt.assert_almost_equal(stacked(x), expected, decimal=5)
+
+
+def test_ensemble_model_forward(setUp):
+    model = nn.Sequential(nn.EnsembleSplitLinear(2, 3, 2, 4), nn.ReLU(),
+                          nn.EnsembleLinear(2, 4, 1))
+    states = torch.randn(5, 3)
+    actions = torch.randn(15, 2)
+    x = torch.cat((torch.repeat_interleave(states, 3, 0), actions), dim=1)
+
+    # the output of one model equals that of the ensemble
+    for index in range(2):
+        tt.assert_almost_equal(nn.ensemble_model_forward(model, x, index),
+                               model(x)[index], decimal=5)
+        tt.assert_almost_equal(
+            nn.ensemble_model_forward(model, (states, actions), index),
+            model(x)[index], decimal=5)
@@ -3,7 +3,7 @@ import gym
 from rlil.environments import GymEnvironment
 from rlil.presets.continuous import bcq, bc, vae_bc, bear, brac
 from rlil.presets import env_validation, trainer_validation
-from rlil.memory import ExperienceReplayBuffer
+from rlil.memory import ExperienceReplayBuffer, TransitionDataset
 from rlil.environments import Action
 from rlil.initializer import set_replay_buffer
 from copy import deepcopy
@@ -32,6 +32,19 @@ def test_bcq():
     trainer_validation(bcq(transitions), env)
 
 
+def test_bcq_dataset(tmpdir):
+    env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
+    transitions = TransitionDataset.create(
+        str(tmpdir), get_transitions(env))
+
+    env_validation(bcq(transitions), env, done_step=50)
+    # the replay buffer backed by the dataset is read-only
+    agent = bcq(transitions)(env)
+    train_steps = agent.writer.train_steps
+    agent.train(2)
+    assert agent.writer.train_steps == train_steps + 2
+
+
 def test_bear():
     env = GymEnvironment('LunarLanderContinuous-v2', append_time=True)
     transitions = get_transitions(env)
@@ -65,8 +65,43 @@ def test_rs_mpc():
     trainer_validation(rs_mpc(replay_start_size=5), env)
 
 
+@pytest.mark.parametrize("planner", ["cem", "mppi"])
+def test_rs_mpc_planner(planner):
+    env = GymEnvironment("Pendulum-v0", append_time=True)
+    preset = rs_mpc(replay_start_size=5, planner=planner,
+                    horizon=5, num_samples=100, num_iterations=2)
+    env_validation(preset, env, done_step=50)
+    trainer_validation(preset, env)
+
+
+def test_rs_mpc_ensemble():
+    env = GymEnvironment("Pendulum-v0", append_time=True)
+    preset = rs_mpc(replay_start_size=5, ensemble_size=5,
+                    horizon=5, num_samples=100)
+    env_validation(preset, env, done_step=50)
+    trainer_validation(preset, env)
+
+
+@pytest.mark.parametrize("preset", [sac, td3])
+def test_model_rollout(preset):
+    env = GymEnvironment("Pendulum-v0", append_time=True)
+    agent_fn = preset(replay_start_size=5, real_ratio=0.5,
+                      rollout_frequency=10, rollout_batch_size=10)
+    env_validation(agent_fn, env, done_step=50)
+    trainer_validation(agent_fn, env)
+
+
 def test_apex(use_cpu):
     env = GymEnvironment("LunarLanderContinuous-v2", append_time=True)
     for preset in [ddpg, td3, sac]:
         trainer_validation(
             preset(replay_start_size=5, use_apex=True), env, apex=True)
+
+
+def test_td3_compiled():
+    env = GymEnvironment("LunarLanderContinuous-v2", append_time=True)
+    # aot_eager traces the graphs without generating kernels
+    agent_fn = td3(replay_start_size=50,
+                   compile_options={"backend": "aot_eager"})
+    env_validation(agent_fn, env, done_step=50)
+    trainer_validation(agent_fn, env)
@@ -5,6 +5,7 @@ import gym
 import time
 import warnings
 import ray
+import torch_testing as tt
 from rlil import nn
 from rlil.environments import GymEnvironment, Action
 from rlil.policies.deterministic import DeterministicPolicyNetwork
@@ -74,6 +75,125 @@ def test_sampler_frames(setUp):
                ) > worker_frames * num_workers
 
 
+def test_sampler_num_envs(setUp):
+    env = setUp["env"]
+    agent = setUp["agent"]
+
+    num_workers = 2
+    num_envs = 3
+    worker_episodes = 4
+    sampler = AsyncSampler(
+        env,
+        num_workers=num_workers,
+        num_envs=num_envs,
+    )
+    lazy_agent = agent.make_lazy_agent()
+    sampler.start_sampling(
+        lazy_agent, worker_episodes=worker_episodes)
+    sample_result = sampler.store_samples(timeout=1e8)
+
+    # GIVEN workers with multiple environments
+    # WHEN worker_episodes are specified
+    # THEN sampler collects exactly worker_episodes per worker
+    # and stores all the collected frames
+    frames = sample_result[StartInfo()]["frames"]
+    assert len(frames) == num_workers * worker_episodes
+    assert len(sampler.replay_buffer) == sum(frames)
+
+
+def test_sampler_shared_memory(setUp):
+    env = setUp["env"]
+    agent = setUp["agent"]
+    replay_buffer = ExperienceReplayBuffer(10000, env, shared_memory=True)
+    set_replay_buffer(replay_buffer)
+
+    num_workers = 2
+    worker_episodes = 2
+    sampler = AsyncSampler(
+        env,
+        num_workers=num_workers,
+    )
+    lazy_agent = agent.make_lazy_agent()
+    sampler.start_sampling(
+        lazy_agent, worker_episodes=worker_episodes)
+    sample_result = sampler.store_samples(timeout=1e8)
+
+    # GIVEN a shared memory replay_buffer
+    # WHEN the workers finish sampling
+    # THEN the samples written by the workers are stored
+    frames = sample_result[StartInfo()]["frames"]
+    assert len(replay_buffer) == sum(frames)
+    replay_buffer.sample(10)
+
+
+def test_eval_sampler_shared_memory(setUp):
+    env = setUp["env"]
+    agent = setUp["agent"]
+    replay_buffer = ExperienceReplayBuffer(10000, env, shared_memory=True)
+    set_replay_buffer(replay_buffer)
+    sampler = AsyncSampler(env, num_workers=2)
+
+    # GIVEN a sampler which doesn't store samples, e.g. for evaluation
+    sampler.update_agent(agent, evaluation=True, store_samples=False)
+    sampler.start_sampling(worker_episodes=1)
+    sampler.collect_samples()
+
+    # THEN no shared memory is allocated for the workers
+    assert replay_buffer._buffer._unallocated() == 10000
+
+    # WHEN the sampler stores samples
+    # THEN the workers share the capacity of the buffer
+    sampler.update_agent(agent)
+    assert replay_buffer._buffer._unallocated() == 0
+
+
+def test_sampler_staging_buffer(setUp):
+    env = setUp["env"]
+    agent = setUp["agent"]
+    sampler = AsyncSampler(env, num_workers=1)
+
+    usages = []
+    for _ in range(2):
+        lazy_agent = agent.make_lazy_agent()
+        sampler.start_sampling(lazy_agent, worker_episodes=2)
+        sampler.store_samples(timeout=-1)
+        usages.append(sampler.memory_usage()[0])
+
+    # GIVEN worker_episodes and the max_episode_steps of the env
+    # WHEN the worker samples twice
+    # THEN the staging buffer is sized by the episodes and reused
+    assert usages[0]["staging_buffer_bytes"] == \
+        usages[1]["staging_buffer_bytes"]
+    staging = ExperienceReplayBuffer(2 * 1000 + 1, env)
+    assert usages[0]["staging_buffer_bytes"] == staging.nbytes
+    assert len(sampler.replay_buffer) > 0
+
+
+@pytest.mark.parametrize("fp16_delta", [False, True])
+def test_update_agent(setUp, fp16_delta):
+    env = setUp["env"]
+    agent = setUp["agent"]
+    sampler = AsyncSampler(env, num_workers=2, fp16_delta=fp16_delta)
+
+    for _ in range(3):
+        with torch.no_grad():
+            for param in agent.policy_model.parameters():
+                param.add_(torch.randn_like(param) * 0.1)
+        sampler.replay_buffer.clear()
+        sampler.update_agent(agent)
+        sampler.start_sampling(worker_episodes=1)
+        sampler.store_samples(timeout=-1)
+
+    # GIVEN the weights broadcast by update_agent
+    # WHEN the workers sample with their persistent lazy_agents
+    # THEN the actions are computed with the latest weights
+    samples = sampler.replay_buffer.get_all_transitions()
+    with torch.no_grad():
+        actions = agent.policy_model(samples.states)
+    atol = 1e-2 if fp16_delta else 1e-6
+    tt.assert_allclose(samples.actions.features, actions, atol=atol, rtol=0)
+
+
 def test_ray_wait(setUp):
     env = setUp["env"]
     agent = setUp["agent"]
@@ -118,3 +238,25 @@ def test_eval_sampler(setUp):
     assert len(sampler.replay_buffer) == 0
 
     result["info_list"]
+
+
+def test_collect_samples(setUp):
+    env = setUp["env"]
+    agent = setUp["agent"]
+    sampler = AsyncSampler(env, num_workers=2)
+    sampler.update_agent(agent)
+    sampler.start_sampling(worker_episodes=1)
+
+    results = []
+    while len(results) < 2:
+        results += sampler.collect_samples(timeout=10)
+
+    # GIVEN the finished workers
+    # WHEN collect_samples returns their results
+    # THEN the samples are not stored until store is called
+    assert len(sampler.replay_buffer) == 0
+    for start_info, sample_info, samples in results:
+        sampler.store(samples)
+    assert len(sampler.replay_buffer) == \
+        sum(sum(sample_info["frames"]) for _, sample_info, _ in results)
+    assert sampler.collect_samples(timeout=1) == []
@@ -0,0 +1,92 @@
+import pytest
+from rlil.utils.profiler import Profiler, _NULL_TIMER
+from rlil.utils.writer import DummyWriter
+
+
+class HistogramWriter(DummyWriter):
+    def __init__(self, due=True):
+        super().__init__()
+        self.due = due
+        self.histograms = {}
+
+    def histogram_due(self, name, step="train_steps"):
+        return self.due
+
+    def add_histogram(self, name, values, step="train_steps"):
+        self.histograms[name] = values
+
+
+def test_disabled():
+    profiler = Profiler()
+
+    # GIVEN the disabled profiler
+    # THEN the timers record nothing
+    assert profiler.timer("phase") is _NULL_TIMER
+    with profiler.timer("phase"):
+        pass
+    assert profiler.pop_recent() == {}
+    assert len(profiler.summary().split("\n")) == 1
+
+
+def test_timer():
+    profiler = Profiler(max_recent=2)
+    profiler.enabled = True
+
+    for _ in range(3):
+        with profiler.timer("phase"):
+            pass
+
+    @profiler.timed("function")
+    def function(x):
+        return x + 1
+    assert function(1) == 2
+
+    # the recent durations are bounded by max_recent
+    recent = profiler.pop_recent()
+    assert len(recent["phase"]) == 2
+    assert len(recent["function"]) == 1
+    assert profiler.pop_recent() == {}
+
+    # the summary keeps all the calls
+    rows = profiler.summary().split("\n")
+    assert len(rows) == 3
+    phase_row = [row for row in rows[1:] if row.startswith("phase ")][0]
+    assert phase_row.split()[1] == "3"
+
+
+def test_merge_and_write():
+    profiler = Profiler()
+    profiler.enabled = True
+
+    # GIVEN the durations measured by a worker
+    profiler.merge({"worker/env_step": [0.001, 0.003]})
+
+    # THEN they are written as histograms in milliseconds
+    writer = HistogramWriter()
+    profiler.write(writer)
+    assert writer.histograms["profile/worker/env_step"].tolist() == \
+        pytest.approx([1., 3.])
+    assert "worker/env_step" in profiler.summary()
+
+    profiler.reset()
+    assert len(profiler.summary().split("\n")) == 1
+
+
+def test_write_when_due():
+    profiler = Profiler(max_recent=100)
+    profiler.enabled = True
+    for _ in range(1000):
+        profiler.record("phase", 0.001)
+
+    # GIVEN a writer which doesn't write the histograms
+    # THEN the durations are kept
+    writer = HistogramWriter(due=False)
+    profiler.write(writer)
+    assert writer.histograms == {}
+
+    # WHEN the writer writes the histograms
+    # THEN the durations since the last write are written
+    writer.due = True
+    profiler.write(writer)
+    assert len(writer.histograms["profile/phase"]) == 100
+    assert profiler.pop_recent() == {}
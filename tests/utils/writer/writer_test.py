@@ -1,9 +1,12 @@
 import pytest
 import numpy as np
+import torch
+from unittest import mock
 from rlil.utils.writer import ExperimentWriter
 from rlil.initializer import set_writer, get_writer
 from shutil import rmtree
 import pathlib
+import threading
 import os
 import pandas as pd
 from tensorboard.backend.event_processing import event_accumulator
@@ -110,6 +113,7 @@ def test_save_csv(init_writer):
     writer = get_writer()
     writer.sample_frames = 1e9
     writer.add_scalar("test", 500, step="sample_frames", save_csv=True)
+    writer.flush()
 
     test_path = pathlib.Path("runs/test_exp")
     for p in test_path.rglob("*.csv"):
@@ -117,3 +121,85 @@ def test_save_csv(init_writer):
 
     csv_data = pd.read_csv(str(csv_file), names=["sample_frames", "return"])
     assert csv_data["sample_frames"].tolist() == [1e9]
+
+
+def test_deferred_scalars(init_writer):
+    writer = get_writer()
+    writer.flush()
+    writer.sample_frames = 1e9
+    values = [torch.tensor(i, dtype=torch.float32) for i in range(5)]
+
+    # WHEN tensors are added
+    # THEN they are not transferred by add_scalar
+    with mock.patch.object(torch.Tensor, "item", side_effect=AssertionError), \
+            mock.patch.object(torch.Tensor, "cpu", side_effect=AssertionError):
+        for i, value in enumerate(values):
+            writer.add_scalar("deferred", value, step="sample_frames",
+                              step_value=10 * (i + 1))
+    assert len(writer._pending_scalars) == 5
+
+    # THEN the values are written by flush
+    writer.flush()
+    assert len(writer._pending_scalars) == 0
+    writer.close()
+    event_acc = init_writer
+    event_acc.Reload()
+    steps, scalars = read_scalars(event_acc)
+    assert scalars["test_env/deferred/sample_frames"] == [0, 1, 2, 3, 4]
+    assert steps["test_env/deferred/sample_frames"] == [10, 20, 30, 40, 50]
+
+
+def test_max_pending_scalars(init_writer):
+    writer = get_writer()
+    writer.flush()
+    writer._max_pending_scalars = 3
+    for i in range(3):
+        writer.add_scalar("pending", torch.tensor(i), step="sample_frames",
+                          step_value=10 * (i + 1))
+    # the scalars are passed to the background thread
+    assert len(writer._pending_scalars) == 0
+    writer._scalar_queue.join()
+
+
+def test_threads(init_writer):
+    writer = get_writer()
+    writer.flush()
+    writer._max_pending_scalars = 7
+
+    # WHEN scalars are added from multiple threads
+    def add_scalars(name):
+        for i in range(100):
+            writer.add_scalar(name, i, step="sample_frames",
+                              step_value=10 * (i + 1))
+    threads = [threading.Thread(target=add_scalars, args=("thread_%d" % i,))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    # THEN all the scalars are written in order
+    event_acc = init_writer
+    event_acc.Reload()
+    steps, scalars = read_scalars(event_acc)
+    for i in range(4):
+        assert scalars["test_env/thread_%d/sample_frames" % i] == \
+            list(range(100))
+
+
+def test_scalar_error(init_writer):
+    writer = get_writer()
+    writer.flush()
+
+    # GIVEN a failure of the background thread
+    with mock.patch("rlil.utils.writer.to_floats",
+                    side_effect=RuntimeError("failed")):
+        writer.add_scalar("error", 1, step="sample_frames", step_value=1e9)
+        writer.flush()
+
+    # THEN the training continues and close raises the error
+    writer.add_scalar("error", 2, step="sample_frames", step_value=2e9)
+    writer.flush()
+    with pytest.raises(RuntimeError):
+        writer.close()